@@ -9,7 +9,8 @@ class Settings(BaseSettings):
     # API Keys
     GEMINI_API_KEY: Optional[str] = None
     ANTHROPIC_API_KEY: Optional[str] = None
-    VOYAGE_API_KEY: str
+    # Only needed for the Voyage embedding backend and reranker
+    VOYAGE_API_KEY: Optional[str] = None
     
     # App Configuration
     APP_NAME: str = "Medicare Q&A RAG API"
@@ -19,8 +20,96 @@ class Settings(BaseSettings):
     # Database Configuration
     VECTOR_DB_PATH: str = Field("vector_db", alias="CHROMA_PATH")
     CHROMA_COLLECTION_NAME: str = Field("medicare_docs", alias="DEFAULT_COLLECTION_NAME")
+    # Seconds a replaced collection version is kept for in-flight queries
+    COLLECTION_GC_GRACE_SECONDS: float = 600
+    # Seconds between the API's sweeps for versions past their grace period (0 = off)
+    COLLECTION_GC_INTERVAL_SECONDS: float = 60
+    # Threads available for blocking Chroma calls made from async request handlers
+    CHROMA_MAX_WORKERS: int = 16
+    # Records per Chroma write during ingestion (capped at the client's max batch size)
+    CHROMA_WRITE_BATCH_SIZE: int = 1000
     
+    # Embedding backend: "voyage", "local" (sentence-transformers, CPU) or
+    # "hashing" (dependency-free baseline). Changing it requires re-ingestion.
+    EMBEDDING_BACKEND: str = "voyage"
+    VOYAGE_EMBEDDING_MODEL: str = Field("voyage-3", alias="EMBEDDING_MODEL")
+    LOCAL_EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    # sentence-transformers runtime: "torch" or "onnx"
+    LOCAL_EMBEDDING_RUNTIME: str = "torch"
+    HASHING_EMBEDDING_DIMENSION: int = 1024
+
+    # Reranker backend: "voyage", "cross-encoder" (sentence-transformers, CPU),
+    # "bm25", "hybrid" (vector distance + BM25) or "none"
+    RERANKER_BACKEND: str = "voyage"
+    RERANK_MODEL: str = "rerank-2-lite"
+    LOCAL_RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    # Skip reranking when the vector distance gap after the top-k is at least
+    # this large (0 always reranks). Never applied to hybrid (fused) results.
+    RERANK_DECISIVE_MARGIN: float = 0
+
+    # Hybrid retrieval: fuse dense results with BM25 over a lexical index built
+    # at ingest, using reciprocal rank fusion. Falls back to dense-only search
+    # for collections without an index. Off by default: it changes rankings.
+    HYBRID_RETRIEVAL: bool = False
+    # Candidates taken from each retriever before fusion
+    HYBRID_CANDIDATES: int = 50
+    RRF_K: int = 60
+
+    # Context assembly: token budget for the reranked chunks (0 = unlimited)
+    # and the share of repeated sentences at which a chunk is dropped
+    CONTEXT_MAX_TOKENS: int = 2000
+    CONTEXT_DUPLICATE_OVERLAP: float = 0.8
+
+    # Speculative pipelining (/ask/speculative): share of the reranked chunks
+    # that must already be in the speculative context to keep its answer
+    SPECULATIVE_MIN_OVERLAP: float = 1.0
+
+    # Query embedding cache (size 0 disables it; path enables the on-disk tier)
+    EMBEDDING_CACHE_SIZE: int = 10_000
+    EMBEDDING_CACHE_TTL_SECONDS: Optional[float] = 7 * 24 * 3600
+    EMBEDDING_CACHE_PATH: Optional[str] = None
+
+    # Semantic answer cache for near-duplicate questions (size 0 disables it).
+    # Off by default: similar questions about different plans ("Part A" vs
+    # "Part B") can embed above the threshold. Hits also require the same
+    # plan letters, amounts and names, but review before enabling.
+    ANSWER_CACHE_SIZE: int = 0
+    ANSWER_CACHE_SIMILARITY: float = 0.98
+    ANSWER_CACHE_TTL_SECONDS: Optional[float] = 24 * 3600
+
+    # Batch processing and provider rate limits (0 = unlimited)
+    BATCH_CONCURRENCY: int = 8
+    # Batch answers files are written inside this directory only
+    BATCH_OUTPUT_DIR: str = "app/gen-ai-homework-assignment/output"
+    VOYAGE_REQUESTS_PER_MINUTE: int = 0
+    GEMINI_REQUESTS_PER_MINUTE: int = 0
+
+    # Evaluation runner: questions answered and metric judgements made at
+    # once, and retries (with exponential backoff) on provider quota errors.
+    # Pace is set by the Voyage/Gemini rate limits above.
+    EVAL_ANSWER_CONCURRENCY: int = 4
+    EVAL_JUDGE_CONCURRENCY: int = 8
+    EVAL_MAX_RETRIES: int = 5
+    EVAL_RETRY_BASE_SECONDS: float = 2.0
+    # Content-addressed cache of evaluation answers and verdicts (unset disables it)
+    EVAL_CACHE_PATH: Optional[str] = "eval_results/eval_cache.sqlite3"
+
+    # Pool chunk vectors from the chunker's sentence-window embeddings instead
+    # of embedding every chunk a second time
+    INGEST_REUSE_CHUNK_EMBEDDINGS: bool = False
+
+    # Background ingestion jobs that may run at once (same-collection jobs queue)
+    INGEST_MAX_WORKERS: int = 2
+
+    # Threads per ingestion pipeline stage and documents buffered between stages
+    INGEST_READ_WORKERS: int = 4
+    INGEST_CHUNK_WORKERS: int = 4
+    INGEST_EMBED_WORKERS: int = 4
+    INGEST_QUEUE_SIZE: int = 8
+
     # Observability
+    # In-process latency histograms and counters served at /metrics
+    METRICS_ENABLED: bool = True
     LOGFIRE_TOKEN: Optional[str] = Field(None, alias="LOGFIRE_API_KEY")
     
     model_config = SettingsConfigDict(
@@ -1,20 +1,204 @@
-from .services.query import QueryService
-from .services.ingest import IngestService
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import chromadb
+import logfire
+import voyageai
+from fastapi import Depends, HTTPException, Request
+from google import genai
+
+from .core.config import settings
+from .services.batch import BatchProcessingService
+from .services.cache import EmbeddingCache
+from .services.collections import CollectionRegistry
+from .services.embeddings import create_embedder
 from .services.evaluation import EvaluationService
+from .services.ingest import IngestService
+from .services.jobs import IngestJobManager
+from .services.lexical import remove_index
+from .services.query import QueryService
+from .services.rate_limit import AsyncRateLimiter
+
+
+class ServiceContainer:
+    """Process-lifetime holder for API clients and the services built on them.
+
+    The VoyageAI, Chroma and GenAI clients are created once and shared by every
+    service so their HTTP connection pools (and Chroma's SQLite handle) are
+    reused across requests. The container is created in the application
+    lifespan (see ``app.main``) and stored on ``app.state.services``.
+    """
+
+    def __init__(self):
+        """Create the shared clients. Services are built lazily on first use."""
+        self.voyage_client = voyageai.Client(api_key=settings.VOYAGE_API_KEY)
+        self.async_voyage_client = voyageai.AsyncClient(api_key=settings.VOYAGE_API_KEY)
+        self.chroma_client = chromadb.PersistentClient(path=settings.VECTOR_DB_PATH)
+        self.genai_client = genai.Client(api_key=settings.GEMINI_API_KEY)
+        self.chroma_executor = ThreadPoolExecutor(
+            max_workers=settings.CHROMA_MAX_WORKERS, thread_name_prefix="chroma"
+        )
+        self.embedding_cache = EmbeddingCache.from_settings()
+        self.collection_registry = CollectionRegistry(settings.VECTOR_DB_PATH)
+        self.voyage_rate_limiter = AsyncRateLimiter.per_minute(
+            settings.VOYAGE_REQUESTS_PER_MINUTE
+        )
+        self.gemini_rate_limiter = AsyncRateLimiter.per_minute(
+            settings.GEMINI_REQUESTS_PER_MINUTE
+        )
+        # One embedder (and, for the local backend, one loaded model) shared by
+        # querying and ingestion
+        self.embedder = create_embedder(
+            voyage_client=self.voyage_client,
+            async_voyage_client=self.async_voyage_client,
+            cache=self.embedding_cache,
+            rate_limiter=self.voyage_rate_limiter,
+        )
+
+        self._lock = threading.Lock()
+        self._query_service: Optional[QueryService] = None
+        self._ingest_service: Optional[IngestService] = None
+        self._evaluation_service: Optional[EvaluationService] = None
+        self._ingest_jobs: Optional[IngestJobManager] = None
+
+    @property
+    def query_service(self) -> QueryService:
+        """Shared QueryService.
+
+        Built on first access rather than at startup so the API can boot before
+        the collection has been ingested.
+        """
+        if self._query_service is None:
+            with self._lock:
+                if self._query_service is None:
+                    self._query_service = QueryService(
+                        voyage_client=self.voyage_client,
+                        chroma_client=self.chroma_client,
+                        genai_client=self.genai_client,
+                        async_voyage_client=self.async_voyage_client,
+                        executor=self.chroma_executor,
+                        embedding_cache=self.embedding_cache,
+                        voyage_rate_limiter=self.voyage_rate_limiter,
+                        gemini_rate_limiter=self.gemini_rate_limiter,
+                        collection_registry=self.collection_registry,
+                        embedder=self.embedder,
+                    )
+        return self._query_service
+
+    @property
+    def ingest_service(self) -> IngestService:
+        """Shared IngestService."""
+        if self._ingest_service is None:
+            with self._lock:
+                if self._ingest_service is None:
+                    self._ingest_service = IngestService(
+                        voyage_client=self.voyage_client,
+                        chroma_client=self.chroma_client,
+                        collection_registry=self.collection_registry,
+                        embedder=self.embedder,
+                    )
+        return self._ingest_service
+
+    @property
+    def evaluation_service(self) -> EvaluationService:
+        """Shared EvaluationService wrapping the shared QueryService."""
+        if self._evaluation_service is None:
+            query_service = self.query_service
+            with self._lock:
+                if self._evaluation_service is None:
+                    self._evaluation_service = EvaluationService(
+                        query_service, genai_client=self.genai_client
+                    )
+        return self._evaluation_service
 
-# Global instances for simple singleton-like behavior or initialization logic
-_query_service = QueryService()
-_ingest_service = IngestService()
-_evaluation_service = EvaluationService(_query_service)
+    @property
+    def ingest_jobs(self) -> IngestJobManager:
+        """Background ingestion jobs; successful jobs trigger ``reload_collection``."""
+        if self._ingest_jobs is None:
+            with self._lock:
+                if self._ingest_jobs is None:
+                    self._ingest_jobs = IngestJobManager(
+                        on_complete=self.reload_collection
+                    )
+        return self._ingest_jobs
 
-def get_query_service() -> QueryService:
+    def reload_collection(self) -> None:
+        """Reload hook to call after the collection has been re-ingested.
+
+        Services that have not been built yet will pick up the new collection
+        when they are first used.
+        """
+        with logfire.span("service_container_reload"):
+            if self._query_service is not None:
+                self._query_service.reload_collection()
+
+    def collect_garbage(self) -> List[str]:
+        """Drop retired collection versions (and their BM25 indexes) past the grace period.
+
+        Ingestion only sweeps when it runs, so the lifespan calls this
+        periodically to free versions replaced by the last ingest.
+        """
+        deleted: List[str] = []
+        for alias in self.collection_registry.aliases():
+            for name in self.collection_registry.collect_garbage(alias, self.chroma_client):
+                remove_index(name, self.collection_registry.db_path)
+                deleted.append(name)
+        return deleted
+
+    def close(self) -> None:
+        """Release the shared clients at application shutdown."""
+        if self._ingest_jobs is not None:
+            self._ingest_jobs.shutdown()
+        self.chroma_executor.shutdown(wait=False, cancel_futures=True)
+        self.genai_client.close()
+        if self.embedding_cache is not None and self.embedding_cache.disk_store:
+            self.embedding_cache.disk_store.close()
+        if self._evaluation_service is not None and self._evaluation_service.eval_cache:
+            self._evaluation_service.eval_cache.close()
+
+
+def get_services(request: Request) -> ServiceContainer:
+    """Dependency provider for the application's ServiceContainer."""
+    return request.app.state.services
+
+
+def get_query_service(
+    services: ServiceContainer = Depends(get_services),
+) -> QueryService:
     """Dependency provider for QueryService."""
-    return _query_service
+    try:
+        return services.query_service
+    except Exception as e:
+        # Most likely the collection has not been ingested yet
+        raise HTTPException(
+            status_code=503, detail=f"Query service unavailable: {str(e)}"
+        ) from e
+
 
-def get_ingest_service() -> IngestService:
+def get_ingest_service(
+    services: ServiceContainer = Depends(get_services),
+) -> IngestService:
     """Dependency provider for IngestService."""
-    return _ingest_service
+    return services.ingest_service
+
+
+def get_ingest_jobs(
+    services: ServiceContainer = Depends(get_services),
+) -> IngestJobManager:
+    """Dependency provider for the background IngestJobManager."""
+    return services.ingest_jobs
 
-def get_evaluation_service() -> EvaluationService:
+
+def get_evaluation_service(
+    services: ServiceContainer = Depends(get_services),
+) -> EvaluationService:
     """Dependency provider for EvaluationService."""
-    return _evaluation_service
+    return services.evaluation_service
+
+
+def get_batch_service(
+    query_service: QueryService = Depends(get_query_service),
+) -> BatchProcessingService:
+    """Dependency provider for BatchProcessingService."""
+    return BatchProcessingService(query_service)
@@ -1,9 +1,14 @@
-from app.routers import batch, query, ingest, evaluation
-from app.core.config import settings
-from fastapi import FastAPI
-from starlette.middleware.cors import CORSMiddleware
+import asyncio
+from contextlib import asynccontextmanager
+
 import logfire
+from fastapi import FastAPI
 from scalar_fastapi import get_scalar_api_reference
+from starlette.middleware.cors import CORSMiddleware
+
+from app.core.config import settings
+from app.dependencies import ServiceContainer
+from app.routers import batch, evaluation, ingest, metrics, query
 
 # Configure logfire defensively
 if settings.LOGFIRE_TOKEN:
@@ -12,8 +17,36 @@ else:
     # Disable logfire if no token is provided to avoid authentication errors
     pass
 
+
+async def collect_garbage_periodically(services: ServiceContainer) -> None:
+    """Sweep retired collection versions every COLLECTION_GC_INTERVAL_SECONDS."""
+    while True:
+        await asyncio.sleep(settings.COLLECTION_GC_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(services.collect_garbage)
+        except Exception as e:
+            logfire.warn("Collection garbage collection failed", error=str(e))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the shared API clients and services once per process."""
+    services = ServiceContainer()
+    app.state.services = services
+    sweeper = None
+    if settings.COLLECTION_GC_INTERVAL_SECONDS > 0:
+        sweeper = asyncio.create_task(collect_garbage_periodically(services))
+    try:
+        yield
+    finally:
+        if sweeper is not None:
+            sweeper.cancel()
+        services.close()
+
+
 # Create FastAPI app
 app = FastAPI(
+    lifespan=lifespan,
     title=settings.APP_NAME,
     description="API for answering Medicare questions using RAG",
     version=settings.VERSION,
@@ -46,6 +79,8 @@ app.include_router(batch.router, prefix="/api/v1", tags=["batch"])
 app.include_router(query.router, prefix="/api/v1", tags=["query"])
 app.include_router(ingest.router, prefix="/api/v1", tags=["ingest"])
 app.include_router(evaluation.router, prefix="/api/v1", tags=["evaluation"])
+# Unversioned, where Prometheus scrapes by default
+app.include_router(metrics.router, tags=["metrics"])
 
 
 @app.get("/")
@@ -1,4 +1,5 @@
-from typing import ClassVar, List, Optional
+from datetime import datetime
+from typing import Any, ClassVar, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -15,6 +16,24 @@ class QueryResult(BaseModel):
     answer: str = Field(description="The generated answer to the query")
     source_chunks: List[str] = Field(description="List of source chunk identifiers")
     source_text: List[str] = Field(description="List of supporting text from sources")
+    context_text: Optional[List[str]] = Field(
+        None,
+        description=(
+            "Text of each source as sent to the LLM: repeated sentences removed "
+            "and, over the context token budget, trimmed to the most relevant"
+        ),
+    )
+    prompt_tokens: Optional[int] = Field(
+        None,
+        description="Prompt tokens sent to the LLM (provider count, else an estimate; 0 for cached answers)",
+    )
+    cached_prompt_tokens: Optional[int] = Field(
+        None, description="Prompt tokens served from the provider's prefix cache"
+    )
+    cached_from: Optional[str] = Field(
+        None,
+        description="For an answer reused from the semantic cache, the question it was generated for",
+    )
 
     class Config:
         json_schema_extra: ClassVar[dict] = {
@@ -41,3 +60,73 @@ class QueryRequest(BaseModel):
     rerank_top_k: Optional[int] = Field(
         None, description="Number of documents to return after reranking"
     )
+
+
+class BatchRequest(BaseModel):
+    """Request model for a batch run; every field falls back to a default."""
+
+    queries_path: Optional[str] = Field(
+        None, description="JSON or JSONL file of {id, text} queries to answer"
+    )
+    answers_path: Optional[str] = Field(
+        None,
+        description=(
+            "JSONL file answers are streamed to (also the checkpoint), relative to "
+            "BATCH_OUTPUT_DIR; paths outside it are rejected"
+        ),
+    )
+    resume: bool = Field(
+        True, description="Skip query ids already answered in answers_path"
+    )
+    concurrency: Optional[int] = Field(
+        None, ge=1, description="Maximum number of queries answered concurrently"
+    )
+
+
+class IngestJobStatus(BaseModel):
+    """Status of a background ingestion job."""
+
+    job_id: str = Field(description="Unique identifier for the job")
+    collection_name: str = Field(description="Collection the job writes to")
+    status: str = Field(description="queued, running, succeeded or failed")
+    stage: Optional[str] = Field(
+        None,
+        description=(
+            "Current stage: reading, chunking, embedding, writing, validating or indexing"
+        ),
+    )
+    documents_total: int = Field(0, description="Documents in the job")
+    documents_done: int = Field(
+        0, description="Documents written, found unchanged or failed so far"
+    )
+    documents_per_second: Optional[float] = Field(
+        None, description="Document throughput since the job started running"
+    )
+    chunk_count: int = Field(0, description="Chunks produced by semantic chunking")
+    chunks_embedded: int = Field(0, description="Chunks embedded so far")
+    chunks_written: int = Field(0, description="Chunks written to Chroma so far")
+    chunks_per_second: Optional[float] = Field(
+        None, description="Embedding throughput since the job started running"
+    )
+    submitted_at: datetime = Field(description="When the job was submitted")
+    started_at: Optional[datetime] = Field(None, description="When the job started")
+    finished_at: Optional[datetime] = Field(None, description="When the job finished")
+    error: Optional[str] = Field(None, description="Error message if the job failed")
+    result: Optional[Dict[str, Any]] = Field(
+        None, description="Ingestion summary once the job has succeeded"
+    )
+
+
+class IngestDocumentsRequest(BaseModel):
+    """Request model for ingesting a directory or manifest of documents."""
+
+    directory: Optional[str] = Field(
+        None, description="Directory searched recursively for Markdown and text files"
+    )
+    manifest_path: Optional[str] = Field(
+        None,
+        description="JSON or JSONL manifest of {path, source, metadata} entries",
+    )
+    patterns: Optional[List[str]] = Field(
+        None, description="File name patterns used with directory, e.g. ['*.md']"
+    )
@@ -1,40 +1,42 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException
 
+from ..dependencies import get_batch_service
+from ..models.schemas import BatchRequest
 from ..services.batch import BatchProcessingService
-from ..services.query import QueryService
 
 router = APIRouter()
 
 
-def get_query_service():
-    """Dependency to get the core service instance."""
-    return QueryService()
-
-
-def get_batch_service(query_service: QueryService = Depends(get_query_service)):
-    """Dependency to get the batch processing service."""
-    return BatchProcessingService(query_service)
-
-
 @router.post(
     "/process-batch",
-    summary="Process queries from the hardcoded file and write answers to another hardcoded file",
+    summary="Answer a file of queries and stream the answers to a JSONL file",
 )
 async def process_batch(
+    request: Optional[BatchRequest] = None,
     batch_service: BatchProcessingService = Depends(get_batch_service),
 ):
     """
-    Process a batch of questions from a hardcoded file and save results to another hardcoded file.
+    Process a batch of questions from a file and stream the results to another file.
 
     This endpoint:
-    1. Reads questions from app/gen-ai-homework-assignment/input/queries.json
-    2. Processes each question using the RAG pipeline
-    3. Saves the results to app/gen-ai-homework-assignment/output/answers.json
+    1. Reads questions from `queries_path` (default: app/gen-ai-homework-assignment/input/queries.json)
+    2. Answers them concurrently using the RAG pipeline
+    3. Appends each result to `answers_path` (default: answers.jsonl), a file inside
+       BATCH_OUTPUT_DIR, as soon as it finishes; with `resume`, already-answered
+       query ids are skipped
 
     Returns status and information about the batch processing.
     """
+    request = request or BatchRequest()
     try:
-        result = batch_service.process_batch()
+        result = await batch_service.process_batch(
+            queries_path=request.queries_path,
+            answers_path=request.answers_path,
+            resume=request.resume,
+            concurrency=request.concurrency,
+        )
         return result
 
     except FileNotFoundError as e:
@@ -3,8 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 
 from ..services.evaluation import EvaluationService
-from ..services.query import QueryService
-from ..dependencies import get_query_service
+from ..dependencies import get_evaluation_service
 
 router = APIRouter()
 
@@ -34,13 +33,6 @@ class ModelComparisonRequest(BaseModel):
     eval_id: Optional[str] = None
 
 
-def get_evaluation_service(
-    query_service: QueryService = Depends(get_query_service),
-) -> EvaluationService:
-    """Dependency to get evaluation service instance."""
-    return EvaluationService(query_service)
-
-
 @router.post("/evaluate-query", summary="Evaluate a single query")
 async def evaluate_query(
     request: EvaluationRequest,
@@ -84,7 +76,7 @@ async def evaluate_dataset(
         Overall evaluation metrics and individual results
     """
     try:
-        result = evaluation_service.evaluate_dataset(
+        result = await evaluation_service.aevaluate_dataset(
             dataset=request.dataset,
             eval_id=request.eval_id,
             model_version=request.model_version,
@@ -104,19 +96,27 @@ async def compare_models(
     """
     Compare performance of different model versions on the same dataset.
 
+    Retrieval and reranking run once per query; every model answers from the
+    same context.
+
     Args:
         request: The comparison request containing dataset and model versions
         evaluation_service: The evaluation service instance
 
     Returns:
-        Comparison results for each model version
+        A table of quality, latency and token use per model version, plus the
+        individual results
     """
     try:
-        result = evaluation_service.compare_model_versions(
+        result = await evaluation_service.acompare_model_versions(
             dataset=request.dataset,
             model_versions=request.model_versions,
             eval_id=request.eval_id,
         )
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error comparing models: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Error comparing models: {str(e)}"
+        ) from e
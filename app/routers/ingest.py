@@ -1,41 +1,105 @@
+from typing import List
+
 from fastapi import APIRouter, Depends, HTTPException
 
-from ..services.ingest import IngestService
+from ..dependencies import get_ingest_jobs, get_ingest_service
+from ..models.schemas import IngestDocumentsRequest, IngestJobStatus
+from ..services.ingest import (
+    DEFAULT_PATTERNS,
+    IngestService,
+    discover_documents,
+    load_manifest,
+)
+from ..services.jobs import IngestJobManager
 
 router = APIRouter()
 
 
-def get_ingest_service():
-    """Dependency to get the ingest service instance."""
-    return IngestService()
-
-
 @router.post(
     "/ingest-medicare-docs",
-    summary="Ingest medicare documentation into the vector database",
+    response_model=IngestJobStatus,
+    status_code=202,
+    summary="Start a background job that ingests medicare documentation",
 )
-async def ingest_medicare_docs(service: IngestService = Depends(get_ingest_service)):
+async def ingest_medicare_docs(
+    service: IngestService = Depends(get_ingest_service),
+    jobs: IngestJobManager = Depends(get_ingest_jobs),
+):
     """
-    Ingest medicare documentation into the vector database.
+    Queue ingestion of medicare documentation into the vector database.
 
     This endpoint uses hardcoded paths:
     - Markdown file: app/gen-ai-homework-assignment/input/medicare_comparison.md
     - Chroma DB path: vector_db
     - Collection name: medicare_docs
 
-    Returns status and information about the ingestion.
+    Returns immediately with a job id; poll `GET /ingest-jobs/{job_id}` for
+    progress. Jobs against the same collection run one at a time.
     """
-    try:
-        result = service.ingest_medicare_docs()
-        return result
+    return jobs.submit(service.ingest_medicare_docs)
 
-    except FileNotFoundError as e:
-        raise HTTPException(status_code=404, detail=str(e))
 
-    except ValueError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@router.post(
+    "/ingest-documents",
+    response_model=IngestJobStatus,
+    status_code=202,
+    summary="Start a background job that ingests a directory or manifest of documents",
+)
+async def ingest_documents(
+    request: IngestDocumentsRequest,
+    service: IngestService = Depends(get_ingest_service),
+    jobs: IngestJobManager = Depends(get_ingest_jobs),
+):
+    """
+    Queue ingestion of many Markdown/text documents into the vector database.
 
-    except Exception as e:
+    Provide either a `directory` (searched recursively) or a `manifest_path`
+    listing files with optional per-file `source` and `metadata`. Unchanged
+    documents are skipped; poll `GET /ingest-jobs/{job_id}` for progress.
+    """
+    if bool(request.directory) == bool(request.manifest_path):
         raise HTTPException(
-            status_code=500, detail=f"Error ingesting medicare docs: {str(e)}"
+            status_code=400, detail="Provide exactly one of directory or manifest_path"
         )
+    try:
+        if request.directory:
+            documents = discover_documents(
+                request.directory, request.patterns or DEFAULT_PATTERNS
+            )
+        else:
+            documents = load_manifest(request.manifest_path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    if not documents:
+        raise HTTPException(status_code=400, detail="No documents to ingest")
+
+    return jobs.submit(lambda progress: service.ingest_documents(documents, progress))
+
+
+@router.get(
+    "/ingest-jobs/{job_id}",
+    response_model=IngestJobStatus,
+    summary="Get the status of an ingestion job",
+)
+async def get_ingest_job(job_id: str, jobs: IngestJobManager = Depends(get_ingest_jobs)):
+    """
+    Report the stage, chunk counts, throughput and any error for an ingestion job.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job not found: {job_id}")
+    return job
+
+
+@router.get(
+    "/ingest-jobs",
+    response_model=List[IngestJobStatus],
+    summary="List recent ingestion jobs",
+)
+async def list_ingest_jobs(jobs: IngestJobManager = Depends(get_ingest_jobs)):
+    """
+    List recent ingestion jobs, oldest first.
+    """
+    return jobs.list()
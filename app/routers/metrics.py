@@ -0,0 +1,29 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..core.metrics import metrics
+
+router = APIRouter()
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get(
+    "/metrics",
+    summary="Per-stage latency quantiles and counters in Prometheus format",
+    response_class=PlainTextResponse,
+)
+async def get_metrics():
+    """
+    Export in-process metrics for Prometheus to scrape.
+
+    Recorded whether or not Logfire is configured:
+    - `rag_stage_duration_seconds{stage}`: p50/p95/p99, sum and count for
+      embed, retrieve, rerank, generate, first_token and answer, plus the
+      chunking and ingestion stages
+    - `rag_api_calls_total{provider,operation}`, `rag_tokens_total{kind}`,
+      `rag_cache_lookups_total{cache,result}` and `rag_errors_total{stage}`
+    - `rag_ingest_documents_total{result}` and `rag_ingest_chunks_total{result}`
+    """
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
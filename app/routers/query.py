@@ -1,17 +1,19 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, Any
+import asyncio
+import json
+from typing import AsyncIterator
 
-from ..services.query import QueryService
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+
+from ..dependencies import get_query_service
 from ..models.schemas import QueryRequest, QueryResult
+from ..services.query import QueryService, StreamEvent
 
 router = APIRouter()
 
 
-def get_query_service():
-    """Dependency to get the query service instance."""
-    return QueryService()
-
-
 @router.post("/ask", response_model=QueryResult, summary="Answer a question using RAG")
 async def ask_question(
     query: QueryRequest, service: QueryService = Depends(get_query_service)
@@ -25,7 +27,7 @@ async def ask_question(
     Returns the answer along with source information.
     """
     try:
-        result = service.answer_question(
+        result = await service.aanswer_question(
             query=query.query,
             query_id=query.query_id,
             top_k=query.top_k or 10,
@@ -40,3 +42,131 @@ async def ask_question(
         raise HTTPException(
             status_code=500, detail=f"Error answering question: {str(e)}"
         )
+
+
+@router.post(
+    "/ask/speculative",
+    response_model=QueryResult,
+    summary="Answer a question using RAG with speculative pipelining",
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/json": {"schema": QueryRequest.model_json_schema()}},
+            "required": True,
+        }
+    },
+)
+async def ask_question_speculative(
+    request: Request, service: QueryService = Depends(get_query_service)
+):
+    """
+    Pipelined variant of ``/ask``.
+
+    The query embedding is requested as soon as the question text can be
+    read from the body, before the rest of the request is validated, and
+    generation starts on the top vector hits while reranking runs (see
+    ``QueryService.aanswer_speculative``).
+    """
+    body = await request.body()
+    embedding = None
+    try:
+        text = json.loads(body).get("query")
+    except (ValueError, AttributeError):
+        text = None
+    if isinstance(text, str) and text:
+        embedding = asyncio.create_task(service.retriever.aembed_query(text))
+
+    try:
+        try:
+            query = QueryRequest.model_validate_json(body)
+        except ValidationError as e:
+            raise RequestValidationError(e.errors()) from e
+
+        try:
+            return await service.aanswer_speculative(
+                query=query.query,
+                query_id=query.query_id,
+                top_k=query.top_k or 10,
+                rerank_top_k=query.rerank_top_k or 3,
+                query_embedding=embedding,
+            )
+
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail=f"Error answering question: {str(e)}"
+            ) from e
+    finally:
+        # A no-op once consumed; otherwise (invalid body, an error or a
+        # disconnect before the service awaited it) stop the embed request
+        if embedding is not None:
+            embedding.cancel()
+
+
+def _format_sse(event: StreamEvent) -> str:
+    data = event.data.model_dump() if isinstance(event.data, BaseModel) else event.data
+    return f"event: {event.event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post(
+    "/ask/stream",
+    summary="Answer a question using RAG, streamed as server-sent events",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def ask_question_stream(
+    query: QueryRequest, service: QueryService = Depends(get_query_service)
+):
+    """
+    Streaming variant of ``/ask`` using server-sent events.
+
+    Events, in order:
+
+    - ``sources``: ``{query_id, source_chunks, source_text, context_text}`` once
+      reranking completes
+    - ``token``: a fragment of the answer text (repeated)
+    - ``error``: generation failed part-way; the message is also the final answer
+    - ``result``: the complete ``QueryResult``
+    """
+    events = service.astream_answer(
+        query=query.query,
+        query_id=query.query_id,
+        top_k=query.top_k or 10,
+        rerank_top_k=query.rerank_top_k or 3,
+    )
+    # Run retrieval and reranking before the response starts, so their
+    # failures still map to HTTP status codes
+    try:
+        first = await events.__anext__()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error answering question: {str(e)}"
+        ) from e
+
+    async def stream() -> AsyncIterator[str]:
+        yield _format_sse(first)
+        async for event in events:
+            yield _format_sse(event)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/cache-stats", summary="Query cache hit/miss counters")
+async def cache_stats(service: QueryService = Depends(get_query_service)):
+    """
+    Report hit/miss counters for the query-embedding and semantic answer caches.
+    """
+    embedding_cache = service.embedding_cache
+    answer_cache = service.answer_cache
+    return {
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "answer_cache": answer_cache.stats() if answer_cache else None,
+    }
@@ -1,86 +1,221 @@
+import asyncio
 import json
 import os
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Set
 
+import logfire
+
+from ..core.config import settings
+from ..services.embeddings import VOYAGE_MAX_BATCH_TEXTS
 from ..services.query import QueryService
 
 
 class BatchProcessingService:
-    """Service for processing batches of queries from a hardcoded file."""
-
-    # Hardcoded paths for demo
+    """Service for answering batches of queries from a file.
+
+    Queries are embedded and searched in groups (one embed request and one
+    multi-vector Chroma query per group), then reranked and answered
+    concurrently (bounded by ``concurrency``) on the async RAG path, so the
+    Voyage and Gemini rate limiters configured on the QueryService apply.
+    Each result is appended to a JSONL answers file as soon
+    as it finishes; that file doubles as the checkpoint, so a re-run skips any
+    ``query_id`` that already has a successful answer.
+
+    Answers files are confined to ``BATCH_OUTPUT_DIR``: callers (including
+    the HTTP API) name a file inside it, never an arbitrary path to truncate.
+    """
+
+    # Defaults used when the caller does not supply paths; the answers file
+    # is relative to BATCH_OUTPUT_DIR
     QUERIES_PATH = "app/gen-ai-homework-assignment/input/queries.json"
-    ANSWERS_PATH = "app/gen-ai-homework-assignment/output/answers.json"
+    ANSWERS_FILENAME = "answers.jsonl"
 
-    def __init__(self, query_service: QueryService):
+    def __init__(self, query_service: QueryService, concurrency: Optional[int] = None):
         """Initialize with the query service.
 
         Args:
             query_service: The QueryService for answering queries
+            concurrency: Maximum queries in flight; defaults to BATCH_CONCURRENCY
         """
         self.query_service = query_service
+        self.concurrency = concurrency or settings.BATCH_CONCURRENCY
 
-    def process_batch(self) -> Dict[str, Any]:
-        """Process a batch of questions from the hardcoded file.
+    @staticmethod
+    def _load_queries(queries_path: str) -> List[Dict[str, Any]]:
+        """Read queries from a JSON array or a JSONL file."""
+        if not os.path.exists(queries_path):
+            raise FileNotFoundError(f"Queries file not found at: {queries_path}")
 
-        Returns:
-            Dict with processing status and details
+        try:
+            with open(queries_path, "r") as f:
+                if queries_path.endswith(".jsonl"):
+                    return [json.loads(line) for line in f if line.strip()]
+                return json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(
+                f"Invalid JSON format in queries file: {queries_path}"
+            ) from e
+
+    @classmethod
+    def _resolve_answers_path(cls, answers_path: Optional[str]) -> str:
+        """Resolve ``answers_path`` inside BATCH_OUTPUT_DIR.
 
         Raises:
-            FileNotFoundError: If the queries file doesn't exist
-            ValueError: For JSON format issues or processing errors
+            ValueError: If the path (after following symlinks) leaves the directory
         """
-
-        if not os.path.exists(self.QUERIES_PATH):
-            raise FileNotFoundError(
-                f"Queries file not found at hardcoded path: {self.QUERIES_PATH}"
-            )
-
-        try:
-            with open(self.QUERIES_PATH, "r") as f:
-                queries_data = json.load(f)
-        except json.JSONDecodeError:
+        root = os.path.realpath(settings.BATCH_OUTPUT_DIR)
+        name = answers_path or cls.ANSWERS_FILENAME
+        path = os.path.realpath(os.path.join(root, name))
+        if path == root or os.path.commonpath([root, path]) != root:
             raise ValueError(
-                f"Invalid JSON format in queries file: {self.QUERIES_PATH}"
+                f"answers_path must name a file inside {settings.BATCH_OUTPUT_DIR}: "
+                f"{answers_path}"
             )
+        return path
+
+    @staticmethod
+    def _load_checkpoint(answers_path: str) -> Set[str]:
+        """Return the query ids that already have a successful answer."""
+        completed: Set[str] = set()
+        if not os.path.exists(answers_path):
+            return completed
+        with open(answers_path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave a truncated final line behind
+                    continue
+                # Generator failures are returned as "Error: ..." answers; retry those
+                if record.get("query_id") and not record.get("answer", "").startswith(
+                    "Error"
+                ):
+                    completed.add(record["query_id"])
+        return completed
+
+    async def process_batch(
+        self,
+        queries_path: Optional[str] = None,
+        answers_path: Optional[str] = None,
+        resume: bool = True,
+        concurrency: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Answer every query in ``queries_path`` and stream results to ``answers_path``.
 
-        results = []
-        for query_item in queries_data:
-            try:
-                query_text = query_item.get("text", "")
-                query_id = query_item.get("id", "")
+        Args:
+            queries_path: JSON array or JSONL of ``{"id", "text"}`` items
+            answers_path: JSONL file results are appended to, relative to
+                BATCH_OUTPUT_DIR
+            resume: Skip query ids already answered in ``answers_path``;
+                when False the answers file is truncated first
+            concurrency: Overrides the service's concurrency limit for this run
 
-                result = self.query_service.answer_question(
-                    query=query_text,
-                    query_id=query_id,
-                )
+        Returns:
+            Dict with processing status and details
 
-                results.append(result.model_dump())
-            except Exception as e:
+        Raises:
+            FileNotFoundError: If the queries file doesn't exist
+            ValueError: For JSON format issues, or an ``answers_path`` outside
+                BATCH_OUTPUT_DIR
+        """
+        queries_path = queries_path or self.QUERIES_PATH
+        answers_path = self._resolve_answers_path(answers_path)
+        concurrency = concurrency or self.concurrency
+
+        queries_data = self._load_queries(queries_path)
+        completed = self._load_checkpoint(answers_path) if resume else set()
+        remaining = [q for q in queries_data if q.get("id", "") not in completed]
+        skipped_count = len(queries_data) - len(remaining)
+        # Retrieved groups wait here for the answer workers; bounded so
+        # retrieval never runs far ahead of generation
+        ready: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+        counts = {"processed": 0, "failed": 0}
+
+        os.makedirs(os.path.dirname(answers_path), exist_ok=True)
+
+        with logfire.span(
+            "process_batch",
+            query_count=len(queries_data),
+            skipped=skipped_count,
+            concurrency=concurrency,
+        ), open(answers_path, "a" if resume else "w") as out:
+            if out.tell():
+                # Terminate a truncated final line so the next record parses
+                with open(answers_path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        out.write("\n")
+
+            def write(record: Dict[str, Any]) -> None:
+                # Runs on the event loop thread, so lines never interleave
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+
+            def write_failure(query_id: str, query_text: str, error: Exception) -> None:
                 # Log error but continue processing other queries
-                print(
-                    f"Error processing query {query_item.get('id', 'unknown')}: {str(e)}"
+                logfire.error(
+                    "Error processing batch query", query_id=query_id, error=str(error)
                 )
-                # Add a failed result to the results list
-                results.append(
+                write(
                     {
-                        "id": query_item.get("id", "unknown"),
+                        "id": query_id or "unknown",
                         "text": query_text,
-                        "error": str(e),
+                        "error": str(error),
                         "status": "failed",
                     }
                 )
-
-        # Write results to the answers file
-        os.makedirs(os.path.dirname(self.ANSWERS_PATH), exist_ok=True)
-        with open(self.ANSWERS_PATH, "w") as f:
-            json.dump(results, f, indent=2)
+                counts["failed"] += 1
+
+            async def producer() -> None:
+                for start in range(0, len(remaining), VOYAGE_MAX_BATCH_TEXTS):
+                    group = remaining[start : start + VOYAGE_MAX_BATCH_TEXTS]
+                    texts = [item.get("text", "") for item in group]
+                    try:
+                        all_candidates = await self.query_service.aretrieve_candidates(
+                            texts
+                        )
+                    except Exception as e:
+                        for item in group:
+                            write_failure(item.get("id", ""), item.get("text", ""), e)
+                        continue
+                    for item, candidates in zip(group, all_candidates, strict=True):
+                        await ready.put((item, candidates))
+                for _ in range(concurrency):
+                    await ready.put(None)
+
+            async def worker() -> None:
+                while (entry := await ready.get()) is not None:
+                    query_item, candidates = entry
+                    query_text = query_item.get("text", "")
+                    query_id = query_item.get("id", "")
+                    try:
+                        result = await self.query_service.aanswer_question(
+                            query=query_text,
+                            query_id=query_id,
+                            candidates=candidates,
+                        )
+                        write(result.model_dump())
+                        counts["processed"] += 1
+                    except Exception as e:
+                        write_failure(query_id, query_text, e)
+
+            # A failure in the producer or any worker cancels the rest, so
+            # nothing is left waiting on the queue forever
+            try:
+                async with asyncio.TaskGroup() as tasks:
+                    tasks.create_task(producer())
+                    for _ in range(concurrency):
+                        tasks.create_task(worker())
+            except ExceptionGroup as group:
+                raise group.exceptions[0] from None
 
         return {
             "status": "success",
             "message": "Successfully processed batch queries",
             "query_count": len(queries_data),
-            "processed_count": len(results),
-            "queries_path": self.QUERIES_PATH,
-            "answers_path": self.ANSWERS_PATH,
+            "processed_count": counts["processed"],
+            "failed_count": counts["failed"],
+            "skipped_count": skipped_count,
+            "queries_path": queries_path,
+            "answers_path": answers_path,
         }
@@ -0,0 +1,172 @@
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import chromadb
+import logfire
+
+from ..core.config import settings
+
+# Called as progress(records_written) after each batch lands in Chroma
+WriteProgress = Callable[[int], None]
+
+
+def max_batch_size(client: Optional[chromadb.ClientAPI]) -> Optional[int]:
+    """The largest write Chroma accepts, or ``None`` if the client doesn't say."""
+    if client is None:
+        return None
+    getter = getattr(client, "get_max_batch_size", None)
+    if getter is not None:
+        return getter()
+    return getattr(client, "max_batch_size", None)  # chromadb < 0.5
+
+
+class BulkWriter:
+    """Buffered, batched writes into a Chroma collection.
+
+    Records are buffered and written in batches of ``batch_size`` (capped at
+    the client's maximum batch size) on a background thread, so the caller
+    can embed the next batch while the previous one is being written. At
+    most ``max_pending`` batches wait for the writer; beyond that ``add``
+    blocks, which keeps memory bounded however many records are loaded.
+
+    Writes use ``upsert`` so retried or overlapping loads are idempotent.
+    ``fast_load`` switches to ``add``, which skips the existing-id lookups
+    and is meant for initial builds into an empty collection.
+
+    Use as a context manager, or call ``close()`` to flush and wait; the
+    first write error is re-raised from ``add``, ``flush`` or ``close``.
+    A writer is fed from one thread at a time.
+    """
+
+    def __init__(
+        self,
+        collection: chromadb.Collection,
+        client: Optional[chromadb.ClientAPI] = None,
+        batch_size: Optional[int] = None,
+        fast_load: bool = False,
+        progress: Optional[WriteProgress] = None,
+        max_pending: int = 2,
+    ):
+        """
+        Args:
+            collection: Collection to write into
+            client: Client owning the collection, used to look up Chroma's
+                maximum batch size
+            batch_size: Records per write; defaults to CHROMA_WRITE_BATCH_SIZE
+            fast_load: Use ``add`` instead of ``upsert``
+            progress: Called with the running total after each batch is written
+            max_pending: Batches queued for the writer before ``add`` blocks
+        """
+        self.collection = collection
+        self.fast_load = fast_load
+        self.progress = progress
+        self.batch_size = batch_size or settings.CHROMA_WRITE_BATCH_SIZE
+        limit = max_batch_size(client)
+        if limit:
+            self.batch_size = min(self.batch_size, limit)
+        self.written = 0
+        self.batches = 0
+        self._buffer: Dict[str, List[Any]] = self._empty()
+        self._pending: queue.Queue = queue.Queue(maxsize=max(1, max_pending))
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._drain, name="chroma-bulk-writer", daemon=True
+        )
+        self._thread.start()
+
+    @staticmethod
+    def _empty() -> Dict[str, List[Any]]:
+        return {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+
+    def __enter__(self) -> "BulkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ) -> None:
+        """Buffer records, handing full batches to the writer thread."""
+        self._raise_if_failed()
+        if self._closed:
+            raise ValueError("BulkWriter is closed")
+        buffer = self._buffer
+        buffer["ids"].extend(ids)
+        buffer["embeddings"].extend(embeddings)
+        buffer["documents"].extend(documents)
+        buffer["metadatas"].extend(metadatas)
+        while len(buffer["ids"]) >= self.batch_size:
+            self._submit(
+                {name: values[: self.batch_size] for name, values in buffer.items()}
+            )
+            for values in buffer.values():
+                del values[: self.batch_size]
+
+    def flush(self) -> None:
+        """Hand off any partial batch and wait until everything is written."""
+        if self._buffer["ids"]:
+            self._submit(self._buffer)
+            self._buffer = self._empty()
+        self._pending.join()
+        self._raise_if_failed()
+
+    def close(self) -> None:
+        """Flush and stop the writer thread."""
+        if self._closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._closed = True
+            self._pending.put(None)
+            self._thread.join()
+
+    def abort(self) -> None:
+        """Stop without writing buffered records."""
+        if self._closed:
+            return
+        self._closed = True
+        self._buffer = self._empty()
+        self._error = self._error or RuntimeError("BulkWriter aborted")
+        self._pending.put(None)
+        self._thread.join()
+
+    def _submit(self, batch: Dict[str, List[Any]]) -> None:
+        self._pending.put(batch)
+        self._raise_if_failed()
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None and not self._closed:
+            raise self._error
+
+    def _drain(self) -> None:
+        write = self.collection.add if self.fast_load else self.collection.upsert
+        while True:
+            batch = self._pending.get()
+            try:
+                if batch is None:
+                    return
+                if self._error is not None:
+                    continue  # Drop remaining batches after a failure
+                with logfire.span(
+                    "chroma_bulk_write", records=len(batch["ids"]), fast_load=self.fast_load
+                ):
+                    write(**batch)
+                self.written += len(batch["ids"])
+                self.batches += 1
+                if self.progress is not None:
+                    self.progress(self.written)
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._pending.task_done()
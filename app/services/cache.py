@@ -0,0 +1,446 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+from ..core.metrics import CACHE_LOOKUPS, metrics
+from ..models.schemas import QueryResult
+
+
+def normalize_query(text: str) -> str:
+    """Normalize query text so trivially different spellings share a cache key."""
+    return " ".join(text.lower().split())
+
+
+# Words, keeping amounts ("$240"), percentages ("20%") and contractions whole
+WORD = re.compile(r"\$?\w[\w.%'-]*")
+
+# Program and product names that tell questions apart wherever they appear
+# and however they are capitalized ("medigap", "Original Medicare")
+DOMAIN_TERMS = frozenset(
+    {"medicare", "medicaid", "medigap", "original", "advantage", "supplement"}
+)
+
+# Words a part or plan letter follows ("Part B", "plan g", "Parts A and B")
+LETTER_PREFIXES = frozenset({"part", "parts", "plan", "plans"})
+
+
+def question_entities(text: str) -> frozenset:
+    """Tokens that make two otherwise similar questions different.
+
+    These count wherever they appear: numbers and amounts ("2024", "$240"),
+    part and plan letters ("Part B" and "Plan B" differ), other capital
+    letters except "I" and "A", acronyms ("HMO") and ``DOMAIN_TERMS``
+    ("Medigap"). Any other capitalized word ("Humana") counts only when it
+    does not start a sentence, since every question's first word is
+    capitalized. Case and position differences can only cause a miss, never
+    a false hit.
+    """
+    entities = set()
+    previous = ""
+    previous_end = 0
+    for match in WORD.finditer(text):
+        word = match.group().rstrip(".")
+        lower = word.lower()
+        # WORD can swallow a full stop ("$240."), so look back one character
+        gap = text[max(previous_end - 1, 0) : match.start()]
+        sentence_start = previous_end == 0 or any(c in gap for c in ".?!:")
+        prefix = previous.rstrip("s") if previous in LETTER_PREFIXES else None
+        previous, previous_end = lower, match.end()
+        if lower.split("'")[0] == "i" or lower in LETTER_PREFIXES:
+            # The pronoun ("I", "I'm"); letters carry their part or plan prefix
+            continue
+        if any(c.isdigit() for c in word):
+            entities.add(lower)
+        elif lower in DOMAIN_TERMS:
+            entities.add(lower)
+        elif len(word) == 1:
+            if prefix:
+                entities.add(f"{prefix} {lower}")
+            elif word.isupper() and word != "A":
+                entities.add(lower)
+        elif word.isupper() or (word[:1].isupper() and not sentence_start):
+            entities.add(lower)
+    return frozenset(entities)
+
+
+class SQLiteEmbeddingStore:
+    """On-disk embedding tier that survives process restarts.
+
+    Embeddings are stored as float32 blobs keyed by (model, normalized text).
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None):
+        """
+        Args:
+            path: SQLite database file to create or reuse
+            ttl_seconds: Entries older than this are treated as missing
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (model, text)
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, key: Tuple[str, str]) -> Optional[List[float]]:
+        model, text = key
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT embedding, created_at FROM embeddings WHERE model = ? AND text = ?",
+                (model, text),
+            ).fetchone()
+        if row is None:
+            return None
+        blob, created_at = row
+        if self.ttl_seconds and time.time() - created_at > self.ttl_seconds:
+            return None
+        return np.frombuffer(blob, dtype=np.float32).tolist()
+
+    def put(self, key: Tuple[str, str], embedding: List[float]) -> None:
+        model, text = key
+        blob = np.asarray(embedding, dtype=np.float32).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+                (model, text, blob, time.time()),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingCache:
+    """Two-tier cache for query embeddings.
+
+    An in-process LRU tier bounded by size and TTL sits in front of an optional
+    on-disk SQLite tier. Keys are the normalized query text plus the embedding
+    model name, so a model change never serves stale vectors.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        ttl_seconds: Optional[float] = None,
+        disk_store: Optional[SQLiteEmbeddingStore] = None,
+    ):
+        """
+        Args:
+            max_size: Maximum number of embeddings held in memory
+            ttl_seconds: Lifetime of an in-memory entry; ``None`` means no expiry
+            disk_store: Optional persistent tier consulted on memory misses
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.disk_store = disk_store
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[List[float], float]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_settings(cls) -> Optional["EmbeddingCache"]:
+        """Build the cache configured in ``Settings``; ``None`` when disabled."""
+        if settings.EMBEDDING_CACHE_SIZE <= 0:
+            return None
+        disk_store = None
+        if settings.EMBEDDING_CACHE_PATH:
+            disk_store = SQLiteEmbeddingStore(
+                settings.EMBEDDING_CACHE_PATH,
+                ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+            )
+        return cls(
+            max_size=settings.EMBEDDING_CACHE_SIZE,
+            ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+            disk_store=disk_store,
+        )
+
+    @staticmethod
+    def _key(text: str, model: str) -> Tuple[str, str]:
+        return model, normalize_query(text)
+
+    def _remember(self, key: Tuple[str, str], embedding: List[float]) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else 0.0
+        self._entries[key] = (embedding, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        """Return the cached embedding for ``text`` or ``None`` on a miss."""
+        key = self._key(text, model)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                embedding, expires_at = entry
+                if not expires_at or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    metrics.inc(CACHE_LOOKUPS, cache="embedding", result="hit")
+                    return embedding
+                del self._entries[key]
+
+        if self.disk_store is not None:
+            embedding = self.disk_store.get(key)
+            if embedding is not None:
+                with self._lock:
+                    self._remember(key, embedding)
+                    self.disk_hits += 1
+                metrics.inc(CACHE_LOOKUPS, cache="embedding", result="disk_hit")
+                return embedding
+
+        with self._lock:
+            self.misses += 1
+        metrics.inc(CACHE_LOOKUPS, cache="embedding", result="miss")
+        return None
+
+    def put(self, text: str, model: str, embedding: List[float]) -> None:
+        """Store ``embedding`` in memory and, if configured, on disk."""
+        key = self._key(text, model)
+        with self._lock:
+            self._remember(key, embedding)
+        if self.disk_store is not None:
+            self.disk_store.put(key, embedding)
+
+    def clear(self) -> None:
+        """Drop every cached embedding from both tiers."""
+        with self._lock:
+            self._entries.clear()
+        if self.disk_store is not None:
+            self.disk_store.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+class SemanticAnswerCache:
+    """Response cache keyed by query embedding similarity.
+
+    Cached answers live in a preallocated, L2-normalized float32 matrix so a
+    lookup is a single matrix-vector product. A hit requires cosine
+    similarity at or above ``threshold``, identical retrieval parameters, an
+    unchanged collection version (any version change invalidates every
+    entry) and, when the question text is given, the same
+    ``question_entities``. When full, the least recently used slot is
+    overwritten.
+
+    Embedding similarity alone is not enough: "What is the Part A
+    deductible?" and "What is the Part B deductible?" can score above 0.95
+    while needing different answers. The entity check rejects such near
+    misses, but the cache still trades exactness for latency, so it is off
+    unless ANSWER_CACHE_SIZE is set.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1_000,
+        threshold: float = 0.98,
+        ttl_seconds: Optional[float] = None,
+    ):
+        """
+        Args:
+            max_size: Maximum number of cached answers
+            threshold: Minimum cosine similarity for a cache hit
+            ttl_seconds: Lifetime of an entry; ``None`` means no expiry
+        """
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.collection_version: Optional[int] = None
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._results: List[Optional[QueryResult]] = [None] * max_size
+        self._entities: List[Optional[frozenset]] = [None] * max_size
+        self._params = np.zeros(max_size, dtype=np.int64)
+        self._valid = np.zeros(max_size, dtype=bool)
+        self._created = np.zeros(max_size, dtype=np.float64)
+        self._last_used = np.zeros(max_size, dtype=np.float64)
+        # Rows at or beyond this index have never been filled; lookups skip them
+        self._high_water = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_settings(cls) -> Optional["SemanticAnswerCache"]:
+        """Build the cache configured in ``Settings``; ``None`` when disabled."""
+        if settings.ANSWER_CACHE_SIZE <= 0:
+            return None
+        return cls(
+            max_size=settings.ANSWER_CACHE_SIZE,
+            threshold=settings.ANSWER_CACHE_SIMILARITY,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+        )
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def _params_key(top_k: int, rerank_top_k: int) -> int:
+        return top_k * 100_003 + rerank_top_k
+
+    def _sync_version(self, collection_version: int) -> None:
+        if collection_version != self.collection_version:
+            if self._valid.any():
+                self.invalidations += 1
+            self._valid[:] = False
+            self._results = [None] * self.max_size
+            self._entities = [None] * self.max_size
+            self._high_water = 0
+            self.collection_version = collection_version
+
+    def lookup(
+        self,
+        embedding: List[float],
+        collection_version: int,
+        top_k: int,
+        rerank_top_k: int,
+        query: Optional[str] = None,
+    ) -> Optional[QueryResult]:
+        """Return the cached answer for the nearest question, if close enough.
+
+        Args:
+            query: Question text; when given, only cached questions with the
+                same entities (plan letters, amounts, names) can match
+        """
+        entities = question_entities(query) if query is not None else None
+        vector = self._normalize(embedding)
+        now = time.monotonic()
+        with self._lock:
+            self._sync_version(collection_version)
+            if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+                self.misses += 1
+                return None
+
+            rows = self._high_water
+            eligible = self._valid[:rows] & (
+                self._params[:rows] == self._params_key(top_k, rerank_top_k)
+            )
+            if self.ttl_seconds:
+                eligible &= self._created[:rows] > now - self.ttl_seconds
+            if not eligible.any():
+                self.misses += 1
+                return None
+
+            similarities = self._matrix[:rows] @ vector
+            similarities[~eligible] = -np.inf
+            close = np.flatnonzero(similarities >= self.threshold)
+            # Most similar first, skipping questions about another plan, year...
+            best = next(
+                (
+                    int(row)
+                    for row in close[np.argsort(-similarities[close])]
+                    if entities is None
+                    or self._entities[row] is None
+                    or self._entities[row] == entities
+                ),
+                None,
+            )
+            if best is None:
+                self.misses += 1
+                return None
+
+            self._last_used[best] = now
+            self.hits += 1
+            return self._results[best]
+
+    def store(
+        self,
+        embedding: List[float],
+        result: QueryResult,
+        collection_version: int,
+        top_k: int,
+        rerank_top_k: int,
+    ) -> None:
+        """Cache ``result`` under ``embedding``, evicting the LRU entry if full."""
+        vector = self._normalize(embedding)
+        now = time.monotonic()
+        with self._lock:
+            self._sync_version(collection_version)
+            if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+                self._matrix = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+                self._valid[:] = False
+
+            free = np.flatnonzero(~self._valid)
+            if free.size:
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+
+            self._matrix[slot] = vector
+            self._results[slot] = result
+            self._entities[slot] = question_entities(result.query_text)
+            self._params[slot] = self._params_key(top_k, rerank_top_k)
+            self._valid[slot] = True
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._high_water = max(self._high_water, slot + 1)
+
+    def invalidate(self) -> None:
+        """Drop every cached answer, e.g. after the collection is re-ingested."""
+        with self._lock:
+            self._valid[:] = False
+            self._results = [None] * self.max_size
+            self._entities = [None] * self.max_size
+            self._high_water = 0
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": int(self._valid.sum()),
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,238 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import chromadb
+import logfire
+
+from ..core.config import settings
+
+# Ids read per page when fingerprinting a collection
+FINGERPRINT_PAGE_SIZE = 10000
+
+
+class CollectionPointer(NamedTuple):
+    """The physical collection an alias currently resolves to."""
+
+    name: str
+    version: int
+    # ``content_fingerprint`` of the version's chunk ids, recorded at promotion
+    fingerprint: Optional[str] = None
+
+
+def content_fingerprint(ids: Iterable[str]) -> str:
+    """Digest of a collection's contents.
+
+    Chunk ids are hashes of each chunk's source and text, so the sorted ids
+    identify the stored chunks: two versions with the same chunks share a fingerprint,
+    whatever their version numbers.
+    """
+    digest = hashlib.sha256()
+    for record_id in sorted(ids):
+        digest.update(record_id.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def collection_fingerprint(collection: chromadb.Collection) -> str:
+    """``content_fingerprint`` of every id stored in ``collection``."""
+    ids: List[str] = []
+    while True:
+        page = collection.get(include=[], limit=FINGERPRINT_PAGE_SIZE, offset=len(ids))
+        if not page["ids"]:
+            return content_fingerprint(ids)
+        ids.extend(page["ids"])
+
+
+class CollectionRegistry:
+    """Alias -> versioned collection pointers for blue/green re-ingestion.
+
+    Ingestion writes into a fresh shadow collection such as
+    ``medicare_docs__v42`` and, once it validates, flips the alias to it by
+    atomically replacing a small JSON pointer file next to the Chroma data.
+    Query services compare the pointer's version on each request and reopen
+    the collection when it changes, so they never see a partial index.
+    Replaced versions are kept for a grace period for in-flight queries and
+    then garbage-collected.
+
+    The API and the ingestion CLI may share the file, so every
+    read-modify-write (allocating a version, promoting, collecting garbage)
+    holds an exclusive ``flock`` on a sidecar lock file and re-reads the
+    pointer file first. Versions are reserved in the file when allocated, so
+    concurrent ingests never build the same shadow collection.
+    """
+
+    FILENAME = "collection_aliases.json"
+    LOCK_FILENAME = "collection_aliases.lock"
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Args:
+            db_path: Chroma data directory the pointer file lives in
+        """
+        self.db_path = db_path or settings.VECTOR_DB_PATH
+        self.path = os.path.join(self.db_path, self.FILENAME)
+        self.lock_path = os.path.join(self.db_path, self.LOCK_FILENAME)
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Any] = {}
+        self._cache_stamp: Optional[Tuple[int, int, int]] = None
+
+    @staticmethod
+    def versioned_name(alias: str, version: int) -> str:
+        return f"{alias}__v{version}"
+
+    def _read(self, fresh: bool = False) -> Dict[str, Any]:
+        """Return the pointer file contents, re-reading only when it changed.
+
+        Every write replaces the file, so its inode changes even when two
+        writes land within the filesystem's timestamp resolution.
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return {}
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if fresh or stamp != self._cache_stamp:
+            with open(self.path, "r") as f:
+                self._cache = json.load(f)
+            self._cache_stamp = stamp
+        return self._cache
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        """Replace the pointer file atomically; readers see the old or new file."""
+        os.makedirs(self.db_path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.db_path, prefix=f"{self.FILENAME}.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @contextmanager
+    def _locked(self) -> Iterator[Dict[str, Any]]:
+        """Hold the registry lock in this process and across processes.
+
+        Yields a fresh copy of the pointer file to modify and ``_write``.
+        """
+        with self._lock:
+            os.makedirs(self.db_path, exist_ok=True)
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield dict(self._read(fresh=True))
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def aliases(self) -> List[str]:
+        """Every alias that has been promoted at least once."""
+        with self._lock:
+            return [alias for alias, entry in self._read().items() if "active" in entry]
+
+    def active(self, alias: str) -> Optional[CollectionPointer]:
+        """Return the collection ``alias`` points to, or ``None`` if never promoted."""
+        with self._lock:
+            entry = self._read().get(alias)
+        if not entry or "active" not in entry:
+            return None
+        return CollectionPointer(
+            entry["active"], entry["version"], entry.get("fingerprint")
+        )
+
+    def resolve(self, alias: str) -> CollectionPointer:
+        """Like ``active``, falling back to an unversioned collection ``alias``."""
+        return self.active(alias) or CollectionPointer(alias, 0)
+
+    def next_version(self, alias: str, client: chromadb.ClientAPI) -> CollectionPointer:
+        """Reserve an unused versioned name for a new shadow collection."""
+        pattern = re.compile(rf"^{re.escape(alias)}__v(\d+)$")
+        with self._locked() as data:
+            entry = data.get(alias) or {}
+            versions = [entry.get("version", 0), entry.get("allocated", 0)]
+            for collection in client.list_collections():
+                name = collection if isinstance(collection, str) else collection.name
+                match = pattern.match(name)
+                if match:
+                    versions.append(int(match.group(1)))
+            version = max(versions) + 1
+            data[alias] = {**entry, "allocated": version}
+            self._write(data)
+        return CollectionPointer(self.versioned_name(alias, version), version)
+
+    def promote(self, alias: str, pointer: CollectionPointer) -> bool:
+        """Atomically point ``alias`` at ``pointer`` and retire the previous target.
+
+        Returns:
+            False, leaving the alias alone, when a newer version was promoted
+            in the meantime (e.g. by a concurrent ingest)
+        """
+        with self._locked() as data:
+            entry = data.get(alias) or {"retired": []}
+            if entry.get("version", 0) > pointer.version:
+                logfire.warn(
+                    "collection_promotion_superseded",
+                    alias=alias,
+                    collection=pointer.name,
+                    active=entry.get("active"),
+                )
+                return False
+            previous = entry.get("active", alias)
+            retired: List[Dict[str, Any]] = list(entry.get("retired", []))
+            if previous != pointer.name:
+                retired.append({"name": previous, "retired_at": time.time()})
+            data[alias] = {
+                **entry,
+                "active": pointer.name,
+                "version": pointer.version,
+                "fingerprint": pointer.fingerprint,
+                "promoted_at": time.time(),
+                "retired": retired,
+            }
+            self._write(data)
+        logfire.info("collection_promoted", alias=alias, collection=pointer.name)
+        return True
+
+    def collect_garbage(
+        self,
+        alias: str,
+        client: chromadb.ClientAPI,
+        grace_seconds: Optional[float] = None,
+    ) -> List[str]:
+        """Delete retired versions whose grace period has elapsed.
+
+        Returns:
+            Names of the deleted collections
+        """
+        if grace_seconds is None:
+            grace_seconds = settings.COLLECTION_GC_GRACE_SECONDS
+        deleted: List[str] = []
+        with self._locked() as data:
+            entry = data.get(alias)
+            if not entry:
+                return deleted
+            keep = []
+            for retired in entry.get("retired", []):
+                if time.time() - retired["retired_at"] < grace_seconds:
+                    keep.append(retired)
+                    continue
+                try:
+                    client.delete_collection(name=retired["name"])
+                except Exception:
+                    pass  # Already gone
+                deleted.append(retired["name"])
+            if deleted:
+                data[alias] = {**entry, "retired": keep}
+                self._write(data)
+        if deleted:
+            logfire.info("collections_garbage_collected", alias=alias, deleted=deleted)
+        return deleted
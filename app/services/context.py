@@ -0,0 +1,205 @@
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Set, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+from .embeddings import estimate_tokens
+from .lexical import tokenize
+from .reranking import BM25Reranker
+
+# Sentence ends, plus line breaks so markdown lists and tables split per row
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# Instructions sent as the system instruction. Keep them byte-for-byte stable
+# so provider-side prefix caching applies across requests.
+SYSTEM_PROMPT = """You are a helpful AI assistant that provides accurate and concise answers about Medicare based on the provided context.
+If the information isn't in the context, say you don't have that information.
+Keep your answers concise and to the point."""
+
+
+def build_prompt(query: str, context: str) -> str:
+    """The per-request part of the prompt; it follows ``SYSTEM_PROMPT``."""
+    return f"""Context:
+{context}
+
+Question: {query}"""
+
+
+@dataclass
+class AssembledContext:
+    """Context text for one question and where it came from."""
+
+    text: str
+    # Kept chunks, in rank order, and the (possibly trimmed) text used from each
+    ids: List[str]
+    documents: List[str]
+    # The kept chunks' full text, as retrieved
+    sources: List[str]
+    # Estimated tokens of ``text``
+    tokens: int
+    # Chunks dropped as near-duplicates of a higher-ranked chunk
+    duplicates: int = 0
+    # Sentences left out to fit the token budget
+    trimmed_sentences: int = 0
+
+
+class ContextAssembler:
+    """Builds the context for generation from reranked chunks.
+
+    - Chunks whose sentences mostly repeat a higher-ranked chunk are dropped,
+      and sentences already included are not repeated.
+    - If the rest exceeds ``max_tokens``, only the sentences most relevant to
+      the question (by BM25 over the candidate sentences) are kept, in their
+      original order; higher-ranked chunks win ties.
+
+    Sentences are cut at sentence ends and line breaks, and kept sentences
+    are rejoined with the whitespace that separated them in the chunk, so
+    lists and tables keep one row per line.
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        duplicate_overlap: Optional[float] = None,
+    ):
+        """
+        Args:
+            max_tokens: Token budget for the context; defaults to
+                CONTEXT_MAX_TOKENS, 0 disables trimming
+            duplicate_overlap: Share of a chunk's sentences already in the
+                context at which the chunk is dropped; defaults to
+                CONTEXT_DUPLICATE_OVERLAP
+        """
+        self.max_tokens = settings.CONTEXT_MAX_TOKENS if max_tokens is None else max_tokens
+        self.duplicate_overlap = (
+            settings.CONTEXT_DUPLICATE_OVERLAP
+            if duplicate_overlap is None
+            else duplicate_overlap
+        )
+        self._bm25 = BM25Reranker()
+
+    @staticmethod
+    def _sentences(document: str) -> List[Tuple[int, int]]:
+        """Spans of the sentences (and lines) of ``document``, whitespace excluded."""
+        spans = []
+        start = 0
+        for match in [*SENTENCE_SPLIT.finditer(document), None]:
+            end = len(document) if match is None else match.start()
+            piece = document[start:end]
+            if piece.strip():
+                offset = start + len(piece) - len(piece.lstrip())
+                spans.append((offset, offset + len(piece.strip())))
+            if match is not None:
+                start = match.end()
+        return spans
+
+    @staticmethod
+    def _join(document: str, spans: List[Tuple[int, int]], keep: List[int]) -> str:
+        """Sentences ``keep`` (indices into ``spans``) with their original separators.
+
+        Where sentences were left out in between, the skipped separator with
+        the most line breaks is used.
+        """
+        parts: List[str] = []
+        previous = None
+        for i in keep:
+            if previous is not None:
+                gaps = [document[spans[j][1] : spans[j + 1][0]] for j in range(previous, i)]
+                parts.append(max(gaps, key=lambda gap: gap.count("\n")))
+            parts.append(document[spans[i][0] : spans[i][1]])
+            previous = i
+        return "".join(parts)
+
+    @staticmethod
+    def _key(sentence: str) -> str:
+        return " ".join(tokenize(sentence))
+
+    def assemble(self, query: str, documents: List[str], ids: List[str]) -> AssembledContext:
+        """Deduplicate and budget ``documents`` (best first) for ``query``."""
+        seen: Set[str] = set()
+        kept_ids: List[str] = []
+        # Per kept chunk: its text, sentence spans and the sentences used
+        kept: List[Tuple[str, List[Tuple[int, int]], List[int]]] = []
+        texts: List[str] = []
+        duplicates = 0
+        for chunk_id, document in zip(ids, documents, strict=True):
+            spans = self._sentences(document)
+            keys = [self._key(document[start:end]) for start, end in spans]
+            repeated = sum(1 for key in keys if key in seen)
+            if not spans or repeated / len(spans) >= self.duplicate_overlap:
+                duplicates += 1
+                continue
+            fresh = [i for i, key in enumerate(keys) if key not in seen]
+            seen.update(keys)
+            kept_ids.append(chunk_id)
+            kept.append((document, spans, fresh))
+            texts.append(self._join(document, spans, fresh))
+
+        text = "\n\n".join(texts)
+        tokens = estimate_tokens(text)
+        trimmed = 0
+        if self.max_tokens and tokens > self.max_tokens:
+            chosen, trimmed = self._trim(
+                query,
+                [
+                    [document[spans[i][0] : spans[i][1]] for i in fresh]
+                    for document, spans, fresh in kept
+                ],
+            )
+            kept_ids = [
+                i
+                for i, positions in zip(kept_ids, chosen, strict=True)
+                if positions
+            ]
+            texts = [
+                self._join(document, spans, [fresh[p] for p in positions])
+                for (document, spans, fresh), positions in zip(
+                    kept, chosen, strict=True
+                )
+                if positions
+            ]
+            kept = [
+                chunk
+                for chunk, positions in zip(kept, chosen, strict=True)
+                if positions
+            ]
+            text = "\n\n".join(texts)
+            tokens = estimate_tokens(text)
+        sources = [document for document, _, _ in kept]
+        return AssembledContext(
+            text, kept_ids, texts, sources, tokens, duplicates, trimmed
+        )
+
+    def _trim(self, query: str, chunks: List[List[str]]) -> Tuple[List[List[int]], int]:
+        """Keep the most query-relevant sentences that fit the budget.
+
+        Returns:
+            The positions of the kept sentences per chunk and how many were left out
+        """
+        flat = [(c, s) for c, sentences in enumerate(chunks) for s in range(len(sentences))]
+        texts = [chunks[c][s] for c, s in flat]
+        scores = self._bm25.scores(query, texts)
+        # Best score first; earlier chunks, then earlier sentences, break ties
+        order = np.lexsort(
+            (
+                np.array([s for _, s in flat]),
+                np.array([c for c, _ in flat]),
+                -np.asarray(scores),
+            )
+        )
+        # Separators between sentences and chunks cost about one token each
+        budget = self.max_tokens
+        chosen = set()
+        for i in order:
+            cost = estimate_tokens(texts[i]) + 1
+            if cost <= budget:
+                chosen.add(int(i))
+                budget -= cost
+        position = {pair: i for i, pair in enumerate(flat)}
+        kept = [
+            [s for s in range(len(sentences)) if position[(c, s)] in chosen]
+            for c, sentences in enumerate(chunks)
+        ]
+        return kept, len(flat) - len(chosen)
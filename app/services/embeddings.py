@@ -0,0 +1,342 @@
+import asyncio
+import re
+import zlib
+from abc import ABC, abstractmethod
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import voyageai
+
+from ..core.config import settings
+from ..core.metrics import API_CALLS, metrics
+from .cache import EmbeddingCache
+from .rate_limit import AsyncRateLimiter
+
+# Voyage per-request limits for voyage-3: at most 128 texts and 120K tokens
+VOYAGE_MAX_BATCH_TEXTS = 128
+VOYAGE_MAX_BATCH_TOKENS = 120_000
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap, conservative token estimate (about 3 characters per token).
+
+    Avoids a tokenizer download; it over-counts English text slightly, which
+    keeps packed requests safely under the provider's token limit.
+    """
+    return len(text) // 3 + 1
+
+
+def pack_batches(
+    texts: List[str],
+    max_texts: int = VOYAGE_MAX_BATCH_TEXTS,
+    max_tokens: int = VOYAGE_MAX_BATCH_TOKENS,
+    token_counter: Optional[Callable[[str], int]] = None,
+) -> List[List[int]]:
+    """Group text indices into request-sized batches, preserving order.
+
+    Args:
+        texts: Texts to embed
+        max_texts: Maximum number of texts per request
+        max_tokens: Maximum total tokens per request
+        token_counter: Token counting function; defaults to ``estimate_tokens``
+
+    Returns:
+        List of batches, each a list of indices into ``texts``
+    """
+    count_tokens = token_counter or estimate_tokens
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if current and (len(current) >= max_texts or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class Embedder(ABC):
+    """Turns text into vectors; one implementation per embedding backend.
+
+    Subclasses implement ``_embed_batch`` for a single request-sized batch.
+    This base class packs inputs into batches, consults the optional query
+    embedding cache and records the vector dimension, so every backend
+    behaves the same for callers.
+
+    Attributes:
+        model: Identifier of the embedding space; used in cache keys and
+            stored on collections so vectors from different models never mix
+        dimension: Vector length, or ``None`` until the first embedding
+            when the backend cannot tell up front
+    """
+
+    model: str
+    dimension: Optional[int] = None
+    max_batch_texts: int = VOYAGE_MAX_BATCH_TEXTS
+    max_batch_tokens: int = VOYAGE_MAX_BATCH_TOKENS
+
+    def __init__(self, cache: Optional[EmbeddingCache] = None):
+        """
+        Args:
+            cache: Cache for query embeddings; document embeddings are not
+                cached since ingestion already skips unchanged chunks
+        """
+        self.cache = cache
+
+    @abstractmethod
+    def _embed_batch(self, texts: List[str], input_type: str) -> List[List[float]]:
+        """Embed one batch of at most ``max_batch_texts`` texts."""
+
+    async def _aembed_batch(self, texts: List[str], input_type: str) -> List[List[float]]:
+        """Async variant of ``_embed_batch``; runs it on a worker thread by default."""
+        return await asyncio.to_thread(self._embed_batch, texts, input_type)
+
+    def _batches(self, texts: List[str]) -> List[List[int]]:
+        return pack_batches(texts, self.max_batch_texts, self.max_batch_tokens)
+
+    def _record_dimension(self, embeddings: List[List[float]]) -> None:
+        if self.dimension is None and embeddings:
+            self.dimension = len(embeddings[0])
+
+    def _split_cached(
+        self, texts: List[str], input_type: str
+    ) -> Tuple[List[Optional[List[float]]], List[int]]:
+        """Look texts up in the cache; return hits and the indices of misses."""
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        if self.cache is not None and input_type == "query":
+            for i, text in enumerate(texts):
+                embeddings[i] = self.cache.get(text, self.model)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        return embeddings, missing
+
+    def _fill(
+        self,
+        texts: List[str],
+        input_type: str,
+        embeddings: List[Optional[List[float]]],
+        indices: List[int],
+        batch_embeddings: List[List[float]],
+    ) -> None:
+        self._record_dimension(batch_embeddings)
+        for i, embedding in zip(indices, batch_embeddings, strict=True):
+            embeddings[i] = embedding
+            if self.cache is not None and input_type == "query":
+                self.cache.put(texts[i], self.model, embedding)
+
+    def embed_batches(
+        self, texts: List[str], input_type: str = "document"
+    ) -> Iterator[Tuple[List[int], List[List[float]]]]:
+        """Embed ``texts`` lazily, one request-sized batch at a time.
+
+        Yields:
+            ``(indices, embeddings)`` pairs, indices pointing into ``texts``
+        """
+        for batch in self._batches(texts):
+            embeddings = self._embed_batch([texts[i] for i in batch], input_type)
+            self._record_dimension(embeddings)
+            yield batch, embeddings
+
+    def embed(self, texts: List[str], input_type: str = "document") -> List[List[float]]:
+        """Embed many texts, packing cache misses into as few requests as possible."""
+        embeddings, missing = self._split_cached(texts, input_type)
+        for batch in self._batches([texts[i] for i in missing]):
+            indices = [missing[j] for j in batch]
+            batch_embeddings = self._embed_batch([texts[i] for i in indices], input_type)
+            self._fill(texts, input_type, embeddings, indices, batch_embeddings)
+        return embeddings
+
+    async def aembed(
+        self, texts: List[str], input_type: str = "document"
+    ) -> List[List[float]]:
+        embeddings, missing = self._split_cached(texts, input_type)
+        for batch in self._batches([texts[i] for i in missing]):
+            indices = [missing[j] for j in batch]
+            batch_embeddings = await self._aembed_batch(
+                [texts[i] for i in indices], input_type
+            )
+            self._fill(texts, input_type, embeddings, indices, batch_embeddings)
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed([text], input_type="query")[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed([text], input_type="query"))[0]
+
+
+class VoyageEmbedder(Embedder):
+    """Voyage AI embeddings (``voyage-3`` by default)."""
+
+    # Output sizes of the models we use, so collections can be labelled up front
+    DIMENSIONS = {"voyage-3": 1024, "voyage-3-large": 1024, "voyage-3-lite": 512}
+
+    def __init__(
+        self,
+        client: Optional[voyageai.Client] = None,
+        async_client: Optional[voyageai.AsyncClient] = None,
+        model: Optional[str] = None,
+        cache: Optional[EmbeddingCache] = None,
+        rate_limiter: Optional[AsyncRateLimiter] = None,
+    ):
+        """
+        Args:
+            client: Shared VoyageAI client; a new one is created when omitted
+            async_client: Shared async client; without it the async path runs
+                the sync client on a worker thread
+            model: Voyage model name; defaults to VOYAGE_EMBEDDING_MODEL
+            cache: Cache for query embeddings
+            rate_limiter: Throttles Voyage calls made on the async path
+        """
+        super().__init__(cache)
+        self.client = client or voyageai.Client(api_key=settings.VOYAGE_API_KEY)
+        self.async_client = async_client
+        self.model = model or settings.VOYAGE_EMBEDDING_MODEL
+        self.dimension = self.DIMENSIONS.get(self.model)
+        self.rate_limiter = rate_limiter
+
+    def _embed_batch(self, texts: List[str], input_type: str) -> List[List[float]]:
+        metrics.inc(API_CALLS, provider="voyage", operation="embed")
+        return self.client.embed(
+            texts=texts, model=self.model, input_type=input_type
+        ).embeddings
+
+    async def _aembed_batch(self, texts: List[str], input_type: str) -> List[List[float]]:
+        if self.async_client is None:
+            return await super()._aembed_batch(texts, input_type)
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        metrics.inc(API_CALLS, provider="voyage", operation="embed")
+        response = await self.async_client.embed(
+            texts=texts, model=self.model, input_type=input_type
+        )
+        return response.embeddings
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """Local CPU embeddings from a sentence-transformers model.
+
+    Requires the optional ``sentence-transformers`` package. Set
+    LOCAL_EMBEDDING_RUNTIME to ``onnx`` to run the model with ONNX Runtime.
+    """
+
+    max_batch_texts = 64
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        device: str = "cpu",
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        """
+        Args:
+            model: Model name or path; defaults to LOCAL_EMBEDDING_MODEL
+            device: Torch device to run on
+            cache: Cache for query embeddings
+        """
+        super().__init__(cache)
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "The local embedding backend needs sentence-transformers: "
+                "pip install sentence-transformers"
+            ) from e
+        self.model = model or settings.LOCAL_EMBEDDING_MODEL
+        options = {}
+        if settings.LOCAL_EMBEDDING_RUNTIME != "torch":
+            options["backend"] = settings.LOCAL_EMBEDDING_RUNTIME
+        self._model = SentenceTransformer(self.model, device=device, **options)
+        self.dimension = self._model.get_sentence_embedding_dimension()
+
+    def _embed_batch(self, texts: List[str], input_type: str) -> List[List[float]]:
+        return self._model.encode(
+            texts,
+            batch_size=self.max_batch_texts,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        ).tolist()
+
+
+class HashingEmbedder(Embedder):
+    """Dependency-free local baseline using signed feature hashing.
+
+    Word unigrams and bigrams are hashed into ``dimension`` buckets with a
+    random sign, damped with log term frequency and L2-normalized. There is
+    no model to download and no network call, which makes it useful for
+    offline ingestion, tests and latency baselines; retrieval quality is
+    lexical, well below a trained model.
+    """
+
+    TOKEN = re.compile(r"\w+")
+
+    def __init__(
+        self, dimension: Optional[int] = None, cache: Optional[EmbeddingCache] = None
+    ):
+        """
+        Args:
+            dimension: Number of hash buckets; defaults to HASHING_EMBEDDING_DIMENSION
+            cache: Cache for query embeddings (rarely worth it for this backend)
+        """
+        super().__init__(cache)
+        self.dimension = dimension or settings.HASHING_EMBEDDING_DIMENSION
+        self.model = f"hashing-{self.dimension}"
+
+    def _features(self, text: str) -> np.ndarray:
+        tokens = self.TOKEN.findall(text.lower())
+        bigrams = zip(tokens, tokens[1:], strict=False)
+        features = tokens + [f"{a} {b}" for a, b in bigrams]
+        return np.fromiter(
+            (zlib.crc32(feature.encode("utf-8")) for feature in features),
+            dtype=np.int64,
+            count=len(features),
+        )
+
+    def _embed_batch(self, texts: List[str], input_type: str) -> List[List[float]]:
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = self._features(text)
+            signs = np.where(hashes & (1 << 31), -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], hashes % self.dimension, signs)
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return (matrix / norms).tolist()
+
+    async def _aembed_batch(self, texts: List[str], input_type: str) -> List[List[float]]:
+        # Microseconds of numpy work; a thread hop would cost more
+        return self._embed_batch(texts, input_type)
+
+
+def create_embedder(
+    backend: Optional[str] = None,
+    voyage_client: Optional[voyageai.Client] = None,
+    async_voyage_client: Optional[voyageai.AsyncClient] = None,
+    cache: Optional[EmbeddingCache] = None,
+    rate_limiter: Optional[AsyncRateLimiter] = None,
+) -> Embedder:
+    """Build the embedder selected by ``backend`` (default: EMBEDDING_BACKEND).
+
+    Args:
+        backend: ``voyage``, ``local`` (sentence-transformers) or ``hashing``
+        voyage_client: Shared VoyageAI client for the Voyage backend
+        async_voyage_client: Shared async VoyageAI client for the Voyage backend
+        cache: Cache for query embeddings
+        rate_limiter: Throttles async Voyage calls
+
+    Raises:
+        ValueError: For an unknown backend
+    """
+    backend = (backend or settings.EMBEDDING_BACKEND).lower()
+    if backend == "voyage":
+        return VoyageEmbedder(
+            voyage_client, async_voyage_client, cache=cache, rate_limiter=rate_limiter
+        )
+    if backend == "local":
+        return SentenceTransformerEmbedder(cache=cache)
+    if backend == "hashing":
+        return HashingEmbedder(cache=cache)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from ..core.config import settings
+from ..core.metrics import CACHE_LOOKUPS, metrics
+from .cache import normalize_query
+
+
+def content_hash(*parts: Any) -> str:
+    """Stable digest of JSON-serializable ``parts``."""
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class EvaluationCache:
+    """Content-addressed store of RAG answers and metric verdicts.
+
+    Answers are keyed by (question, collection content fingerprint,
+    generation model, prompt hash) and verdicts by (metric, test-case hash, judge model). A key
+    is a digest of exactly those inputs, so repeated and comparative
+    evaluations only answer and judge what changed; stale entries are simply
+    never looked up again. Entries live in SQLite under ``eval_results/``.
+    """
+
+    ANSWER = "answer"
+    VERDICT = "verdict"
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite database file to create or reuse
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            )"""
+        )
+        self._conn.commit()
+        self.hits = {self.ANSWER: 0, self.VERDICT: 0}
+        self.misses = {self.ANSWER: 0, self.VERDICT: 0}
+
+    @classmethod
+    def from_settings(cls) -> Optional["EvaluationCache"]:
+        """Build the cache configured in ``Settings``; ``None`` when disabled."""
+        if not settings.EVAL_CACHE_PATH:
+            return None
+        return cls(settings.EVAL_CACHE_PATH)
+
+    @staticmethod
+    def answer_key(
+        query: str, collection_fingerprint: str, model: str, prompt_hash: str
+    ) -> str:
+        """Key of an answer; see ``collections.content_fingerprint``.
+
+        The fingerprint (rather than the version number) keeps a key from
+        matching answers over other chunks when version numbers are reused,
+        e.g. after the vector store is rebuilt, and lets a re-ingest of
+        unchanged documents reuse earlier answers.
+        """
+        return content_hash(
+            normalize_query(query), collection_fingerprint, model, prompt_hash
+        )
+
+    @staticmethod
+    def test_case_hash(
+        input: str,
+        actual_output: str,
+        expected_output: Optional[str] = None,
+        retrieval_context: Optional[List[str]] = None,
+        context: Optional[List[str]] = None,
+    ) -> str:
+        return content_hash(input, actual_output, expected_output, retrieval_context, context)
+
+    @staticmethod
+    def verdict_key(metric: str, test_case_hash: str, judge_model: str) -> str:
+        return content_hash(metric, test_case_hash, judge_model)
+
+    def get(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached ``kind`` entry for ``key`` or ``None`` on a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM entries WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()
+            if row is None:
+                self.misses[kind] += 1
+            else:
+                self.hits[kind] += 1
+        metrics.inc(
+            CACHE_LOOKUPS, cache=f"eval_{kind}", result="miss" if row is None else "hit"
+        )
+        return None if row is None else json.loads(row[0])
+
+    def put(self, kind: str, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (kind, key, json.dumps(value), time.time()),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Hits and misses per entry kind since the cache was opened."""
+        with self._lock:
+            return {
+                kind: {"hits": self.hits[kind], "misses": self.misses[kind]}
+                for kind in (self.ANSWER, self.VERDICT)
+            }
@@ -1,56 +1,158 @@
-from typing import Dict, List, Optional, Any
-from datetime import datetime
+import asyncio
 import json
 import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Type, Union
+
 import logfire
-from deepeval.test_case import LLMTestCase
+from deepeval import evaluate
 from deepeval.metrics import (
     AnswerRelevancyMetric,
-    FaithfulnessMetric,
     ContextualRelevancyMetric,
-    HallucinationMetric
+    FaithfulnessMetric,
+    HallucinationMetric,
 )
-from deepeval import evaluate
-
-from google import genai
 from deepeval.models import DeepEvalBaseLLM
+from deepeval.test_case import LLMTestCase
+from google import genai
+from google.genai import types
+from pydantic import BaseModel, ValidationError
 
-from .query import QueryService
 from ..core.config import settings
+from .eval_cache import EvaluationCache
+from .evaluation_runner import EvalCase, EvaluationRunner
+from .query import QueryService
+from .rate_limit import AsyncRateLimiter, is_quota_error
 
 
 class GeminiGenAI(DeepEvalBaseLLM):
-    def __init__(self, model_name, api_key):
+    """deepeval judge backed by Gemini.
+
+    ``a_generate`` runs on the client's async API, so metrics for many test
+    cases can be judged at once over the client's shared connection pool. At
+    most ``max_concurrency`` judge calls are in flight, paced by the optional
+    rate limiter. When deepeval passes a pydantic ``schema`` the call uses
+    Gemini's JSON mode and returns a validated instance of it.
+    """
+
+    def __init__(
+        self,
+        model_name,
+        api_key,
+        client: Optional[genai.Client] = None,
+        rate_limiter: Optional[AsyncRateLimiter] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        """
+        Args:
+            rate_limiter: Throttles judge calls on the async path; share the
+                generator's limiter so both count against one Gemini quota
+            max_concurrency: Judge calls in flight at once; defaults to
+                EVAL_JUDGE_CONCURRENCY
+        """
         self.model_name = model_name
-        self.client = genai.Client(api_key=api_key)
+        self.client = client or genai.Client(api_key=api_key)
+        self.rate_limiter = rate_limiter
+        self.max_concurrency = max_concurrency or settings.EVAL_JUDGE_CONCURRENCY
+        # One semaphore per event loop: the sync wrappers start a new loop per
+        # call, and a semaphore cannot be shared between loops
+        self._slots: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
 
     def load_model(self):
         return self.client
 
-    async def a_generate(self, prompt: str) -> str:
+    @staticmethod
+    def _config(schema: Optional[Type[BaseModel]]) -> Optional[types.GenerateContentConfig]:
+        if schema is None:
+            return None
+        return types.GenerateContentConfig(
+            response_mime_type="application/json", response_schema=schema
+        )
+
+    @staticmethod
+    def _output(response: Any, schema: Optional[Type[BaseModel]]) -> Union[str, BaseModel]:
+        if not (response and response.text):
+            # Return a dummy JSON that deepeval metrics might be expecting
+            return '{"score": 0, "reason": "Model returned None (quota or safety)"}'
+        if schema is None:
+            return response.text
+        parsed = getattr(response, "parsed", None)
+        if isinstance(parsed, schema):
+            return parsed
+        try:
+            return schema.model_validate_json(response.text)
+        except ValidationError:
+            # deepeval falls back to lenient JSON extraction for strings
+            return response.text
+
+    def _generate(self, prompt: str, schema: Optional[Type[BaseModel]] = None):
+        with logfire.span(
+            "deepeval_model_generate", model=self.model_name, structured=schema is not None
+        ):
+            response = self.client.models.generate_content(
+                model=self.model_name,
+                contents=prompt,
+                config=self._config(schema),
+            )
+            return self._output(response, schema)
+
+    def _loop_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        slots = self._slots.get(loop)
+        if slots is None:
+            self._slots = {
+                other: other_slots
+                for other, other_slots in self._slots.items()
+                if not other.is_closed()
+            }
+            slots = self._slots[loop] = asyncio.Semaphore(self.max_concurrency)
+        return slots
+
+    async def _agenerate(self, prompt: str, schema: Optional[Type[BaseModel]] = None):
+        async with self._loop_slots():
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            with logfire.span(
+                "deepeval_model_generate", model=self.model_name, structured=schema is not None
+            ):
+                response = await self.client.aio.models.generate_content(
+                    model=self.model_name,
+                    contents=prompt,
+                    config=self._config(schema),
+                )
+                return self._output(response, schema)
+
+    async def a_generate(
+        self, prompt: str, schema: Optional[Type[BaseModel]] = None
+    ) -> Union[str, BaseModel]:
+        """Judge call on the async client.
+
+        Quota errors are raised so the evaluation runner can back off and
+        retry; other errors degrade to a zero score as in ``generate``.
+        """
         try:
-            # Note: We use the synchronous generate for now as the client is sync
-            # If a sync client is used in an async context, it might block, 
-            # but for this script it's acceptable.
-            return self.generate(prompt)
+            return await self._agenerate(prompt, schema)
         except Exception as e:
+            if is_quota_error(e):
+                raise
+            if schema is not None:
+                # Gemini rejects some schemas; the prompt itself still asks for JSON
+                logfire.warn("Structured judge call failed; retrying as text", error=str(e))
+                return await self.a_generate(prompt)
             logfire.error("Error in a_generate", error=str(e))
-            return f"Error: {str(e)}"
+            return '{"score": 0, "reason": "Error: ' + str(e) + '"}'
 
-    def generate(self, prompt: str) -> str:
-        with logfire.span("deepeval_model_generate", model=self.model_name):
-            try:
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=prompt
-                )
-                if response and response.text:
-                    return response.text
-                # Return a dummy JSON that deepeval metrics might be expecting
-                return '{"score": 0, "reason": "Model returned None (quota or safety)"}'
-            except Exception as e:
-                logfire.error("Error in generate", error=str(e))
-                return '{"score": 0, "reason": "Error: ' + str(e) + '"}'
+    def generate(
+        self, prompt: str, schema: Optional[Type[BaseModel]] = None
+    ) -> Union[str, BaseModel]:
+        try:
+            return self._generate(prompt, schema)
+        except Exception as e:
+            if schema is not None and not is_quota_error(e):
+                logfire.warn("Structured judge call failed; retrying as text", error=str(e))
+                return self.generate(prompt)
+            logfire.error("Error in generate", error=str(e))
+            return '{"score": 0, "reason": "Error: ' + str(e) + '"}'
 
     def get_model_name(self):
         return self.model_name
@@ -59,20 +161,52 @@ class GeminiGenAI(DeepEvalBaseLLM):
 class EvaluationService:
     """Service for evaluating RAG system performance using deepeval."""
 
-    def __init__(self, query_service: QueryService):
+    def __init__(
+        self,
+        query_service: QueryService,
+        genai_client: Optional[genai.Client] = None,
+        eval_cache: Optional[EvaluationCache] = None,
+    ):
         """Initialize the evaluation service.
 
         Args:
             query_service: The QueryService instance to evaluate
+            genai_client: Shared GenAI client for the judge model; defaults to the
+                query service's generator client
+            eval_cache: Store of answers and verdicts reused across evaluations;
+                built from settings when omitted
         """
         self.query_service = query_service
         self.eval_metrics_dir = "eval_results"
         os.makedirs(self.eval_metrics_dir, exist_ok=True)
+        self.eval_cache = eval_cache or EvaluationCache.from_settings()
         self.model = GeminiGenAI(
             model_name=settings.LLM_MODEL,
-            api_key=settings.GEMINI_API_KEY
+            api_key=settings.GEMINI_API_KEY,
+            client=genai_client or query_service.generator.client,
+            rate_limiter=query_service.generator.rate_limiter,
         )
 
+    def _metrics(self) -> List[Any]:
+        """Fresh metric instances judged by ``self.model``."""
+        return [
+            AnswerRelevancyMetric(threshold=0.7, model=self.model),
+            FaithfulnessMetric(threshold=0.7, model=self.model),
+            ContextualRelevancyMetric(threshold=0.7, model=self.model),
+            HallucinationMetric(threshold=0.7, model=self.model)
+        ]
+
+    @staticmethod
+    def _cases(dataset: List[Dict[str, str]]) -> List[EvalCase]:
+        return [
+            EvalCase(
+                input=item["query"],
+                expected_output=item.get("expected_answer"),
+                case_id=item.get("id"),
+            )
+            for item in dataset
+        ]
+
     def _save_evaluation_results(self, results: Dict[str, Any], eval_id: str) -> str:
         """Save evaluation results to disk.
 
@@ -96,7 +230,8 @@ class EvaluationService:
         self,
         query: str,
         expected_answer: str,
-        eval_id: Optional[str] = None
+        eval_id: Optional[str] = None,
+        model_version: Optional[str] = None,
     ) -> Dict:
         """
         Evaluate a single query using deepeval metrics.
@@ -105,13 +240,14 @@ class EvaluationService:
             query: The question to evaluate
             expected_answer: The expected answer
             eval_id: Optional identifier for this evaluation
+            model_version: Gemini model to answer with; defaults to LLM_MODEL
 
         Returns:
             Dict containing evaluation metrics
         """
         with logfire.span("evaluation_single_query", query=query):
             # Get the actual answer from our RAG system
-            result = self.query_service.answer_question(query=query)
+            result = self.query_service.answer_question(query=query, model=model_version)
             
             # Create test case
             test_case = LLMTestCase(
@@ -122,12 +258,7 @@ class EvaluationService:
             )
 
             # Run evaluation with comprehensive metrics
-            metrics = [
-                AnswerRelevancyMetric(threshold=0.7, model=self.model),
-                FaithfulnessMetric(threshold=0.7, model=self.model),
-                ContextualRelevancyMetric(threshold=0.7, model=self.model),
-                HallucinationMetric(threshold=0.7, model=self.model)
-            ]
+            metrics = self._metrics()
 
             evaluation_results = evaluate([test_case], metrics)
 
@@ -136,6 +267,7 @@ class EvaluationService:
                 "query": query,
                 "expected_answer": expected_answer,
                 "actual_answer": result.answer,
+                "model_version": model_version or self.query_service.generator.model_name,
                 "metrics": [
                     {"name": m.__class__.__name__, "score": m.score, "reason": m.reason}
                     for m in metrics
@@ -151,52 +283,107 @@ class EvaluationService:
 
             return results
 
-    def evaluate_dataset(
+    async def aevaluate_dataset(
         self,
         dataset: List[Dict[str, str]],
         eval_id: Optional[str] = None,
+        model_version: Optional[str] = None,
     ) -> Dict:
         """
         Evaluate a dataset of queries using deepeval.
 
+        Items are answered and judged concurrently by an ``EvaluationRunner``
+        within the Voyage and Gemini rate limits. Answers and verdicts already
+        in the evaluation cache are reused. With an ``eval_id``, finished
+        items are checkpointed to ``eval_results/<eval_id>.checkpoint.jsonl``
+        and skipped when the same evaluation is run again.
+
         Args:
             dataset: List of dicts containing 'query' and 'expected_answer' keys
+                (and optionally 'id')
             eval_id: Optional identifier for this evaluation
+            model_version: Gemini model to answer with; defaults to LLM_MODEL
 
         Returns:
-            Dict containing overall evaluation metrics and individual results
+            Dict containing per-metric aggregates and individual results
         """
-        test_cases = []
-        
+        cases = self._cases(dataset)
+        runner = EvaluationRunner(
+            self.query_service,
+            self._metrics,
+            checkpoint_path=(
+                os.path.join(self.eval_metrics_dir, f"{eval_id}.checkpoint.jsonl")
+                if eval_id
+                else None
+            ),
+            cache=self.eval_cache,
+            model=model_version,
+        )
         with logfire.span("evaluate_dataset_execution", size=len(dataset)):
-            for item in dataset:
-                result = self.query_service.answer_question(item["query"])
-                
-                test_case = LLMTestCase(
-                    input=item["query"],
-                    actual_output=result.answer,
-                    expected_output=item["expected_answer"],
-                    retrieval_context=result.source_text,
-                )
-                test_cases.append(test_case)
-
-        # Define metrics
-        metrics = [
-            AnswerRelevancyMetric(threshold=0.7, model=self.model),
-            FaithfulnessMetric(threshold=0.7, model=self.model),
-            ContextualRelevancyMetric(threshold=0.7, model=self.model),
-            HallucinationMetric(threshold=0.7, model=self.model)
-        ]
-
-        with logfire.span("deepeval_dataset_evaluation"):
-            evaluation_results = evaluate(test_cases, metrics)
+            summary = await runner.run(cases)
 
         # Prepare summary
         results = {
             "timestamp": datetime.now().isoformat(),
             "eval_id": eval_id or f"eval_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
             "dataset_size": len(dataset),
-            "results": str(evaluation_results) # deepeval's evaluate returns a list of results
+            "model_version": runner.model,
+            **summary,
+        }
+
+        # Save results if eval_id is provided
+        if eval_id:
+            self._save_evaluation_results(results, eval_id)
+
+        return results
+
+    def evaluate_dataset(
+        self,
+        dataset: List[Dict[str, str]],
+        eval_id: Optional[str] = None,
+        model_version: Optional[str] = None,
+    ) -> Dict:
+        """Synchronous ``aevaluate_dataset`` for scripts (not from a running event loop)."""
+        return asyncio.run(self.aevaluate_dataset(dataset, eval_id, model_version))
+
+    async def acompare_model_versions(
+        self,
+        dataset: List[Dict[str, str]],
+        model_versions: List[str],
+        eval_id: Optional[str] = None,
+    ) -> Dict:
+        """
+        Compare Gemini model versions on the same dataset in one pass.
+
+        Each query is retrieved and reranked once and answered by every model
+        concurrently from that context (see ``EvaluationRunner.compare``), so
+        differences in the table come from generation alone. Answers and
+        verdicts already in the evaluation cache are reused.
+
+        Args:
+            dataset: List of dicts containing 'query' and 'expected_answer' keys
+                (and optionally 'id')
+            model_versions: Gemini model names to compare
+            eval_id: Optional identifier for this evaluation
+
+        Returns:
+            Dict with a ``table`` of quality, latency and token use per model
+            and the individual results per model
+        """
+        if not model_versions:
+            raise ValueError("Provide at least one model version to compare")
+        models = list(dict.fromkeys(model_versions))
+        runner = EvaluationRunner(self.query_service, self._metrics, cache=self.eval_cache)
+        with logfire.span(
+            "compare_model_versions", size=len(dataset), models=models
+        ):
+            summary = await runner.compare(self._cases(dataset), models)
+
+        results = {
+            "timestamp": datetime.now().isoformat(),
+            "eval_id": eval_id or f"compare_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            "dataset_size": len(dataset),
+            **summary,
         }
 
         # Save results if eval_id is provided
@@ -204,3 +391,12 @@ class EvaluationService:
             self._save_evaluation_results(results, eval_id)
 
         return results
+
+    def compare_model_versions(
+        self,
+        dataset: List[Dict[str, str]],
+        model_versions: List[str],
+        eval_id: Optional[str] = None,
+    ) -> Dict:
+        """Synchronous ``acompare_model_versions`` for scripts (not from a running event loop)."""
+        return asyncio.run(self.acompare_model_versions(dataset, model_versions, eval_id))
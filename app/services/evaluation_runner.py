@@ -0,0 +1,619 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import logfire
+from deepeval.metrics import BaseMetric
+from deepeval.test_case import LLMTestCase
+
+from ..core.config import settings
+from .context import AssembledContext
+from .embeddings import VOYAGE_MAX_BATCH_TEXTS
+from .eval_cache import EvaluationCache
+from .query import Candidates, QueryService
+from .rate_limit import is_quota_error, retry_on_quota
+
+
+@dataclass
+class EvalCase:
+    """One golden: a question, its expected answer and optional golden context."""
+
+    input: str
+    expected_output: Optional[str] = None
+    context: Optional[List[str]] = None
+    case_id: Optional[str] = None
+
+    def __post_init__(self):
+        if self.case_id is None:
+            digest = hashlib.sha256(
+                f"{self.input}\0{self.expected_output or ''}".encode("utf-8")
+            ).hexdigest()
+            self.case_id = digest[:16]
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of sorted ``values``."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+class EvaluationRunner:
+    """Answers and judges golden cases concurrently within provider quotas.
+
+    Questions that need answering are embedded and searched in groups (one
+    embed request and one multi-vector Chroma query per group, as in batch
+    processing). Each case is then reranked and answered on the async RAG
+    path (at most ``answer_concurrency`` at once), and every metric is
+    measured with ``a_measure`` (at most ``judge_concurrency`` measurements at
+    once). The token buckets on the query service and the judge model set the
+    pace; quota errors are retried with jittered exponential backoff instead
+    of sleeping a fixed time after every call.
+
+    With a checkpoint path, each case is appended to a JSONL file once
+    answered and again once judged. A re-run skips judged cases and judges
+    answered ones without asking the question again. A case where some
+    metric errored is checkpointed as ``partial``; a re-run measures only
+    the metrics that have no score yet.
+
+    With an ``EvaluationCache``, answers and verdicts computed by any earlier
+    run for the same inputs are reused instead of being paid for again.
+    """
+
+    def __init__(
+        self,
+        query_service: QueryService,
+        metric_factory: Callable[[], List[BaseMetric]],
+        answer_concurrency: Optional[int] = None,
+        judge_concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        retry_base_seconds: Optional[float] = None,
+        checkpoint_path: Optional[str] = None,
+        cache: Optional[EvaluationCache] = None,
+        model: Optional[str] = None,
+    ):
+        """
+        Args:
+            query_service: RAG service under evaluation
+            metric_factory: Returns fresh metric instances; called once per case
+                since metrics keep their last score and reason
+            answer_concurrency: Questions answered at once; defaults to
+                EVAL_ANSWER_CONCURRENCY
+            judge_concurrency: Metric measurements at once; defaults to
+                EVAL_JUDGE_CONCURRENCY
+            max_retries: Retries per call on quota errors; defaults to
+                EVAL_MAX_RETRIES
+            retry_base_seconds: First backoff delay; defaults to
+                EVAL_RETRY_BASE_SECONDS
+            checkpoint_path: JSONL file of finished cases to resume from
+            cache: Shared store of answers and verdicts across runs
+            model: Gemini model ``run`` answers with; defaults to LLM_MODEL
+        """
+        self.query_service = query_service
+        self.metric_factory = metric_factory
+        self.answer_concurrency = answer_concurrency or settings.EVAL_ANSWER_CONCURRENCY
+        self.judge_concurrency = judge_concurrency or settings.EVAL_JUDGE_CONCURRENCY
+        self.max_retries = settings.EVAL_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_base_seconds = retry_base_seconds or settings.EVAL_RETRY_BASE_SECONDS
+        self.checkpoint_path = checkpoint_path
+        self.cache = cache
+        self.model = model or query_service.generator.model_name
+        self.retries = {"answer": 0, "judge": 0}
+        self.cache_hits = {"answer": 0, "verdict": 0}
+        self._collection_fingerprint: Optional[str] = None
+
+    def _load_checkpoint(self) -> Dict[str, Dict[str, Any]]:
+        """Latest record per case id; failed cases and other models' answers are run again."""
+        records: Dict[str, Dict[str, Any]] = {}
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return records
+        with open(self.checkpoint_path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave a truncated final line behind
+                    continue
+                records[record["case_id"]] = record
+        return {
+            k: r
+            for k, r in records.items()
+            if r.get("status") != "failed" and r.get("model", self.model) == self.model
+        }
+
+    async def _settle_collection(self) -> None:
+        """Answer cache keys use the collection's contents, so settle them up front."""
+        await self.query_service.arefresh_collection()
+        if self.cache is not None:
+            self._collection_fingerprint = await asyncio.to_thread(
+                self.query_service.collection_fingerprint
+            )
+
+    def _retry(self, stage: str, func):
+        def on_retry(error: BaseException, delay: float) -> None:
+            self.retries[stage] += 1
+            logfire.warn(
+                "Quota error during evaluation; backing off",
+                stage=stage,
+                delay=delay,
+                error=str(error),
+            )
+
+        return retry_on_quota(
+            func, self.max_retries, self.retry_base_seconds, on_retry=on_retry
+        )
+
+    @staticmethod
+    def _case_record(case: EvalCase, model: str) -> Dict[str, Any]:
+        return {
+            "case_id": case.case_id,
+            "input": case.input,
+            "expected_output": case.expected_output,
+            "context": case.context,
+            "model": model,
+        }
+
+    def _cached_answer(
+        self, case: EvalCase, model: str
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Cache key for ``case`` answered by ``model`` and the cached record, if any."""
+        if self.cache is None:
+            return None, None
+        key = EvaluationCache.answer_key(
+            case.input,
+            self._collection_fingerprint,
+            model,
+            self.query_service.prompt_hash(),
+        )
+        cached = self.cache.get(EvaluationCache.ANSWER, key)
+        if cached is None:
+            return key, None
+        self.cache_hits["answer"] += 1
+        record = self._case_record(case, model)
+        return key, {**record, **cached, "status": "answered", "cached": True}
+
+    def _answered(
+        self, record: Dict[str, Any], answer: Dict[str, Any], key: Optional[str]
+    ) -> Dict[str, Any]:
+        # The generator reports failures as "Error: ..." answers; never cache those
+        if answer["actual_output"].startswith("Error"):
+            return {**record, **answer, "status": "failed", "error": answer["actual_output"]}
+        if key is not None:
+            self.cache.put(EvaluationCache.ANSWER, key, answer)
+        return {**record, **answer, "status": "answered"}
+
+    def _prefetch(
+        self, cases: List[EvalCase]
+    ) -> Tuple[Dict[str, "asyncio.Future[Candidates]"], "asyncio.Task[None]"]:
+        """Start retrieving candidates for ``cases``, a group at a time.
+
+        Returns a future per case id, resolved as its group is retrieved, and
+        the task doing the retrieval (cancel it if the run is abandoned).
+        """
+        loop = asyncio.get_running_loop()
+        futures = {case.case_id: loop.create_future() for case in cases}
+        unique = list({case.case_id: case for case in cases}.values())
+
+        async def fetch() -> None:
+            for start in range(0, len(unique), VOYAGE_MAX_BATCH_TEXTS):
+                group = unique[start : start + VOYAGE_MAX_BATCH_TEXTS]
+                try:
+                    found = await self._retry(
+                        "answer",
+                        lambda group=group: self.query_service.aretrieve_candidates(
+                            [case.input for case in group]
+                        ),
+                    )
+                except Exception as e:
+                    for case in group:
+                        if not futures[case.case_id].done():
+                            futures[case.case_id].set_exception(e)
+                    continue
+                for case, candidates in zip(group, found, strict=True):
+                    if not futures[case.case_id].done():
+                        futures[case.case_id].set_result(candidates)
+
+        return futures, asyncio.create_task(fetch())
+
+    async def _answer(
+        self,
+        case: EvalCase,
+        key: Optional[str],
+        candidates: "asyncio.Future[Candidates]",
+    ) -> Dict[str, Any]:
+        model = self.model
+        # Shielded: a cancelled case must not cancel its duplicates' candidates
+        found = await asyncio.shield(candidates)
+
+        async def attempt():
+            result = await self.query_service.aanswer_question(
+                case.input, query_id=case.case_id, candidates=found, model=model
+            )
+            # The generator reports failures as "Error: ..." answers
+            if result.answer.startswith("Error") and is_quota_error(result.answer):
+                raise RuntimeError(result.answer)
+            return result
+
+        started = time.perf_counter()
+        result = await self._retry("answer", attempt)
+        answer = {
+            "actual_output": result.answer,
+            "retrieval_context": result.source_text,
+            "answer_seconds": round(time.perf_counter() - started, 3),
+            "prompt_tokens": result.prompt_tokens,
+        }
+        return self._answered(self._case_record(case, model), answer, key)
+
+    async def _generate(
+        self,
+        case: EvalCase,
+        context: AssembledContext,
+        model: str,
+        key: Optional[str],
+        retrieve_seconds: float,
+    ) -> Dict[str, Any]:
+        """Answer ``case`` with ``model`` from an already retrieved context."""
+
+        async def attempt():
+            started = time.perf_counter()
+            generation = await self.query_service.generator.acomplete(
+                case.input, context.text, model=model
+            )
+            if generation.text.startswith("Error") and is_quota_error(generation.text):
+                raise RuntimeError(generation.text)
+            return generation, time.perf_counter() - started
+
+        generation, generate_seconds = await self._retry("answer", attempt)
+        answer = {
+            "actual_output": generation.text,
+            "retrieval_context": context.sources,
+            # What a caller would wait for: the shared retrieval plus this model
+            "answer_seconds": round(retrieve_seconds + generate_seconds, 3),
+            "generate_seconds": round(generate_seconds, 3),
+            "prompt_tokens": generation.prompt_tokens,
+            "output_tokens": generation.output_tokens,
+        }
+        return self._answered(self._case_record(case, model), answer, key)
+
+    async def _measure(
+        self,
+        metric: BaseMetric,
+        test_case: LLMTestCase,
+        test_case_hash: str,
+        judge_slots: asyncio.Semaphore,
+    ) -> Dict[str, Any]:
+        name = metric.__class__.__name__
+        key = None
+        if self.cache is not None:
+            key = EvaluationCache.verdict_key(
+                f"{name}(threshold={metric.threshold})",
+                test_case_hash,
+                getattr(metric, "evaluation_model", None) or "",
+            )
+            cached = self.cache.get(EvaluationCache.VERDICT, key)
+            if cached is not None:
+                self.cache_hits["verdict"] += 1
+                return {**cached, "cached": True}
+        async with judge_slots:
+            try:
+                await self._retry(
+                    "judge", lambda: metric.a_measure(test_case, _show_indicator=False)
+                )
+            except Exception as e:
+                logfire.error("Metric evaluation failed", metric=name, error=str(e))
+                return {"name": name, "score": None, "error": str(e)}
+        verdict = {
+            "name": name,
+            "score": metric.score,
+            "success": metric.success,
+            "reason": metric.reason,
+        }
+        if key is not None and metric.score is not None:
+            self.cache.put(EvaluationCache.VERDICT, key, verdict)
+        return verdict
+
+    async def _judge(
+        self, record: Dict[str, Any], judge_slots: asyncio.Semaphore
+    ) -> Dict[str, Any]:
+        fields = dict(
+            input=record["input"],
+            actual_output=record["actual_output"],
+            expected_output=record["expected_output"],
+            retrieval_context=record["retrieval_context"],
+            # HallucinationMetric checks against context; fall back to what was retrieved
+            context=record["context"] or record["retrieval_context"],
+        )
+        test_case = LLMTestCase(**fields)
+        test_case_hash = EvaluationCache.test_case_hash(**fields)
+        # A partial record keeps its scores; only errored metrics are measured again
+        scored = {
+            m["name"]: m for m in record.get("metrics", []) if m.get("score") is not None
+        }
+        metrics = self.metric_factory()
+        measured = await asyncio.gather(
+            *(
+                self._measure(metric, test_case, test_case_hash, judge_slots)
+                for metric in metrics
+                if metric.__class__.__name__ not in scored
+            )
+        )
+        remeasured = {m["name"]: m for m in measured}
+        results = [
+            scored.get(name) or remeasured[name]
+            for name in (metric.__class__.__name__ for metric in metrics)
+        ]
+        complete = all(m.get("score") is not None for m in results)
+        return {**record, "metrics": results, "status": "judged" if complete else "partial"}
+
+    async def _judge_all(
+        self, records: List[Dict[str, Any]], judge_slots: asyncio.Semaphore
+    ) -> List[Dict[str, Any]]:
+        async def judge(record: Dict[str, Any]) -> Dict[str, Any]:
+            if record["status"] not in ("answered", "partial"):
+                return record
+            try:
+                return await self._judge(record, judge_slots)
+            except Exception as e:
+                logfire.error("Evaluation case failed", case_id=record["case_id"], error=str(e))
+                return {**record, "status": "failed", "error": str(e)}
+
+        return list(await asyncio.gather(*(judge(record) for record in records)))
+
+    async def run(self, cases: List[EvalCase]) -> Dict[str, Any]:
+        """Evaluate ``cases``; returns per-case records and per-metric aggregates."""
+        done = self._load_checkpoint()
+        await self._settle_collection()
+        # Cached answers need no retrieval; the rest is retrieved in groups
+        answers: Dict[str, Tuple[Optional[str], Optional[Dict[str, Any]]]] = {}
+        for case in cases:
+            if case.case_id not in done and case.case_id not in answers:
+                answers[case.case_id] = self._cached_answer(case, self.model)
+        candidates, fetcher = self._prefetch(
+            [
+                case
+                for case in cases
+                if case.case_id in answers and answers[case.case_id][1] is None
+            ]
+        )
+        answer_slots = asyncio.Semaphore(self.answer_concurrency)
+        judge_slots = asyncio.Semaphore(self.judge_concurrency)
+        out = None
+        if self.checkpoint_path:
+            directory = os.path.dirname(self.checkpoint_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            out = open(self.checkpoint_path, "a")
+
+        def checkpoint(record: Dict[str, Any]) -> None:
+            # Runs on the event loop thread, so lines never interleave
+            if out is not None:
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+
+        async def evaluate(case: EvalCase) -> Dict[str, Any]:
+            record = done.get(case.case_id)
+            if record is not None and record["status"] == "judged":
+                return record
+            try:
+                if record is None:
+                    key, record = answers[case.case_id]
+                    if record is None:
+                        async with answer_slots:
+                            record = await self._answer(
+                                case, key, candidates[case.case_id]
+                            )
+                    checkpoint(record)
+                    if record["status"] == "failed":
+                        return record
+                record = await self._judge(record, judge_slots)
+            except Exception as e:
+                logfire.error("Evaluation case failed", case_id=case.case_id, error=str(e))
+                record = {
+                    **(record or {"case_id": case.case_id, "input": case.input}),
+                    "status": "failed",
+                    "error": str(e),
+                }
+            checkpoint(record)
+            return record
+
+        started = time.perf_counter()
+        try:
+            with logfire.span(
+                "evaluation_run",
+                cases=len(cases),
+                resumed=len(done),
+                answer_concurrency=self.answer_concurrency,
+                judge_concurrency=self.judge_concurrency,
+            ):
+                records = await asyncio.gather(*(evaluate(case) for case in cases))
+        finally:
+            fetcher.cancel()
+            if out is not None:
+                out.close()
+
+        return {
+            "case_count": len(cases),
+            "judged_count": sum(1 for r in records if r["status"] == "judged"),
+            "partial_count": sum(1 for r in records if r["status"] == "partial"),
+            "failed_count": sum(1 for r in records if r["status"] == "failed"),
+            "resumed_count": sum(1 for case in cases if case.case_id in done),
+            "elapsed_seconds": round(time.perf_counter() - started, 2),
+            "retries": dict(self.retries),
+            "cache_hits": dict(self.cache_hits),
+            "metrics": self.aggregate(records),
+            "results": records,
+        }
+
+    async def compare(self, cases: List[EvalCase], models: List[str]) -> Dict[str, Any]:
+        """Evaluate ``cases`` once per model in ``models`` and tabulate the results.
+
+        Each question is retrieved and reranked once; generation then fans out
+        to every model at once from that shared context, and each answer is
+        judged with fresh metrics. Answers and verdicts already in the cache
+        are reused, so re-running a comparison (or adding a model) only pays
+        for what is new. Comparisons are not checkpointed; the cache serves
+        that purpose.
+
+        Returns:
+            ``table`` with one row per model (see ``comparison_table``) and
+            the per-model case records under ``results``
+        """
+        await self._settle_collection()
+        answer_slots = asyncio.Semaphore(self.answer_concurrency)
+        judge_slots = asyncio.Semaphore(self.judge_concurrency)
+
+        answers = [
+            {model: self._cached_answer(case, model) for model in models} for case in cases
+        ]
+        candidates, fetcher = self._prefetch(
+            [
+                case
+                for case, by_model in zip(cases, answers, strict=True)
+                if any(cached is None for _, cached in by_model.values())
+            ]
+        )
+
+        async def evaluate(case: EvalCase, by_model) -> List[Dict[str, Any]]:
+            records = {
+                model: cached for model, (_, cached) in by_model.items() if cached is not None
+            }
+            pending = [model for model in models if model not in records]
+            if pending:
+                try:
+                    async with answer_slots:
+                        found = await asyncio.shield(candidates[case.case_id])
+                        started = time.perf_counter()
+                        context = await self._retry(
+                            "answer",
+                            lambda: self.query_service.aretrieve_context(
+                                case.input, candidates=found
+                            ),
+                        )
+                        retrieve_seconds = time.perf_counter() - started
+                        generated = await asyncio.gather(
+                            *(
+                                self._generate(
+                                    case, context, model, by_model[model][0], retrieve_seconds
+                                )
+                                for model in pending
+                            )
+                        )
+                    records.update(zip(pending, generated, strict=True))
+                except Exception as e:
+                    logfire.error("Evaluation case failed", case_id=case.case_id, error=str(e))
+                    for model in pending:
+                        records[model] = {
+                            **self._case_record(case, model),
+                            "status": "failed",
+                            "error": str(e),
+                        }
+            return await self._judge_all([records[model] for model in models], judge_slots)
+
+        started = time.perf_counter()
+        with logfire.span(
+            "evaluation_compare",
+            cases=len(cases),
+            models=models,
+            answer_concurrency=self.answer_concurrency,
+            judge_concurrency=self.judge_concurrency,
+        ):
+            try:
+                per_case = await asyncio.gather(
+                    *(
+                        evaluate(case, by_model)
+                        for case, by_model in zip(cases, answers, strict=True)
+                    )
+                )
+            finally:
+                fetcher.cancel()
+
+        results = {
+            model: [records[i] for records in per_case] for i, model in enumerate(models)
+        }
+        return {
+            "case_count": len(cases),
+            "models": list(models),
+            "elapsed_seconds": round(time.perf_counter() - started, 2),
+            "retries": dict(self.retries),
+            "cache_hits": dict(self.cache_hits),
+            "table": self.comparison_table(results),
+            "results": results,
+        }
+
+    @classmethod
+    def comparison_table(
+        cls, results: Dict[str, List[Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """Quality, latency and token use per model.
+
+        ``mean_score`` averages the per-metric mean scores. Latencies are per
+        answer including the shared retrieval; token counts are totals over
+        the judged answers (multiply by the model's prices for cost). Answers
+        with an errored metric count as ``partial_count``; the errored metric
+        is left out of its mean.
+        """
+        table = []
+        for model, records in results.items():
+            judged = [r for r in records if r["status"] in ("judged", "partial")]
+            partial = sum(1 for r in records if r["status"] == "partial")
+            metrics = cls.aggregate(records)
+            scores = [m["mean_score"] for m in metrics.values() if m["mean_score"] is not None]
+            latencies = sorted(r["answer_seconds"] for r in judged)
+            generate = [r["generate_seconds"] for r in judged if r.get("generate_seconds") is not None]
+            prompt_tokens = sum(r.get("prompt_tokens") or 0 for r in judged)
+            output_tokens = sum(r.get("output_tokens") or 0 for r in judged)
+            table.append(
+                {
+                    "model": model,
+                    "judged_count": len(judged) - partial,
+                    "partial_count": partial,
+                    "failed_count": len(records) - len(judged),
+                    "mean_score": round(sum(scores) / len(scores), 4) if scores else None,
+                    "metrics": metrics,
+                    "p50_answer_seconds": _percentile(latencies, 50),
+                    "p95_answer_seconds": _percentile(latencies, 95),
+                    "mean_generate_seconds": (
+                        round(sum(generate) / len(generate), 3) if generate else None
+                    ),
+                    "prompt_tokens": prompt_tokens,
+                    "output_tokens": output_tokens,
+                    "tokens_per_answer": (
+                        round((prompt_tokens + output_tokens) / len(judged), 1)
+                        if judged
+                        else None
+                    ),
+                }
+            )
+        return table
+
+    @staticmethod
+    def aggregate(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Mean score, pass rate and error count per metric.
+
+        Errored measurements are excluded from the mean and pass rate and
+        counted under ``errors``.
+        """
+        by_metric: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            for measured in record.get("metrics", []):
+                by_metric.setdefault(measured["name"], []).append(measured)
+        summary = {}
+        for name, measured in by_metric.items():
+            scored = [m for m in measured if m.get("score") is not None]
+            summary[name] = {
+                "mean_score": (
+                    round(sum(m["score"] for m in scored) / len(scored), 4) if scored else None
+                ),
+                "pass_rate": (
+                    round(sum(1 for m in scored if m.get("success")) / len(scored), 4)
+                    if scored
+                    else None
+                ),
+                "count": len(scored),
+                "errors": len(measured) - len(scored),
+            }
+        return summary
@@ -1,84 +1,816 @@
-from typing import Any, Dict
-import logfire
+import fnmatch
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
 import chromadb
+import logfire
+import numpy as np
 import voyageai
 from llama_index.core.node_parser import MarkdownNodeParser
 from llama_index.core.schema import Document
 
-from .semantic_chunking import SemanticChunker
 from ..core.config import settings
+from ..core.metrics import (
+    ERRORS,
+    INGEST_CHUNKS,
+    INGEST_DOCUMENTS,
+    STAGE_SECONDS,
+    metrics,
+)
+from .bulk_writer import BulkWriter
+from .collections import CollectionRegistry, content_fingerprint
+from .embeddings import VOYAGE_MAX_BATCH_TEXTS, Embedder, create_embedder
+from .lexical import LexicalIndex, index_path, remove_index
+from .pipeline import Stage, run_pipeline
+from .semantic_chunking import FILE_BLOCK_SIZE, SemanticChunk, SemanticChunker
+
+# Records read per page when copying vectors between collection versions
+COPY_PAGE_SIZE = 1000
+
+# File patterns picked up when ingesting a directory
+DEFAULT_PATTERNS = ("*.md", "*.markdown", "*.txt")
+
+# Called as progress(stage, **counts) while an ingestion runs
+ProgressCallback = Callable[..., None]
+
+
+def _no_progress(stage: str, **counts: int) -> None:
+    pass
+
+
+def content_hash(text: str) -> str:
+    """Stable identifier for a piece of content."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+@dataclass
+class SourceDocument:
+    """A file to ingest.
+
+    ``source`` identifies the document in chunk metadata and defaults to the
+    file name; ``metadata`` is copied onto every chunk of the document.
+    """
+
+    path: str
+    source: Optional[str] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.source = self.source or os.path.basename(self.path)
+
+
+def discover_documents(
+    directory: str, patterns: Sequence[str] = DEFAULT_PATTERNS
+) -> List[SourceDocument]:
+    """List the files under ``directory`` matching ``patterns``.
+
+    Each document's source is its path relative to ``directory``.
+    """
+    if not os.path.isdir(directory):
+        raise FileNotFoundError(f"Document directory not found at: {directory}")
+    documents = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                path = os.path.join(root, name)
+                documents.append(
+                    SourceDocument(path, source=os.path.relpath(path, directory))
+                )
+    return sorted(documents, key=lambda document: document.source)
+
+
+def load_manifest(manifest_path: str) -> List[SourceDocument]:
+    """Read documents from a JSON array or JSONL manifest.
+
+    Each entry is a path string or an object with ``path`` and optional
+    ``source`` (defaults to the path as written) and ``metadata``. Relative
+    paths are resolved against the manifest's directory.
+    """
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"Manifest not found at: {manifest_path}")
+    try:
+        with open(manifest_path, "r") as f:
+            if manifest_path.endswith(".jsonl"):
+                entries = [json.loads(line) for line in f if line.strip()]
+            else:
+                entries = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON format in manifest: {manifest_path}") from e
+
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    documents = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"path": entry}
+        if not isinstance(entry, dict) or not entry.get("path"):
+            raise ValueError(f"Manifest entries need a path: {entry!r}")
+        path = entry["path"]
+        documents.append(
+            SourceDocument(
+                path=path if os.path.isabs(path) else os.path.join(base, path),
+                source=entry.get("source") or path,
+                metadata=entry.get("metadata") or {},
+            )
+        )
+    return documents
+
+
+@dataclass
+class _DocumentWork:
+    """A document's state as it moves through the ingestion stages."""
+
+    document: SourceDocument
+    doc_hash: str = ""
+    existing: Dict[str, Any] = field(default_factory=dict)
+    records: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    new_ids: List[str] = field(default_factory=list)
+    written_ids: List[str] = field(default_factory=list)
+
+
+class _EmbeddedBatch(NamedTuple):
+    """One embedded batch of a document's new chunks, on its way to Chroma."""
+
+    work: _DocumentWork
+    ids: List[str]
+    embeddings: List[List[float]]
+    # Set on the document's final batch (which may be empty)
+    last: bool = False
+    # Set instead of ``last`` data when embedding the document failed
+    error: Optional[str] = None
 
 
 class IngestService:
-    """Service for ingesting documents into the vector database using semantic chunking."""
+    """Service for ingesting documents into the vector database using semantic chunking.
+
+    ``ingest_documents`` runs reading, chunking, embedding and Chroma writes
+    as overlapping stages connected by bounded queues, each with its own
+    thread pool, so many documents are in flight at once. Every run builds a
+    new collection version that is promoted only after validation.
+    """
 
-    def __init__(self):
-        """Initialize the service."""
-        self.voyage_client = voyageai.Client(api_key=settings.VOYAGE_API_KEY)
-        self.chroma_client = chromadb.PersistentClient(path=settings.VECTOR_DB_PATH)
-        self.semantic_chunker = SemanticChunker()
+    def __init__(
+        self,
+        voyage_client: Optional[voyageai.Client] = None,
+        chroma_client: Optional[chromadb.ClientAPI] = None,
+        collection_registry: Optional[CollectionRegistry] = None,
+        reuse_chunk_embeddings: Optional[bool] = None,
+        embedder: Optional[Embedder] = None,
+    ):
+        """Initialize the service.
+
+        Args:
+            voyage_client: Shared VoyageAI client for the Voyage embedding
+                backend; a new one is created when omitted
+            chroma_client: Shared Chroma client; a new one is created when omitted
+            collection_registry: Alias pointers used for blue/green promotion
+            reuse_chunk_embeddings: Build chunk vectors from the chunker's
+                sentence-window embeddings instead of embedding chunks again;
+                defaults to INGEST_REUSE_CHUNK_EMBEDDINGS
+            embedder: Shared embedder for sentence windows and chunks; built
+                for EMBEDDING_BACKEND when omitted
+        """
+        self.voyage_client = voyage_client or voyageai.Client(
+            api_key=settings.VOYAGE_API_KEY
+        )
+        self.chroma_client = chroma_client or chromadb.PersistentClient(
+            path=settings.VECTOR_DB_PATH
+        )
+        self.collection_registry = collection_registry or CollectionRegistry()
+        self.reuse_chunk_embeddings = (
+            settings.INGEST_REUSE_CHUNK_EMBEDDINGS
+            if reuse_chunk_embeddings is None
+            else reuse_chunk_embeddings
+        )
+        self.embedder = embedder or create_embedder(voyage_client=self.voyage_client)
+        self.semantic_chunker = SemanticChunker(embedder=self.embedder)
         self.markdown_path = "app/gen-ai-homework-assignment/input/medicare_comparison.md"
 
-    def ingest_medicare_docs(self) -> Dict[str, Any]:
+    def ingest_medicare_docs(
+        self, progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
         """
         Ingest medicare docs into the vector database.
 
+        Args:
+            progress: Optional callback invoked as ``progress(stage, **counts)``
+                when a stage starts and as chunks are embedded and written
+
         Returns:
             Dict with ingestion status and details
         """
-        with logfire.span("ingestion_pipeline"):
-            # Read the markdown file
-            try:
-                with open(self.markdown_path, "r") as f:
-                    markdown_doc = f.read()
-            except FileNotFoundError:
-                raise FileNotFoundError(
-                    f"Markdown file not found at: {self.markdown_path}"
-                )
+        if not os.path.exists(self.markdown_path):
+            raise FileNotFoundError(f"Markdown file not found at: {self.markdown_path}")
+        result = self.ingest_documents(
+            [SourceDocument(self.markdown_path)], progress=progress, fail_fast=True
+        )
+        if result["added_count"] or result["deleted_count"]:
+            result["message"] = (
+                "Successfully ingested medicare data into vector database using semantic chunking"
+            )
+        return result
+
+    def ingest_documents(
+        self,
+        documents: Iterable[SourceDocument],
+        progress: Optional[ProgressCallback] = None,
+        fail_fast: bool = False,
+        read_workers: Optional[int] = None,
+        chunk_workers: Optional[int] = None,
+        embed_workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        fast_load: Optional[bool] = None,
+        write_batch_size: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Ingest many documents into a new version of the collection.
 
-            # Perform Semantic Chunking
-            with logfire.span("performing_semantic_chunking"):
-                chunks = self.semantic_chunker.chunk(markdown_doc)
+        Documents whose content and metadata are unchanged since the active
+        version are carried over without chunking or embedding. Chunks of
+        documents not listed are kept as they are.
 
-            # Prepare text, metadata, and ids
-            ids = [f"doc_{i}" for i in range(len(chunks))]
-            metadatas = [{"source": "medicare_comparison.md", "chunk_index": i} for i in range(len(chunks))]
+        Args:
+            documents: Files to ingest
+            progress: Optional callback invoked as ``progress(stage, **counts)``
+            fail_fast: Abort the run on the first failing document; otherwise
+                failures are reported and those documents keep their previous chunks
+            read_workers: Threads hashing files and diffing them against the
+                active collection; defaults to INGEST_READ_WORKERS
+            chunk_workers: Threads running semantic chunking; defaults to
+                INGEST_CHUNK_WORKERS
+            embed_workers: Threads embedding chunks (concurrent Voyage
+                requests); defaults to INGEST_EMBED_WORKERS
+            queue_size: Documents (or embedded batches) buffered between
+                stages; defaults to INGEST_QUEUE_SIZE
+            fast_load: Write with ``add`` instead of ``upsert``; defaults to
+                True for the initial build, when there is no active collection
+            write_batch_size: Records per Chroma write; defaults to
+                CHROMA_WRITE_BATCH_SIZE
 
-            # Generate embeddings with VoyageAI
-            with logfire.span("generating_embeddings"):
+        Returns:
+            Dict with ingestion status and details
+        """
+        progress = progress or _no_progress
+        documents = list(documents)
+        alias = settings.CHROMA_COLLECTION_NAME
+        started = time.monotonic()
+
+        active_pointer = self.collection_registry.resolve(alias)
+        try:
+            active = self.chroma_client.get_collection(name=active_pointer.name)
+        except Exception:
+            active = None  # First ingestion
+        built_with = (active.metadata or {}).get("embedding_model") if active else None
+        if built_with and built_with != self.embedder.model:
+            # Vectors from another model can't be copied forward or diffed
+            # against; rebuild from the listed documents only
+            logfire.warn(
+                "Embedding model changed; rebuilding collection",
+                previous=built_with,
+                current=self.embedder.model,
+            )
+            active = None
+        fast_load = active is None if fast_load is None else fast_load
+
+        lock = threading.Lock()
+        counts = {
+            "documents_total": len(documents),
+            "documents_done": 0,
+            "chunk_count": 0,
+            "chunks_embedded": 0,
+            "chunks_written": 0,
+        }
+        totals = {"added": 0, "unchanged": 0, "deleted": 0, "unchanged_documents": 0}
+        # Refreshed metadata of every processed document's surviving chunks,
+        # used when copying forward from the active version
+        changed: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        failed: List[Dict[str, str]] = []
+        shadow: Dict[str, Any] = {}
+
+        def report(stage: str, **increments: int) -> None:
+            with lock:
+                for name, value in increments.items():
+                    counts[name] += value
+                snapshot = dict(counts)
+            progress(stage, **snapshot)
+
+        def guarded(
+            stage_name: str, func: Callable[[_DocumentWork], Optional[_DocumentWork]]
+        ) -> Callable[[_DocumentWork], Optional[_DocumentWork]]:
+            """Record a failing document and drop it, unless ``fail_fast``."""
+
+            def run(work: _DocumentWork) -> Optional[_DocumentWork]:
                 try:
-                    embeddings_response = self.voyage_client.embed(
-                        texts=chunks,
-                        model="voyage-3",
-                        input_type="document",
-                    )
-                    embeddings = embeddings_response.embeddings
+                    return func(work)
                 except Exception as e:
-                    raise ValueError(f"Error generating embeddings: {str(e)}")
+                    if fail_fast:
+                        raise
+                    record_failure(work, stage_name, str(e))
+                    return None
 
-            # Add documents to Chroma
-            with logfire.span("storing_in_chroma"):
-                try:
-                    # Delete collection if it exists to ensure freshness
+            return run
+
+        def record_failure(work: _DocumentWork, stage_name: str, error: str) -> None:
+            logfire.error(
+                "Document ingestion failed",
+                source=work.document.source,
+                stage=stage_name,
+                error=error,
+            )
+            metrics.inc(ERRORS, stage=f"ingest_{stage_name}")
+            with lock:
+                failed.append({"source": work.document.source, "error": error})
+            report(stage_name, documents_done=1)
+
+        def read(work: _DocumentWork) -> Optional[_DocumentWork]:
+            document = work.document
+            with metrics.track("ingest_reading"):
+                work.doc_hash = self._document_hash(document)
+                if active is not None:
+                    existing = active.get(
+                        where={"source": document.source}, include=["metadatas"]
+                    )
+                    work.existing = dict(
+                        zip(existing["ids"], existing["metadatas"], strict=True)
+                    )
+            if work.existing and all(
+                (m or {}).get("doc_hash") == work.doc_hash for m in work.existing.values()
+            ):
+                # Unchanged: no chunking, embedding or writes needed
+                with lock:
+                    totals["unchanged"] += len(work.existing)
+                    totals["unchanged_documents"] += 1
+                report("reading", documents_done=1, chunk_count=len(work.existing))
+                return None
+            return work
+
+        def chunk(work: _DocumentWork) -> _DocumentWork:
+            document = work.document
+            with (
+                logfire.span("performing_semantic_chunking", source=document.source),
+                metrics.track("ingest_chunking"),
+            ):
+                for i, piece in enumerate(self.semantic_chunker.chunk_file(document.path)):
+                    # Content-addressed ids: identical chunk text maps to the same id
+                    chunk_id = content_hash(f"{document.source}\0{piece.text}")
+                    work.records.setdefault(
+                        chunk_id,
+                        {
+                            "document": piece.text,
+                            "chunk": self._retained(piece),
+                            "metadata": {
+                                **document.metadata,
+                                "source": document.source,
+                                "chunk_index": i,
+                                "sentence_start": piece.start_sentence,
+                                "sentence_end": piece.end_sentence,
+                                "doc_hash": work.doc_hash,
+                            },
+                        },
+                    )
+            work.new_ids = [i for i in work.records if i not in work.existing]
+            report("chunking", chunk_count=len(work.records))
+            return work
+
+        def embed(work: _DocumentWork) -> Iterator[_EmbeddedBatch]:
+            # Generate embeddings with VoyageAI, only for new or changed chunks.
+            # Batches are handed to the writer as they finish, so batch N is
+            # written while batch N+1 is embedded.
+            error = None
+            with logfire.span(
+                "generating_embeddings",
+                source=work.document.source,
+                new_chunks=len(work.new_ids),
+                reuse_chunk_embeddings=self.reuse_chunk_embeddings,
+            ):
+                batches = self.iter_chunk_embeddings(
+                    [work.records[i]["chunk"] for i in work.new_ids]
+                )
+                while True:
+                    batch_started = time.perf_counter()
                     try:
-                        self.chroma_client.delete_collection(name=settings.CHROMA_COLLECTION_NAME)
-                    except:
-                        pass  # Collection might not exist
-
-                    collection = self.chroma_client.create_collection(name=settings.CHROMA_COLLECTION_NAME)
-                    collection.add(
-                        embeddings=embeddings, 
-                        documents=chunks, 
-                        metadatas=metadatas, 
-                        ids=ids
+                        indices, embeddings = next(batches)
+                    except StopIteration:
+                        break
+                    except Exception as e:
+                        if fail_fast:
+                            raise ValueError(
+                                f"Error generating embeddings: {str(e)}"
+                            ) from e
+                        # The writer removes batches already written, then records it
+                        error = f"Error generating embeddings: {str(e)}"
+                        break
+                    metrics.observe(
+                        STAGE_SECONDS,
+                        time.perf_counter() - batch_started,
+                        stage="ingest_embedding",
                     )
+                    ids = [work.new_ids[i] for i in indices]
+                    for i in ids:
+                        # Window embeddings are no longer needed
+                        work.records[i].pop("chunk", None)
+                    report("embedding", chunks_embedded=len(ids))
+                    yield _EmbeddedBatch(work, ids, embeddings)
+            for record in work.records.values():
+                record.pop("chunk", None)
+            yield _EmbeddedBatch(work, [], [], last=True, error=error)
+
+        def on_written(written: int) -> None:
+            with lock:
+                counts["chunks_written"] = written
+                snapshot = dict(counts)
+            progress("writing", **snapshot)
+
+        def write(batch: _EmbeddedBatch) -> None:
+            # Single writer stage feeding the bulk writer's own write thread
+            work = batch.work
+            batch_started = time.perf_counter()
+            try:
+                writer = self._shadow(
+                    alias, shadow, fast_load, write_batch_size, on_written
+                )
+                if batch.ids:
+                    writer.add(
+                        ids=batch.ids,
+                        embeddings=batch.embeddings,
+                        documents=[work.records[i]["document"] for i in batch.ids],
+                        metadatas=[work.records[i]["metadata"] for i in batch.ids],
+                    )
+                    work.written_ids.extend(batch.ids)
+                if batch.error and work.written_ids:
+                    # Drop the failed document's partial writes; it keeps its old chunks
+                    writer.flush()
+                    for start in range(0, len(work.written_ids), writer.batch_size):
+                        shadow["collection"].delete(
+                            ids=work.written_ids[start : start + writer.batch_size]
+                        )
+                    writer.written -= len(work.written_ids)
+            except Exception as e:
+                metrics.inc(ERRORS, stage="ingest_writing")
+                raise ValueError(f"Error storing data in Chroma DB: {str(e)}") from e
+            metrics.observe(
+                STAGE_SECONDS, time.perf_counter() - batch_started, stage="ingest_writing"
+            )
+            if batch.error:
+                record_failure(work, "embedding", batch.error)
+                return
+            if not batch.last:
+                return
+            kept = [i for i in work.records if i in work.existing]
+            with lock:
+                changed[work.document.source] = {
+                    i: work.records[i]["metadata"] for i in kept
+                }
+                totals["added"] += len(work.new_ids)
+                totals["unchanged"] += len(kept)
+                totals["deleted"] += len(work.existing) - len(kept)
+            report("writing", documents_done=1)
+
+        with (
+            logfire.span("ingestion_pipeline", alias=alias, document_count=len(documents)),
+            metrics.track("ingest"),
+        ):
+            progress("reading", **counts)
+            try:
+                run_pipeline(
+                    (_DocumentWork(document) for document in documents),
+                    [
+                        Stage(
+                            "reading",
+                            guarded("reading", read),
+                            read_workers or settings.INGEST_READ_WORKERS,
+                        ),
+                        Stage(
+                            "chunking",
+                            guarded("chunking", chunk),
+                            chunk_workers or settings.INGEST_CHUNK_WORKERS,
+                        ),
+                        Stage(
+                            "embedding",
+                            guarded("embedding", embed),
+                            embed_workers or settings.INGEST_EMBED_WORKERS,
+                            fan_out=True,
+                        ),
+                        Stage("writing", write, 1),
+                    ],
+                    queue_size=queue_size or settings.INGEST_QUEUE_SIZE,
+                )
+            except Exception:
+                self._drop_shadow(shadow)
+                raise
+
+            elapsed = time.monotonic() - started
+            summary = {
+                "status": "success" if not failed else "partial",
+                "alias": alias,
+                "db_path": settings.VECTOR_DB_PATH,
+                "document_count": len(documents),
+                "documents_unchanged": totals["unchanged_documents"],
+                "documents_failed": failed,
+                "documents_per_second": (
+                    round(len(documents) / elapsed, 2) if elapsed else None
+                ),
+                "chunk_count": counts["chunk_count"],
+                "added_count": totals["added"],
+                "unchanged_count": totals["unchanged"],
+                "deleted_count": totals["deleted"],
+            }
+            for result, count in (
+                ("unchanged", totals["unchanged_documents"]),
+                ("failed", len(failed)),
+                ("changed", len(changed)),
+            ):
+                metrics.inc(INGEST_DOCUMENTS, count, result=result)
+            for result in ("added", "unchanged", "deleted"):
+                metrics.inc(INGEST_CHUNKS, totals[result], result=result)
+
+            # Nothing changed: keep serving the active version
+            if not changed:
+                self._drop_shadow(shadow)
+                if failed and len(failed) == len(documents):
+                    summary["status"] = "failed"
+                return {
+                    **summary,
+                    "message": "Documents unchanged; nothing to ingest",
+                    "collection_name": active_pointer.name,
+                    "version": active_pointer.version,
+                }
+
+            # Carry over every other chunk, then validate and promote.
+            # Every changed document went through the writer, which created the shadow
+            pointer, collection = shadow["pointer"], shadow["collection"]
+            writer: BulkWriter = shadow["writer"]
+            with logfire.span(
+                "storing_in_chroma",
+                collection=pointer.name,
+                added=totals["added"],
+                unchanged=totals["unchanged"],
+                deleted=totals["deleted"],
+                fast_load=fast_load,
+                write_batch_size=writer.batch_size,
+            ):
+                try:
+                    if active is not None:
+                        self._copy_forward(active, writer, changed)
+                    writer.close()
+                    progress("validating", **counts)
+                    self._validate(collection, expected_count=writer.written)
+                    progress("indexing", **counts)
+                    indexed = self.build_lexical_index(pointer.name, collection)
+                    pointer = pointer._replace(fingerprint=indexed["fingerprint"])
                 except Exception as e:
-                    raise ValueError(f"Error storing data in Chroma DB: {str(e)}")
+                    self._drop_shadow(shadow)
+                    raise ValueError(
+                        f"Error storing data in Chroma DB: {str(e)}"
+                    ) from e
+
+            # Flip the alias, then drop versions whose grace period is over
+            if not self.collection_registry.promote(alias, pointer):
+                self._drop_shadow(shadow)
+                raise ValueError(
+                    f"A newer version of {alias} was promoted while this ingest ran; "
+                    f"discarded {pointer.name}"
+                )
+            for name in self.collection_registry.collect_garbage(
+                alias, self.chroma_client
+            ):
+                remove_index(name, self.collection_registry.db_path)
 
             return {
-                "status": "success",
-                "message": "Successfully ingested medicare data into vector database using semantic chunking",
-                "chunk_count": len(chunks),
-                "collection_name": settings.CHROMA_COLLECTION_NAME,
-                "db_path": settings.VECTOR_DB_PATH,
+                **summary,
+                "message": (
+                    f"Ingested {len(changed)} changed document(s) into vector "
+                    "database using semantic chunking"
+                ),
+                "collection_name": pointer.name,
+                "version": pointer.version,
             }
+
+    @staticmethod
+    def _document_hash(document: SourceDocument) -> str:
+        """Hash a file's bytes (and any per-file metadata) without loading it whole."""
+        digest = hashlib.sha256()
+        try:
+            with open(document.path, "rb") as f:
+                while block := f.read(FILE_BLOCK_SIZE):
+                    digest.update(block)
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f"Document not found at: {document.path}") from e
+        if document.metadata:
+            digest.update(b"\0" + json.dumps(document.metadata, sort_keys=True).encode())
+        return digest.hexdigest()[:32]
+
+    def _shadow(
+        self,
+        alias: str,
+        shadow: Dict[str, Any],
+        fast_load: bool,
+        batch_size: Optional[int],
+        on_written: Callable[[int], None],
+    ) -> BulkWriter:
+        """Create this run's shadow collection and its bulk writer on first use.
+
+        Ingestion writes into a fresh versioned collection; queries keep
+        using the active one until the shadow has been validated and promoted.
+        """
+        if "writer" not in shadow:
+            pointer = self.collection_registry.next_version(alias, self.chroma_client)
+            shadow["pointer"] = pointer
+            # Label the collection so queries can refuse a mismatched embedder
+            metadata: Dict[str, Any] = {"embedding_model": self.embedder.model}
+            if self.embedder.dimension:
+                metadata["embedding_dimension"] = self.embedder.dimension
+            shadow["collection"] = self.chroma_client.create_collection(
+                name=pointer.name, metadata=metadata
+            )
+            shadow["writer"] = BulkWriter(
+                shadow["collection"],
+                client=self.chroma_client,
+                batch_size=batch_size,
+                fast_load=fast_load,
+                progress=on_written,
+            )
+        return shadow["writer"]
+
+    def _drop_shadow(self, shadow: Dict[str, Any]) -> None:
+        if "writer" in shadow:
+            shadow["writer"].abort()
+        if "pointer" in shadow:
+            self._drop(shadow["pointer"].name)
+
+    def _retained(self, chunk: SemanticChunk) -> SemanticChunk:
+        """The part of ``chunk`` the embed stage needs.
+
+        Window embeddings are views of the chunker's per-segment matrix, so
+        holding them would keep every sentence embedding of the document
+        alive until embedding. Only the pooled vector, in its own array, is
+        kept, and only when it will be reused.
+        """
+        pooled = chunk.pooled_embedding() if self.reuse_chunk_embeddings else None
+        return SemanticChunk(
+            chunk.text,
+            chunk.start_sentence,
+            chunk.end_sentence,
+            window_embeddings=(
+                None if pooled is None else np.asarray([pooled], dtype=np.float32)
+            ),
+        )
+
+    def embed_chunks(
+        self,
+        chunks: List[SemanticChunk],
+        progress: Optional[ProgressCallback] = None,
+    ) -> List[List[float]]:
+        """Embed chunks for storage.
+
+        With ``reuse_chunk_embeddings`` a chunk's vector is pooled from the
+        sentence-window embeddings computed during chunking, so only chunks
+        without them (e.g. single-sentence documents) are sent to the embedder.
+        """
+        progress = progress or _no_progress
+        embeddings: List[Optional[List[float]]] = [None] * len(chunks)
+        done = 0
+        progress("embedding", chunks_embedded=done)
+        for indices, batch_embeddings in self.iter_chunk_embeddings(chunks):
+            for i, embedding in zip(indices, batch_embeddings, strict=True):
+                embeddings[i] = embedding
+            done += len(indices)
+            progress("embedding", chunks_embedded=done)
+        return embeddings
+
+    def iter_chunk_embeddings(
+        self, chunks: List[SemanticChunk]
+    ) -> Iterator[Tuple[List[int], List[List[float]]]]:
+        """Embed chunks batch by batch.
+
+        Yields:
+            ``(indices, embeddings)`` pairs, indices pointing into ``chunks``;
+            pooled vectors (with ``reuse_chunk_embeddings``) come first
+        """
+        missing = list(range(len(chunks)))
+        if self.reuse_chunk_embeddings:
+            pooled = [(i, chunk.pooled_embedding()) for i, chunk in enumerate(chunks)]
+            missing = [i for i, embedding in pooled if embedding is None]
+            pooled = [(i, embedding) for i, embedding in pooled if embedding is not None]
+            for start in range(0, len(pooled), VOYAGE_MAX_BATCH_TEXTS):
+                page = pooled[start : start + VOYAGE_MAX_BATCH_TEXTS]
+                yield [i for i, _ in page], [embedding for _, embedding in page]
+
+        texts = [chunks[i].text for i in missing]
+        for batch, embeddings in self.embedder.embed_batches(texts, "document"):
+            yield [missing[j] for j in batch], embeddings
+
+    def _copy_forward(
+        self,
+        active: chromadb.Collection,
+        shadow: BulkWriter,
+        changed: Dict[str, Dict[str, Dict[str, Any]]],
+    ) -> int:
+        """Copy still-valid vectors from the active collection into the shadow.
+
+        Chunks of sources not in ``changed`` are copied as-is. Chunks of a
+        changed source are copied only if they are still present, with
+        refreshed metadata, so unchanged text is never re-embedded and stale
+        chunks are dropped.
+
+        Args:
+            shadow: Bulk writer for the shadow collection; the next page is
+                read while the previous one is written
+            changed: Surviving chunk id -> new metadata, per re-ingested source
+
+        Returns:
+            Number of records copied
+        """
+        copied = 0
+        offset = 0
+        while True:
+            page = active.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=COPY_PAGE_SIZE,
+                offset=offset,
+            )
+            if not page["ids"]:
+                return copied
+            offset += len(page["ids"])
+
+            ids, embeddings, documents, metadatas = [], [], [], []
+            for i, record_id in enumerate(page["ids"]):
+                metadata = page["metadatas"][i] or {}
+                kept = changed.get(metadata.get("source"))
+                if kept is not None:
+                    if record_id not in kept:
+                        continue  # Stale chunk
+                    metadata = kept[record_id]
+                ids.append(record_id)
+                embeddings.append(page["embeddings"][i])
+                documents.append(page["documents"][i])
+                metadatas.append(metadata)
+
+            if ids:
+                shadow.add(
+                    ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas
+                )
+                copied += len(ids)
+
+    @staticmethod
+    def _validate(collection: chromadb.Collection, expected_count: int) -> None:
+        """Check counts and run a smoke query before a collection goes live."""
+        count = collection.count()
+        if count != expected_count:
+            raise ValueError(
+                f"Shadow collection has {count} records, expected {expected_count}"
+            )
+        if count == 0:
+            raise ValueError("Shadow collection is empty")
+        probe = collection.get(limit=1, include=["embeddings"])
+        results = collection.query(query_embeddings=[probe["embeddings"][0]], n_results=1)
+        if not results["ids"] or not results["ids"][0]:
+            raise ValueError("Smoke query against shadow collection returned no results")
+
+    def build_lexical_index(
+        self, name: Optional[str] = None, collection: Optional[chromadb.Collection] = None
+    ) -> Dict[str, Any]:
+        """Build and save the BM25 index used by hybrid retrieval.
+
+        Runs for every new collection version during ingestion; call it
+        directly to backfill a collection ingested before indexes existed.
+
+        Args:
+            name: Collection to index; defaults to the alias's active version
+            collection: The already opened collection ``name``
+        """
+        name = name or self.collection_registry.resolve(settings.CHROMA_COLLECTION_NAME).name
+        collection = collection or self.chroma_client.get_collection(name=name)
+        with logfire.span("building_lexical_index", collection=name):
+            index = LexicalIndex.from_collection(collection)
+            path = index_path(name, self.collection_registry.db_path)
+            index.save(path)
+        return {
+            "collection_name": name,
+            "documents": len(index),
+            "terms": len(index.vocabulary),
+            "path": path,
+            "fingerprint": content_fingerprint(index.ids),
+        }
+
+    def _drop(self, name: str) -> None:
+        remove_index(name, self.collection_registry.db_path)
+        try:
+            self.chroma_client.delete_collection(name=name)
+        except Exception:
+            pass  # Never created
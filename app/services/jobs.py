@@ -0,0 +1,137 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import logfire
+
+from ..core.config import settings
+from ..models.schemas import IngestJobStatus
+from .ingest import ProgressCallback
+
+# An ingestion task receives a progress callback and returns its summary
+IngestTask = Callable[[ProgressCallback], Dict[str, Any]]
+
+
+class IngestJobManager:
+    """Runs ingestion tasks as background jobs with progress reporting.
+
+    Jobs execute on a dedicated thread pool so HTTP requests return as soon as
+    a job is queued. Jobs targeting the same collection are serialized with a
+    per-collection lock; jobs for different collections may run in parallel.
+    Only the most recent ``max_jobs`` job records are retained.
+    """
+
+    def __init__(
+        self,
+        on_complete: Optional[Callable[[], None]] = None,
+        max_workers: Optional[int] = None,
+        max_jobs: int = 100,
+    ):
+        """
+        Args:
+            on_complete: Called after every successful job, e.g. to reload
+                query services onto the new collection
+            max_workers: Number of jobs that may run at once
+            max_jobs: Number of job records kept for status queries
+        """
+        self.on_complete = on_complete
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.INGEST_MAX_WORKERS,
+            thread_name_prefix="ingest",
+        )
+        self._jobs: "OrderedDict[str, IngestJobStatus]" = OrderedDict()
+        self._collection_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self, task: IngestTask, collection_name: Optional[str] = None
+    ) -> IngestJobStatus:
+        """Queue ``task`` and return its initial status."""
+        collection_name = collection_name or settings.CHROMA_COLLECTION_NAME
+        job = IngestJobStatus(
+            job_id=uuid.uuid4().hex,
+            collection_name=collection_name,
+            status="queued",
+            submitted_at=datetime.now(),
+        )
+        with self._lock:
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+            collection_lock = self._collection_locks.setdefault(
+                collection_name, threading.Lock()
+            )
+        self._executor.submit(self._run, job.job_id, task, collection_lock)
+        return job.model_copy()
+
+    def get(self, job_id: str) -> Optional[IngestJobStatus]:
+        """Return a snapshot of the job's status, or ``None`` if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy() if job else None
+
+    def list(self) -> List[IngestJobStatus]:
+        """Return snapshots of all retained jobs, oldest first."""
+        with self._lock:
+            return [job.model_copy() for job in self._jobs.values()]
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            for name, value in fields.items():
+                setattr(job, name, value)
+
+    def _run(
+        self, job_id: str, task: IngestTask, collection_lock: threading.Lock
+    ) -> None:
+        with collection_lock:
+            started = time.monotonic()
+            self._update(job_id, status="running", started_at=datetime.now())
+
+            def progress(stage: str, **counts: int) -> None:
+                fields: Dict[str, Any] = {"stage": stage, **counts}
+                embedded = counts.get("chunks_embedded")
+                elapsed = time.monotonic() - started
+                if embedded and elapsed > 0:
+                    fields["chunks_per_second"] = round(embedded / elapsed, 2)
+                documents = counts.get("documents_done")
+                if documents and elapsed > 0:
+                    fields["documents_per_second"] = round(documents / elapsed, 2)
+                self._update(job_id, **fields)
+
+            with logfire.span("ingest_job", job_id=job_id):
+                try:
+                    result = task(progress)
+                except Exception as e:
+                    logfire.error("Ingestion job failed", job_id=job_id, error=str(e))
+                    self._update(
+                        job_id,
+                        status="failed",
+                        error=str(e),
+                        finished_at=datetime.now(),
+                    )
+                    return
+
+            self._update(
+                job_id,
+                status="succeeded",
+                stage=None,
+                result=result,
+                finished_at=datetime.now(),
+            )
+            if self.on_complete is not None:
+                try:
+                    self.on_complete()
+                except Exception as e:
+                    logfire.error("Post-ingestion hook failed", job_id=job_id, error=str(e))
+
+    def shutdown(self) -> None:
+        """Stop accepting jobs; running jobs finish in the background."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,208 @@
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import chromadb
+import logfire
+import numpy as np
+
+from ..core.config import settings
+
+TOKEN = re.compile(r"\w+")
+
+# Directory, inside the Chroma data directory, holding one index per collection
+INDEX_DIRECTORY = "lexical"
+
+# Records read per page when building an index from a collection
+BUILD_PAGE_SIZE = 1000
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; single letters are kept so "Part D" stays searchable."""
+    return TOKEN.findall(text.lower())
+
+
+def index_path(collection_name: str, db_path: Optional[str] = None) -> str:
+    """Where the lexical index of ``collection_name`` is stored."""
+    return os.path.join(
+        db_path or settings.VECTOR_DB_PATH, INDEX_DIRECTORY, f"{collection_name}.npz"
+    )
+
+
+def remove_index(collection_name: str, db_path: Optional[str] = None) -> None:
+    try:
+        os.remove(index_path(collection_name, db_path))
+    except FileNotFoundError:
+        pass
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[str]], k: Optional[int] = None
+) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: each id scores ``sum(1 / (k + rank))``.
+
+    Returns:
+        ``(id, score)`` pairs, best first
+    """
+    k = settings.RRF_K if k is None else k
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda pair: -pair[1])
+
+
+class LexicalIndex:
+    """Compact BM25 inverted index over a collection's chunks.
+
+    Postings are stored CSR-style: the documents containing term ``t`` are
+    ``postings[offsets[t]:offsets[t + 1]]``, and ``impacts`` holds each
+    posting's precomputed BM25 contribution (idf and length normalisation
+    included), so a query is a few vectorized scatter-adds.
+
+    Indexes are built at ingest time for each collection version and saved
+    next to the Chroma data with ``save``; they never change afterwards.
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        terms: Sequence[str],
+        offsets: np.ndarray,
+        postings: np.ndarray,
+        impacts: np.ndarray,
+    ):
+        self.ids = list(ids)
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.postings = postings
+        self.impacts = impacts
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(
+        cls,
+        ids: Sequence[str],
+        documents: Iterable[str],
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> "LexicalIndex":
+        """Index ``documents`` (aligned with ``ids``) with BM25 parameters ``k1`` and ``b``."""
+        vocabulary: Dict[str, int] = {}
+        term_ids: List[np.ndarray] = []
+        frequencies: List[np.ndarray] = []
+        lengths: List[int] = []
+        for document in documents:
+            counts = Counter(tokenize(document))
+            term_ids.append(
+                np.fromiter(
+                    (vocabulary.setdefault(t, len(vocabulary)) for t in counts),
+                    dtype=np.int64,
+                    count=len(counts),
+                )
+            )
+            frequencies.append(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+            lengths.append(sum(counts.values()))
+        if len(lengths) != len(ids):
+            raise ValueError(f"Got {len(lengths)} documents for {len(ids)} ids")
+
+        doc_lengths = np.asarray(lengths, dtype=np.float32)
+        doc_of = np.repeat(np.arange(len(lengths), dtype=np.int32), [len(t) for t in term_ids])
+        term_of = np.concatenate(term_ids) if term_ids else np.zeros(0, dtype=np.int64)
+        tf = np.concatenate(frequencies) if frequencies else np.zeros(0, dtype=np.float32)
+
+        # Group postings by term
+        order = np.argsort(term_of, kind="stable")
+        term_of, doc_of, tf = term_of[order], doc_of[order], tf[order]
+        df = np.bincount(term_of, minlength=len(vocabulary))
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+
+        n = len(lengths)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        average = max(float(doc_lengths.mean()) if n else 0.0, 1.0)
+        norm = k1 * (1 - b + b * doc_lengths[doc_of] / average)
+        impacts = (idf[term_of] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+        terms = [""] * len(vocabulary)
+        for term, i in vocabulary.items():
+            terms[i] = term
+        return cls(ids, terms, offsets, doc_of, impacts)
+
+    @classmethod
+    def from_collection(cls, collection: chromadb.Collection) -> "LexicalIndex":
+        """Build an index over every chunk stored in ``collection``."""
+        ids: List[str] = []
+        documents: List[str] = []
+        offset = 0
+        while True:
+            page = collection.get(include=["documents"], limit=BUILD_PAGE_SIZE, offset=offset)
+            if not page["ids"]:
+                break
+            offset += len(page["ids"])
+            ids.extend(page["ids"])
+            documents.extend(document or "" for document in page["documents"])
+        return cls.build(ids, documents)
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """Return up to ``top_k`` ``(id, score)`` pairs matching ``query``, best first."""
+        if top_k <= 0 or not self.ids:
+            return []
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            t = self.vocabulary.get(term)
+            if t is None:
+                continue
+            start, end = self.offsets[t], self.offsets[t + 1]
+            # A term posts each document once, so plain fancy-index adds are safe
+            scores[self.postings[start:end]] += self.impacts[start:end]
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(self.ids[i], float(scores[i])) for i in matched]
+
+    def save(self, path: str) -> None:
+        """Write the index atomically, replacing any previous file."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        terms = [""] * len(self.vocabulary)
+        for term, i in self.vocabulary.items():
+            terms[i] = term
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                ids=np.asarray(self.ids, dtype=str),
+                terms=np.asarray(terms, dtype=str),
+                offsets=self.offsets,
+                postings=self.postings,
+                impacts=self.impacts,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["ids"].tolist(),
+                data["terms"].tolist(),
+                data["offsets"],
+                data["postings"],
+                data["impacts"],
+            )
+
+    @classmethod
+    def open(
+        cls, collection_name: str, db_path: Optional[str] = None
+    ) -> Optional["LexicalIndex"]:
+        """Load the saved index of ``collection_name``, or ``None`` if there is none."""
+        path = index_path(collection_name, db_path)
+        if not os.path.exists(path):
+            return None
+        with logfire.span("load_lexical_index", collection=collection_name):
+            return cls.load(path)
@@ -0,0 +1,111 @@
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional
+
+# Marks the end of a stage's input
+_DONE = object()
+
+# How often blocked workers check whether the pipeline was aborted
+_POLL_SECONDS = 0.1
+
+
+@dataclass
+class Stage:
+    """One step of a pipeline run by ``workers`` threads.
+
+    ``func`` receives an item from the previous stage and returns the item
+    to pass on, or ``None`` to drop it. With ``fan_out`` it returns an
+    iterable instead and every item it yields is passed on as soon as it is
+    produced, e.g. one item per batch of a large document.
+    """
+
+    name: str
+    func: Callable[[Any], Optional[Any]]
+    workers: int = 1
+    fan_out: bool = False
+
+
+def run_pipeline(items: Iterable[Any], stages: List[Stage], queue_size: int = 8) -> None:
+    """Push ``items`` through ``stages`` with every stage running concurrently.
+
+    Stages are connected by bounded queues, so a slow stage applies
+    backpressure instead of letting work pile up in memory. The first
+    exception raised by any stage (or by iterating ``items``) stops the
+    pipeline and is re-raised once every thread has exited.
+    """
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    inboxes = [queue.Queue(maxsize=queue_size) for _ in stages]
+    remaining = [stage.workers for stage in stages]
+    lock = threading.Lock()
+
+    def fail(error: BaseException) -> None:
+        with lock:
+            errors.append(error)
+        stop.set()
+
+    def put(inbox: queue.Queue, item: Any) -> None:
+        while not stop.is_set():
+            try:
+                inbox.put(item, timeout=_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def get(inbox: queue.Queue) -> Any:
+        while not stop.is_set():
+            try:
+                return inbox.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def feed() -> None:
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                put(inboxes[0], item)
+        except BaseException as e:
+            fail(e)
+        finally:
+            for _ in range(stages[0].workers):
+                put(inboxes[0], _DONE)
+
+    def work(index: int) -> None:
+        stage = stages[index]
+        outbox = inboxes[index + 1] if index + 1 < len(stages) else None
+        try:
+            while (item := get(inboxes[index])) is not _DONE:
+                result = stage.func(item)
+                if result is None:
+                    continue
+                for output in result if stage.fan_out else (result,):
+                    if outbox is not None:
+                        put(outbox, output)
+        except BaseException as e:
+            fail(e)
+        finally:
+            # The stage's last worker to finish closes the next stage's input
+            with lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last and outbox is not None:
+                for _ in range(stages[index + 1].workers):
+                    put(outbox, _DONE)
+
+    threads = [threading.Thread(target=feed, name="pipeline-feed", daemon=True)]
+    for index, stage in enumerate(stages):
+        threads.extend(
+            threading.Thread(
+                target=work, args=(index,), name=f"pipeline-{stage.name}-{n}", daemon=True
+            )
+            for n in range(stage.workers)
+        )
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
@@ -1,121 +1,1088 @@
-import voyageai
+import asyncio
+import functools
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
 import chromadb
 import logfire
+import voyageai
 from google import genai
-from typing import List, Tuple
+from google.genai import types
 
-from ..models.schemas import QueryResult
 from ..core.config import settings
+from ..core.metrics import (
+    API_CALLS,
+    CACHE_LOOKUPS,
+    ERRORS,
+    STAGE_SECONDS,
+    TOKENS,
+    metrics,
+)
+from ..models.schemas import QueryResult
+from .cache import EmbeddingCache, SemanticAnswerCache
+from .collections import CollectionRegistry, collection_fingerprint
+from .context import SYSTEM_PROMPT, AssembledContext, ContextAssembler, build_prompt
+from .embeddings import (
+    VOYAGE_MAX_BATCH_TEXTS,
+    Embedder,
+    create_embedder,
+    estimate_tokens,
+)
+from .lexical import LexicalIndex, reciprocal_rank_fusion
+from .rate_limit import AsyncRateLimiter
+from .reranking import BaseReranker, VoyageReranker, create_reranker
+
+
+async def run_in_executor(
+    executor: Optional[ThreadPoolExecutor], func: Callable[..., Any], *args, **kwargs
+) -> Any:
+    """Run a blocking call on ``executor`` without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+@contextmanager
+def timed(timings: Optional[Dict[str, float]], stage: str) -> Iterator[None]:
+    """Record the seconds spent in ``stage`` into ``timings``, if given."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] = time.perf_counter() - start
+
+
+class Hits(NamedTuple):
+    """Search results for one query, nearest first.
+
+    With hybrid retrieval ``distances`` are fused distances,
+    ``1 - rrf_score / best_possible_score``, instead of vector distances,
+    and ``fused`` is set.
+    """
+
+    documents: List[str]
+    ids: List[str]
+    distances: List[float]
+    fused: bool = False
+
+
+class Candidates(NamedTuple):
+    """Retrieval output for one question, ready for reranking."""
+
+    query_embedding: List[float]
+    documents: List[str]
+    ids: List[str]
+    distances: Optional[List[float]] = None
+    # ``distances`` are fused rank scores, not vector distances
+    fused: bool = False
 
 
 class Retriever:
-    def __init__(self, voyage_client: voyageai.Client, collection: chromadb.Collection):
-        self.voyage_client = voyage_client
+    def __init__(
+        self,
+        embedder: Embedder,
+        collection: chromadb.Collection,
+        executor: Optional[ThreadPoolExecutor] = None,
+        lexical_index: Optional[LexicalIndex] = None,
+    ):
+        # Owns batching, the query-embedding cache and any rate limiting
+        self.embedder = embedder
         self.collection = collection
+        # Chroma has no async API; its calls run on this bounded pool
+        self.executor = executor
+        # BM25 index of ``collection``; when set, searches given the query
+        # text fuse lexical and dense results
+        self.lexical_index = lexical_index
 
-    def retrieve(self, query: str, top_k: int = 10) -> Tuple[List[str], List[str]]:
-        with logfire.span("retrieval", query=query, top_k=top_k):
-            query_embedding = self.voyage_client.embed(
-                texts=[query],
-                model="voyage-3",
-                input_type="query",
-            ).embeddings[0]
+    @property
+    def embedding_model(self) -> str:
+        return self.embedder.model
+
+    def embed_query(self, query: str) -> List[float]:
+        with metrics.track("embed"):
+            return self.embedder.embed_query(query)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        with metrics.track("embed"):
+            return await self.embedder.aembed_query(query)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed many queries, packing cache misses into as few requests as possible."""
+        with metrics.track("embed"):
+            return self.embedder.embed(queries, input_type="query")
 
-            results = self.collection.query(
-                query_embeddings=[query_embedding], n_results=top_k
+    async def aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        with metrics.track("embed"):
+            return await self.embedder.aembed(queries, input_type="query")
+
+    def _query(self, query_embeddings: List[List[float]], top_k: int) -> List[Hits]:
+        response = self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=top_k,
+            include=["documents", "distances"],
+        )
+        return [
+            Hits(*hits)
+            for hits in zip(
+                response["documents"],
+                response["ids"],
+                response["distances"],
+                strict=True,
+            )
+        ]
+
+    def _fuse(self, queries: List[str], dense: List[Hits], top_k: int) -> List[Hits]:
+        """Fuse dense hits with BM25 hits by reciprocal rank fusion."""
+        pool = max(top_k, settings.HYBRID_CANDIDATES)
+        documents = {}
+        for hits in dense:
+            documents.update(zip(hits.ids, hits.documents, strict=True))
+        fused = [
+            reciprocal_rank_fusion(
+                [hits.ids, [i for i, _ in self.lexical_index.search(query, pool)]]
+            )[:top_k]
+            for query, hits in zip(queries, dense, strict=True)
+        ]
+        # Lexical-only hits still need their text
+        missing = list({i for ranking in fused for i, _ in ranking if i not in documents})
+        if missing:
+            found = self.collection.get(ids=missing, include=["documents"])
+            documents.update(zip(found["ids"], found["documents"], strict=True))
+        best = 2.0 / (settings.RRF_K + 1)
+        results = []
+        for ranking in fused:
+            ranking = [(i, score) for i, score in ranking if i in documents]
+            results.append(
+                Hits(
+                    [documents[i] for i, _ in ranking],
+                    [i for i, _ in ranking],
+                    [1.0 - score / best for _, score in ranking],
+                    fused=True,
+                )
             )
-            
-            return results["documents"][0], results["ids"][0]
+        return results
 
+    def search_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 10,
+        queries: Optional[List[str]] = None,
+    ) -> List[Hits]:
+        """Run one multi-vector Chroma query per group of embeddings.
 
-class Reranker:
-    def __init__(self, voyage_client: voyageai.Client):
-        self.voyage_client = voyage_client
+        Given the ``queries`` text and a lexical index, the dense results
+        are fused with BM25 results over the whole collection.
+        """
+        hybrid = self.lexical_index is not None and queries is not None
+        n_results = max(top_k, settings.HYBRID_CANDIDATES) if hybrid else top_k
+        results: List[Hits] = []
+        with metrics.track("retrieve"):
+            for start in range(0, len(query_embeddings), VOYAGE_MAX_BATCH_TEXTS):
+                group = query_embeddings[start : start + VOYAGE_MAX_BATCH_TEXTS]
+                results.extend(self._query(group, n_results))
+            if hybrid:
+                with logfire.span("hybrid_fusion", num_queries=len(queries)):
+                    results = self._fuse(queries, results, top_k)
+        return results
 
-    def rerank(self, query: str, documents: List[str], ids: List[str], top_k: int = 3) -> Tuple[List[str], List[str]]:
-        with logfire.span("reranking", num_docs=len(documents), top_k=top_k):
-            results = self.voyage_client.rerank(
-                query=query,
-                documents=documents,
-                model="rerank-2-lite",
-                top_k=top_k,
+    def retrieve_many(
+        self, queries: List[str], top_k: int = 10
+    ) -> List[Hits]:
+        """Retrieve candidates for many queries with batched embed and search calls."""
+        with logfire.span("retrieval_many", num_queries=len(queries), top_k=top_k):
+            return self.search_many(self.embed_queries(queries), top_k, queries)
+
+    async def aretrieve_many(
+        self, queries: List[str], top_k: int = 10
+    ) -> List[Hits]:
+        with logfire.span("retrieval_many", num_queries=len(queries), top_k=top_k):
+            query_embeddings = await self.aembed_queries(queries)
+            return await run_in_executor(
+                self.executor, self.search_many, query_embeddings, top_k, queries
             )
-            
-            reranked_docs = [results.results[i].document for i in range(len(results.results))]
-            reranked_ids = [ids[results.results[i].index] for i in range(len(results.results))]
-            
-            return reranked_docs, reranked_ids
+
+    def search(
+        self, query_embedding: List[float], top_k: int = 10, query: Optional[str] = None
+    ) -> Hits:
+        return self.search_many(
+            [query_embedding], top_k, None if query is None else [query]
+        )[0]
+
+    async def asearch(
+        self, query_embedding: List[float], top_k: int = 10, query: Optional[str] = None
+    ) -> Hits:
+        return await run_in_executor(
+            self.executor, self.search, query_embedding, top_k, query
+        )
+
+    def retrieve(
+        self, query: str, top_k: int = 10, query_embedding: Optional[List[float]] = None
+    ) -> Hits:
+        with logfire.span("retrieval", query=query, top_k=top_k):
+            if query_embedding is None:
+                query_embedding = self.embed_query(query)
+            return self.search(query_embedding, top_k, query)
+
+    async def aretrieve(
+        self, query: str, top_k: int = 10, query_embedding: Optional[List[float]] = None
+    ) -> Hits:
+        with logfire.span("retrieval", query=query, top_k=top_k):
+            if query_embedding is None:
+                query_embedding = await self.aembed_query(query)
+            return await self.asearch(query_embedding, top_k, query)
+
+
+# The Voyage reranker used to be the only one
+Reranker = VoyageReranker
+
+
+class Generation(NamedTuple):
+    """Generated answer text and the tokens it used."""
+
+    text: str
+    # Provider-reported counts when available, otherwise an estimate
+    prompt_tokens: Optional[int] = None
+    # Prompt tokens served from the provider's prefix cache
+    cached_prompt_tokens: Optional[int] = None
+    # Response tokens, when the provider reports them
+    output_tokens: Optional[int] = None
 
 
 class Generator:
-    def __init__(self):
-        """Initialize Google GenAI client based on configuration."""
+    def __init__(
+        self,
+        client: Optional[genai.Client] = None,
+        rate_limiter: Optional[AsyncRateLimiter] = None,
+    ):
+        """Initialize Google GenAI client based on configuration.
+
+        Args:
+            client: Shared GenAI client; a new one is created when omitted
+            rate_limiter: Throttles Gemini calls made on the async path
+
+        Every call uses LLM_MODEL unless it passes its own ``model``.
+        """
         self.model_name = settings.LLM_MODEL
-        self.client = genai.Client(api_key=settings.GEMINI_API_KEY)
+        self.client = client or genai.Client(api_key=settings.GEMINI_API_KEY)
+        self.rate_limiter = rate_limiter
+        # The instructions go in a fixed system instruction ahead of every
+        # prompt, so they form a cacheable prefix
+        self.config = types.GenerateContentConfig(system_instruction=SYSTEM_PROMPT)
 
-    def generate(self, query: str, context: str) -> str:
-        with logfire.span("generation", model=self.model_name, provider="google-genai"):
-            prompt = f"""You are a helpful AI assistant that provides accurate and concise answers about Medicare based on the provided context.
-If the information isn't in the context, say you don't have that information.
-Keep your answers concise and to the point.
+    @staticmethod
+    def _build_prompt(query: str, context: str) -> str:
+        return build_prompt(query, context)
 
-Context:
-{context}
+    @staticmethod
+    def _response_text(response: Any) -> str:
+        if response and response.text:
+            return response.text
+        return "Error: No text returned from model (check safety filters or model availability)."
 
-Question: {query}"""
+    @staticmethod
+    def _generation(text: str, prompt: str, response: Any = None) -> Generation:
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        if prompt_tokens is None:
+            prompt_tokens = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(prompt)
+        return Generation(
+            text,
+            prompt_tokens,
+            getattr(usage, "cached_content_token_count", None),
+            getattr(usage, "candidates_token_count", None),
+        )
 
+    @staticmethod
+    def _record(generation: Generation) -> Generation:
+        metrics.inc(API_CALLS, provider="gemini", operation="generate")
+        metrics.inc(TOKENS, generation.prompt_tokens or 0, kind="prompt")
+        if generation.cached_prompt_tokens:
+            metrics.inc(TOKENS, generation.cached_prompt_tokens, kind="cached_prompt")
+        return generation
+
+    def complete(
+        self, query: str, context: str, model: Optional[str] = None
+    ) -> Generation:
+        model = model or self.model_name
+        with (
+            logfire.span("generation", model=model, provider="google-genai"),
+            metrics.track("generate"),
+        ):
+            prompt = self._build_prompt(query, context)
             try:
                 response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=prompt
+                    model=model,
+                    contents=prompt,
+                    config=self.config,
+                )
+                return self._record(
+                    self._generation(self._response_text(response), prompt, response)
                 )
-                if response and response.text:
-                    return response.text
-                return "Error: No text returned from model (check safety filters or model availability)."
             except Exception as e:
                 logfire.error("Error generating content with Gemini", error=str(e))
-                return f"Error: {str(e)}"
+                metrics.inc(ERRORS, stage="generate")
+                return self._generation(f"Error: {str(e)}", prompt)
+
+    async def acomplete(
+        self, query: str, context: str, model: Optional[str] = None
+    ) -> Generation:
+        model = model or self.model_name
+        with (
+            logfire.span("generation", model=model, provider="google-genai"),
+            metrics.track("generate"),
+        ):
+            prompt = self._build_prompt(query, context)
+            try:
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire()
+                response = await self.client.aio.models.generate_content(
+                    model=model,
+                    contents=prompt,
+                    config=self.config,
+                )
+                return self._record(
+                    self._generation(self._response_text(response), prompt, response)
+                )
+            except Exception as e:
+                logfire.error("Error generating content with Gemini", error=str(e))
+                metrics.inc(ERRORS, stage="generate")
+                return self._generation(f"Error: {str(e)}", prompt)
+
+    def generate(self, query: str, context: str, model: Optional[str] = None) -> str:
+        return self.complete(query, context, model).text
+
+    async def agenerate(
+        self, query: str, context: str, model: Optional[str] = None
+    ) -> str:
+        return (await self.acomplete(query, context, model)).text
+
+    async def astream(
+        self,
+        query: str,
+        context: str,
+        usage: Optional[Dict[str, Any]] = None,
+        model: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """Yield the answer's text as Gemini streams it.
+
+        Unlike ``agenerate`` errors are raised, since part of the answer may
+        already have been sent.
+
+        Args:
+            usage: Filled with ``prompt_tokens`` and ``cached_prompt_tokens``
+                once the stream ends
+            model: Gemini model for this call instead of LLM_MODEL
+        """
+        model = model or self.model_name
+        prompt = self._build_prompt(query, context)
+        started = time.perf_counter()
+        first_token_seconds = None
+        last = None
+        try:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            stream = await self.client.aio.models.generate_content_stream(
+                model=model, contents=prompt, config=self.config
+            )
+            async for chunk in stream:
+                last = chunk
+                if chunk.text:
+                    if first_token_seconds is None:
+                        first_token_seconds = time.perf_counter() - started
+                        metrics.observe(STAGE_SECONDS, first_token_seconds, stage="first_token")
+                    yield chunk.text
+        except Exception as e:
+            logfire.error("Error streaming content from Gemini", error=str(e))
+            metrics.inc(ERRORS, stage="generate")
+            raise
+        # Usage totals arrive with the final chunk
+        generation = self._record(self._generation("", prompt, last))
+        metrics.observe(STAGE_SECONDS, time.perf_counter() - started, stage="generate")
+        if usage is not None:
+            usage["prompt_tokens"] = generation.prompt_tokens
+            usage["cached_prompt_tokens"] = generation.cached_prompt_tokens
+        # Spans can't stay open across yields to the client; log timings instead
+        logfire.info(
+            "generation_stream",
+            model=model,
+            provider="google-genai",
+            first_token_seconds=first_token_seconds,
+            seconds=time.perf_counter() - started,
+            prompt_tokens=generation.prompt_tokens,
+        )
+
+
+class StreamEvent(NamedTuple):
+    """One server-sent event of a streamed answer.
+
+    ``sources`` (the reranked chunks) comes first, then one ``token`` per
+    streamed text fragment, an ``error`` if generation fails part-way, and
+    finally ``result`` with the complete ``QueryResult``.
+    """
+
+    event: str
+    data: Any
 
 
 class QueryService:
     """Service for querying the vector database and generating answers."""
 
-    def __init__(self):
-        """Initialize the query service."""
-        # Initialize clients -- keys automatically loaded from env by clients
-        self.voyage_client = voyageai.Client(api_key=settings.VOYAGE_API_KEY)
+    def __init__(
+        self,
+        voyage_client: Optional[voyageai.Client] = None,
+        chroma_client: Optional[chromadb.ClientAPI] = None,
+        genai_client: Optional[genai.Client] = None,
+        async_voyage_client: Optional[voyageai.AsyncClient] = None,
+        executor: Optional[ThreadPoolExecutor] = None,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        voyage_rate_limiter: Optional[AsyncRateLimiter] = None,
+        gemini_rate_limiter: Optional[AsyncRateLimiter] = None,
+        collection_registry: Optional[CollectionRegistry] = None,
+        embedder: Optional[Embedder] = None,
+        reranker: Optional[BaseReranker] = None,
+    ):
+        """Initialize the query service.
 
-        self.chroma_collection = chromadb.PersistentClient(
+        Clients passed in are shared with the caller (see ``ServiceContainer``);
+        any that are omitted are created here so scripts can still build a
+        standalone service.
+
+        Args:
+            voyage_client: Shared VoyageAI client for embedding and reranking
+            chroma_client: Shared Chroma client holding the vector collection
+            genai_client: Shared Google GenAI client for generation
+            async_voyage_client: Shared async VoyageAI client for the async path
+            executor: Bounded pool for blocking Chroma calls on the async path
+            embedding_cache: Shared query-embedding cache; built from settings
+                when omitted
+            answer_cache: Semantic answer cache for near-duplicate questions;
+                built from settings when omitted
+            voyage_rate_limiter: Shared limiter for async Voyage embed/rerank calls
+            gemini_rate_limiter: Shared limiter for async Gemini calls
+            collection_registry: Alias pointers that select the live collection
+                version
+            embedder: Shared query embedder; built for EMBEDDING_BACKEND (with
+                ``embedding_cache`` and ``voyage_rate_limiter``) when omitted
+            reranker: Shared reranker; built for RERANKER_BACKEND when omitted
+        """
+        self.voyage_client = voyage_client or voyageai.Client(
+            api_key=settings.VOYAGE_API_KEY
+        )
+        self.async_voyage_client = async_voyage_client or voyageai.AsyncClient(
+            api_key=settings.VOYAGE_API_KEY
+        )
+        self.chroma_client = chroma_client or chromadb.PersistentClient(
             path=settings.VECTOR_DB_PATH
-        ).get_collection(name=settings.CHROMA_COLLECTION_NAME)
+        )
+        if embedder is None:
+            embedder = create_embedder(
+                voyage_client=self.voyage_client,
+                async_voyage_client=self.async_voyage_client,
+                cache=embedding_cache or EmbeddingCache.from_settings(),
+                rate_limiter=voyage_rate_limiter,
+            )
+        self.embedder = embedder
+        self.embedding_cache = embedder.cache
+        self.collection_registry = collection_registry or CollectionRegistry()
+        pointer = self.collection_registry.resolve(settings.CHROMA_COLLECTION_NAME)
+        # Serializes reloads so concurrent requests switch versions only once
+        self._reload_lock = threading.RLock()
+        self.chroma_collection = self._open_collection(pointer.name)
+        # Version the alias pointed at when the collection was opened; cached
+        # answers never outlive it
+        self.collection_version = pointer.version
+        self._collection_fingerprint = pointer.fingerprint
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=settings.CHROMA_MAX_WORKERS, thread_name_prefix="chroma"
+        )
+
+        self.answer_cache = answer_cache or SemanticAnswerCache.from_settings()
+
+        self.retriever = Retriever(
+            self.embedder,
+            self.chroma_collection,
+            executor=self.executor,
+            lexical_index=self._open_lexical_index(pointer.name),
+        )
+        self.reranker = reranker or create_reranker(
+            voyage_client=self.voyage_client,
+            async_voyage_client=self.async_voyage_client,
+            rate_limiter=voyage_rate_limiter,
+        )
+        self.generator = Generator(genai_client, rate_limiter=gemini_rate_limiter)
+        self.context_assembler = ContextAssembler()
+
+    def reload_collection(self) -> None:
+        """Re-open the collection the alias points to after a re-ingest.
+
+        Blocks on Chroma and on loading the BM25 index; async callers use
+        ``arefresh_collection``.
+        """
+        with self._reload_lock:
+            pointer = self.collection_registry.resolve(settings.CHROMA_COLLECTION_NAME)
+            with logfire.span("reload_collection", collection=pointer.name):
+                # Open both before switching so requests never mix versions
+                collection = self._open_collection(pointer.name)
+                lexical_index = self._open_lexical_index(pointer.name)
+                self.chroma_collection = collection
+                self.retriever.collection = collection
+                self.retriever.lexical_index = lexical_index
+                self.collection_version = pointer.version
+                self._collection_fingerprint = pointer.fingerprint
+                if self.answer_cache is not None:
+                    self.answer_cache.invalidate()
+
+    def _open_collection(self, name: str) -> chromadb.Collection:
+        """Open ``name``, refusing collections built with another embedding model."""
+        collection = self.chroma_client.get_collection(name=name)
+        built_with = (collection.metadata or {}).get("embedding_model")
+        if built_with and built_with != self.embedder.model:
+            raise ValueError(
+                f"Collection {name} was embedded with {built_with} but the "
+                f"configured embedder is {self.embedder.model}; re-ingest or "
+                "change EMBEDDING_BACKEND"
+            )
+        return collection
+
+    def _open_lexical_index(self, name: str) -> Optional[LexicalIndex]:
+        """Load the BM25 index built alongside ``name``, if hybrid retrieval is on."""
+        if not settings.HYBRID_RETRIEVAL:
+            return None
+        index = LexicalIndex.open(name, self.collection_registry.db_path)
+        if index is None:
+            logfire.warn(
+                "No lexical index for collection; using dense retrieval only",
+                collection=name,
+            )
+        return index
+
+    def refresh_collection(self) -> None:
+        """Switch to a newly promoted collection version, if there is one.
+
+        Cheap enough to call per request: the registry only re-reads its
+        pointer file when the file's mtime changes.
+        """
+        if self._collection_stale():
+            with self._reload_lock:
+                # Another caller may have reloaded while we waited
+                if self._collection_stale():
+                    self.reload_collection()
+
+    def collection_fingerprint(self) -> str:
+        """Content fingerprint of the open collection version.
+
+        Recorded when ingestion promotes a version; for versions promoted
+        without one it is computed once from the collection's ids, which
+        blocks on Chroma.
+        """
+        with self._reload_lock:
+            if self._collection_fingerprint is None:
+                self._collection_fingerprint = collection_fingerprint(
+                    self.chroma_collection
+                )
+            return self._collection_fingerprint
+
+    async def arefresh_collection(self) -> None:
+        """``refresh_collection`` that reloads on a worker thread.
+
+        Concurrent requests that notice the new version wait on the same
+        reload instead of each opening the collection again.
+        """
+        if self._collection_stale():
+            await asyncio.to_thread(self.refresh_collection)
+
+    def _collection_stale(self) -> bool:
+        pointer = self.collection_registry.resolve(settings.CHROMA_COLLECTION_NAME)
+        return pointer.version != self.collection_version
+
+    def prompt_hash(self) -> str:
+        """Digest of the prompt setup: instructions, template, context budget and ranking.
+
+        With the question, collection version and model it determines the
+        prompt an answer is generated from, so evaluation caches key on it.
+        """
+        parts = [
+            SYSTEM_PROMPT,
+            build_prompt("{query}", "{context}"),
+            self.context_assembler.max_tokens,
+            self.context_assembler.duplicate_overlap,
+            self.reranker.name,
+            getattr(self.reranker, "model", None),
+            self.retriever.lexical_index is not None,
+        ]
+        return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _result(
+        query_id: str, query: str, generation: Generation, context: AssembledContext
+    ) -> QueryResult:
+        return QueryResult(
+            query_id=query_id,
+            query_text=query,
+            answer=generation.text,
+            source_chunks=context.ids,
+            source_text=context.sources,
+            context_text=context.documents,
+            prompt_tokens=generation.prompt_tokens,
+            cached_prompt_tokens=generation.cached_prompt_tokens,
+        )
+
+    def _cached_answer(
+        self,
+        query_embedding: List[float],
+        query: str,
+        query_id: str,
+        top_k: int,
+        rerank_top_k: int,
+    ) -> Optional[QueryResult]:
+        """Return a cached answer to a near-duplicate question, if any."""
+        if self.answer_cache is None:
+            return None
+        cached = self.answer_cache.lookup(
+            query_embedding, self.collection_version, top_k, rerank_top_k, query=query
+        )
+        metrics.inc(CACHE_LOOKUPS, cache="answer", result="miss" if cached is None else "hit")
+        if cached is None:
+            return None
+        logfire.info("semantic_cache_hit", query=query, cached_query=cached.query_text)
+        # No prompt is sent for a cached answer
+        return cached.model_copy(
+            update={
+                "query_id": query_id,
+                "query_text": query,
+                "prompt_tokens": 0,
+                "cached_prompt_tokens": None,
+                "cached_from": cached.query_text,
+            }
+        )
 
-        self.retriever = Retriever(self.voyage_client, self.chroma_collection)
-        self.reranker = Reranker(self.voyage_client)
-        self.generator = Generator()
+    def _cache_answer(
+        self,
+        query_embedding: List[float],
+        result: QueryResult,
+        top_k: int,
+        rerank_top_k: int,
+    ) -> None:
+        # Generator failures come back as "Error: ..." strings; never cache those
+        if self.answer_cache is None or result.answer.startswith("Error"):
+            return
+        self.answer_cache.store(
+            query_embedding, result, self.collection_version, top_k, rerank_top_k
+        )
 
+    def retrieve_candidates(
+        self, queries: List[str], top_k: int = 10
+    ) -> List[Candidates]:
+        """Batch-retrieve candidates for many questions (see ``Retriever.retrieve_many``)."""
+        self.refresh_collection()
+        with logfire.span("retrieval_many", num_queries=len(queries), top_k=top_k):
+            query_embeddings = self.retriever.embed_queries(queries)
+            hits = self.retriever.search_many(query_embeddings, top_k, queries)
+            return [
+                Candidates(embedding, *found)
+                for embedding, found in zip(query_embeddings, hits, strict=True)
+            ]
 
+    async def aretrieve_candidates(
+        self, queries: List[str], top_k: int = 10
+    ) -> List[Candidates]:
+        await self.arefresh_collection()
+        with logfire.span("retrieval_many", num_queries=len(queries), top_k=top_k):
+            query_embeddings = await self.retriever.aembed_queries(queries)
+            hits = await run_in_executor(
+                self.executor,
+                self.retriever.search_many,
+                query_embeddings,
+                top_k,
+                queries,
+            )
+            return [
+                Candidates(embedding, *found)
+                for embedding, found in zip(query_embeddings, hits, strict=True)
+            ]
+
+    def answer_many(
+        self,
+        queries: List[str],
+        query_ids: Optional[List[str]] = None,
+        top_k: int = 10,
+        rerank_top_k: int = 3,
+    ) -> List[QueryResult]:
+        """Answer many questions, sharing embed and vector-search round trips."""
+        query_ids = query_ids or [f"Q{i + 1}" for i in range(len(queries))]
+        with logfire.span("answer_many", num_queries=len(queries)):
+            all_candidates = self.retrieve_candidates(queries, top_k=top_k)
+            return [
+                self.answer_question(
+                    query, query_id, top_k, rerank_top_k, candidates=candidates
+                )
+                for query, query_id, candidates in zip(
+                    queries, query_ids, all_candidates, strict=True
+                )
+            ]
 
     def answer_question(
-        self, query: str, query_id: str = "Q1", top_k: int = 10, rerank_top_k: int = 3
+        self,
+        query: str,
+        query_id: str = "Q1",
+        top_k: int = 10,
+        rerank_top_k: int = 3,
+        candidates: Optional[Candidates] = None,
+        model: Optional[str] = None,
     ) -> QueryResult:
-        """Answer a question using the RAG pipeline with modular components and tracing."""
-        with logfire.span("answer_question", query=query, query_id=query_id):
+        """Answer a question using the RAG pipeline with modular components and tracing.
+
+        ``candidates`` from ``retrieve_candidates`` skip the embed and search steps.
+        A ``model`` other than LLM_MODEL generates the answer instead; such
+        answers bypass the semantic answer cache.
+        """
+        self.refresh_collection()
+        with (
+            logfire.span("answer_question", query=query, query_id=query_id),
+            metrics.track("answer"),
+        ):
+            # 0. Short-circuit near-duplicate questions
+            if candidates is None:
+                query_embedding = self.retriever.embed_query(query)
+            else:
+                query_embedding = candidates.query_embedding
+            # The answer cache holds LLM_MODEL answers only
+            use_cache = model in (None, self.generator.model_name)
+            if use_cache:
+                cached = self._cached_answer(
+                    query_embedding, query, query_id, top_k, rerank_top_k
+                )
+                if cached is not None:
+                    return cached
+
             # 1. Retrieve
-            candidate_docs, candidate_ids = self.retriever.retrieve(query, top_k=top_k)
+            if candidates is None:
+                candidates = Candidates(
+                    query_embedding,
+                    *self.retriever.retrieve(
+                        query, top_k=top_k, query_embedding=query_embedding
+                    ),
+                )
 
             # 2. Rerank
             reranked_docs, reranked_ids = self.reranker.rerank(
-                query, candidate_docs, candidate_ids, top_k=rerank_top_k
+                query,
+                candidates.documents,
+                candidates.ids,
+                top_k=rerank_top_k,
+                query_embedding=query_embedding,
+                distances=candidates.distances,
+                fused=candidates.fused,
             )
 
             # 3. Generate
-            context_text = "\n\n".join(reranked_docs)
-            answer = self.generator.generate(query, context_text)
+            context = self.context_assembler.assemble(query, reranked_docs, reranked_ids)
+            generation = self.generator.complete(query, context.text, model)
 
-            return QueryResult(
-                query_id=query_id,
-                query_text=query,
-                answer=answer,
-                source_chunks=reranked_ids,
-                source_text=reranked_docs,
+            result = self._result(query_id, query, generation, context)
+            if use_cache:
+                self._cache_answer(query_embedding, result, top_k, rerank_top_k)
+            return result
+
+    async def _arerank_candidates(
+        self,
+        query: str,
+        query_embedding: List[float],
+        top_k: int,
+        rerank_top_k: int,
+        candidates: Optional[Candidates] = None,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> Tuple[List[str], List[str]]:
+        """Retrieve (unless ``candidates`` are given) and rerank for ``query``."""
+        # 1. Retrieve
+        if candidates is None:
+            candidates = await self._aretrieve(query, query_embedding, top_k, timings)
+
+        # 2. Rerank
+        with timed(timings, "rerank"):
+            return await self.reranker.arerank(
+                query,
+                candidates.documents,
+                candidates.ids,
+                top_k=rerank_top_k,
+                query_embedding=query_embedding,
+                distances=candidates.distances,
+                fused=candidates.fused,
+            )
+
+    async def _aretrieve(
+        self,
+        query: str,
+        query_embedding: List[float],
+        top_k: int,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> Candidates:
+        with timed(timings, "retrieve"):
+            return Candidates(
+                query_embedding,
+                *await self.retriever.aretrieve(
+                    query, top_k=top_k, query_embedding=query_embedding
+                ),
             )
+
+    async def aretrieve_context(
+        self,
+        query: str,
+        top_k: int = 10,
+        rerank_top_k: int = 3,
+        timings: Optional[Dict[str, float]] = None,
+        candidates: Optional[Candidates] = None,
+    ) -> AssembledContext:
+        """Embed, retrieve, rerank and assemble the context for ``query``.
+
+        The first half of ``aanswer_question`` without the answer cache, for
+        callers that generate from one context several times (e.g. with
+        different models). ``candidates`` from ``aretrieve_candidates`` skip
+        the embed and search steps.
+        """
+        await self.arefresh_collection()
+        with logfire.span("retrieve_context", query=query):
+            if candidates is None:
+                with timed(timings, "embed"):
+                    query_embedding = await self.retriever.aembed_query(query)
+            else:
+                query_embedding = candidates.query_embedding
+            reranked_docs, reranked_ids = await self._arerank_candidates(
+                query,
+                query_embedding,
+                top_k,
+                rerank_top_k,
+                candidates=candidates,
+                timings=timings,
+            )
+            return self.context_assembler.assemble(query, reranked_docs, reranked_ids)
+
+    async def aanswer_question(
+        self,
+        query: str,
+        query_id: str = "Q1",
+        top_k: int = 10,
+        rerank_top_k: int = 3,
+        candidates: Optional[Candidates] = None,
+        timings: Optional[Dict[str, float]] = None,
+        model: Optional[str] = None,
+    ) -> QueryResult:
+        """Async variant of ``answer_question`` that never blocks the event loop.
+
+        Network calls go through the async Voyage and GenAI clients and Chroma
+        queries run on the service's bounded executor, so a single worker can
+        keep many questions in flight.
+
+        Args:
+            timings: Filled with the seconds spent per stage (embed, retrieve,
+                rerank, generate)
+            model: Gemini model instead of LLM_MODEL; its answers bypass the
+                semantic answer cache
+        """
+        await self.arefresh_collection()
+        with (
+            logfire.span("answer_question", query=query, query_id=query_id),
+            metrics.track("answer"),
+        ):
+            # 0. Short-circuit near-duplicate questions
+            if candidates is None:
+                with timed(timings, "embed"):
+                    query_embedding = await self.retriever.aembed_query(query)
+            else:
+                query_embedding = candidates.query_embedding
+            # The answer cache holds LLM_MODEL answers only
+            use_cache = model in (None, self.generator.model_name)
+            if use_cache:
+                cached = self._cached_answer(
+                    query_embedding, query, query_id, top_k, rerank_top_k
+                )
+                if cached is not None:
+                    return cached
+
+            reranked_docs, reranked_ids = await self._arerank_candidates(
+                query, query_embedding, top_k, rerank_top_k, candidates, timings
+            )
+
+            # 3. Generate
+            context = self.context_assembler.assemble(query, reranked_docs, reranked_ids)
+            with timed(timings, "generate"):
+                generation = await self.generator.acomplete(query, context.text, model)
+
+            result = self._result(query_id, query, generation, context)
+            if use_cache:
+                self._cache_answer(query_embedding, result, top_k, rerank_top_k)
+            return result
+
+    async def aanswer_speculative(
+        self,
+        query: str,
+        query_id: str = "Q1",
+        top_k: int = 10,
+        rerank_top_k: int = 3,
+        query_embedding: Optional[Awaitable[List[float]]] = None,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> QueryResult:
+        """Pipelined ``aanswer_question`` that overlaps reranking and generation.
+
+        Generation starts on the top ``rerank_top_k`` vector hits while the
+        reranker runs. If the reranked set shares at least
+        SPECULATIVE_MIN_OVERLAP of its chunks with that speculative context
+        the speculative answer is kept; otherwise it is cancelled and
+        generation restarts on the reranked chunks. The sources returned are
+        always the chunks the answer was generated from.
+
+        A cancelled speculation still costs a Gemini request (and a token
+        from the Gemini rate limiter).
+
+        Args:
+            query_embedding: Embedding already in flight, e.g. started
+                before the request body was validated
+            timings: Filled with the seconds spent per stage (embed,
+                retrieve, rerank, generate - the wait for the answer after
+                reranking) and ``speculation_hit`` (1.0 or 0.0)
+        """
+        with (
+            logfire.span("answer_question_speculative", query=query, query_id=query_id),
+            metrics.track("answer"),
+        ):
+            # 0. Short-circuit near-duplicate questions. The embedding is
+            # awaited first so an in-flight one is never left behind when a
+            # later step raises; it does not depend on the collection version.
+            with timed(timings, "embed"):
+                if query_embedding is None:
+                    query_embedding = self.retriever.aembed_query(query)
+                query_embedding = await query_embedding
+            await self.arefresh_collection()
+            cached = self._cached_answer(
+                query_embedding, query, query_id, top_k, rerank_top_k
+            )
+            if cached is not None:
+                return cached
+
+            # 1. Retrieve, then speculate on the vector order
+            candidates = await self._aretrieve(query, query_embedding, top_k, timings)
+            speculative_ids = candidates.ids[:rerank_top_k]
+            speculative_context = self.context_assembler.assemble(
+                query, candidates.documents[:rerank_top_k], speculative_ids
+            )
+            speculation = asyncio.create_task(
+                self.generator.acomplete(query, speculative_context.text)
+            )
+
+            # 2. Rerank while the speculative answer is generated
+            try:
+                reranked_docs, reranked_ids = await self._arerank_candidates(
+                    query, query_embedding, top_k, rerank_top_k, candidates, timings
+                )
+            except BaseException:
+                speculation.cancel()
+                raise
+
+            # 3. Keep the speculative answer unless reranking changed the context
+            overlap = len(set(reranked_ids) & set(speculative_ids)) / max(
+                len(reranked_ids), 1
+            )
+            hit = overlap >= settings.SPECULATIVE_MIN_OVERLAP
+            with timed(timings, "generate"):
+                if hit:
+                    generation = await speculation
+                    context = speculative_context
+                else:
+                    speculation.cancel()
+                    logfire.info(
+                        "speculation_restarted", query_id=query_id, overlap=overlap
+                    )
+                    context = self.context_assembler.assemble(
+                        query, reranked_docs, reranked_ids
+                    )
+                    generation = await self.generator.acomplete(query, context.text)
+            if timings is not None:
+                timings["speculation_hit"] = 1.0 if hit else 0.0
+
+            result = self._result(query_id, query, generation, context)
+            self._cache_answer(query_embedding, result, top_k, rerank_top_k)
+            return result
+
+    async def astream_answer(
+        self,
+        query: str,
+        query_id: str = "Q1",
+        top_k: int = 10,
+        rerank_top_k: int = 3,
+    ) -> AsyncIterator[StreamEvent]:
+        """Answer a question as a stream of ``StreamEvent``s.
+
+        The sources are sent as soon as reranking completes, before
+        generation starts, and answer text is forwarded as Gemini produces
+        it. A cached answer is sent as a single token.
+        """
+        await self.arefresh_collection()
+        with logfire.span("answer_question_retrieval", query=query, query_id=query_id):
+            query_embedding = await self.retriever.aembed_query(query)
+            cached = self._cached_answer(
+                query_embedding, query, query_id, top_k, rerank_top_k
+            )
+            if cached is None:
+                reranked_docs, reranked_ids = await self._arerank_candidates(
+                    query, query_embedding, top_k, rerank_top_k
+                )
+                context = self.context_assembler.assemble(query, reranked_docs, reranked_ids)
+                sources = {
+                    "source_chunks": context.ids,
+                    "source_text": context.sources,
+                    "context_text": context.documents,
+                }
+            else:
+                sources = {
+                    "source_chunks": cached.source_chunks,
+                    "source_text": cached.source_text,
+                    "context_text": cached.context_text,
+                }
+
+        yield StreamEvent("sources", {"query_id": query_id, **sources})
+        if cached is not None:
+            yield StreamEvent("token", cached.answer)
+            yield StreamEvent("result", cached)
+            return
+
+        # 3. Generate
+        parts: List[str] = []
+        usage: Dict[str, Any] = {}
+        try:
+            async for text in self.generator.astream(query, context.text, usage):
+                parts.append(text)
+                yield StreamEvent("token", text)
+            answer = "".join(parts) or Generator._response_text(None)
+        except Exception as e:
+            answer = f"Error: {str(e)}"
+            yield StreamEvent("error", answer)
+
+        result = self._result(
+            query_id,
+            query,
+            Generation(
+                answer,
+                usage.get("prompt_tokens"),
+                usage.get("cached_prompt_tokens"),
+            ),
+            context,
+        )
+        self._cache_answer(query_embedding, result, top_k, rerank_top_k)
+        yield StreamEvent("result", result)
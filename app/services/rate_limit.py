@@ -0,0 +1,104 @@
+import asyncio
+import random
+import re
+import threading
+import time
+from typing import Awaitable, Callable, Optional, TypeVar, Union
+
+T = TypeVar("T")
+
+# Provider errors that mean "slow down" rather than "broken": HTTP 429,
+# Gemini's RESOURCE_EXHAUSTED and Voyage's RateLimitError
+QUOTA_ERROR = re.compile(r"\b429\b|resource.?exhausted|rate.?limit|quota", re.IGNORECASE)
+
+
+class AsyncRateLimiter:
+    """Token-bucket rate limiter for async callers.
+
+    Tokens refill continuously at ``requests_per_minute / 60`` per second up to
+    ``burst``. A caller that finds the bucket empty reserves its token anyway
+    (the balance goes negative) and sleeps for exactly the deficit, so waiters
+    are served in arrival order without a lock held across ``await``.
+    """
+
+    def __init__(self, requests_per_minute: float, burst: Optional[int] = None):
+        """
+        Args:
+            requests_per_minute: Sustained request rate
+            burst: Bucket capacity; defaults to one second's worth of requests
+        """
+        if requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be positive")
+        self.rate_per_second = requests_per_minute / 60.0
+        self.capacity = float(burst or max(1, int(self.rate_per_second)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.waited_seconds = 0.0
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float) -> Optional["AsyncRateLimiter"]:
+        """Build a limiter, or ``None`` when the configured rate is 0 (unlimited)."""
+        if requests_per_minute <= 0:
+            return None
+        return cls(requests_per_minute)
+
+    def _reserve(self, tokens: float) -> float:
+        """Take ``tokens`` from the bucket and return how long to wait for them."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate_per_second
+            )
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            delay = -self._tokens / self.rate_per_second
+            self.waits += 1
+            self.waited_seconds += delay
+            return delay
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait until ``tokens`` requests may be sent."""
+        delay = self._reserve(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+def is_quota_error(error: Union[BaseException, str]) -> bool:
+    """Whether ``error`` (an exception or an error message) is a quota/rate-limit error."""
+    if isinstance(error, str):
+        return bool(QUOTA_ERROR.search(error))
+    return bool(QUOTA_ERROR.search(f"{type(error).__name__} {error}"))
+
+
+async def retry_on_quota(
+    func: Callable[[], Awaitable[T]],
+    max_retries: int,
+    base_delay: float,
+    max_delay: float = 60.0,
+    on_retry: Optional[Callable[[BaseException, float], None]] = None,
+) -> T:
+    """Await ``func()``, retrying quota errors with capped exponential backoff.
+
+    Delays use full jitter (uniform in ``[0, base_delay * 2**attempt]``) so
+    callers that hit the quota together do not retry in lockstep. Any other
+    error, or a quota error after ``max_retries`` retries, is raised.
+
+    Args:
+        on_retry: Called with the error and the delay before each retry
+    """
+    attempt = 0
+    while True:
+        try:
+            return await func()
+        except Exception as e:
+            if attempt >= max_retries or not is_quota_error(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2**attempt))
+            if on_retry is not None:
+                on_retry(e, delay)
+            attempt += 1
+            await asyncio.sleep(delay)
@@ -0,0 +1,347 @@
+import asyncio
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Any, List, Optional, Sequence, Tuple
+
+import logfire
+import numpy as np
+import voyageai
+
+from ..core.config import settings
+from ..core.metrics import API_CALLS, metrics
+from .lexical import tokenize
+from .rate_limit import AsyncRateLimiter
+
+
+class BaseReranker(ABC):
+    """Orders retrieval candidates for a question; one implementation per backend.
+
+    Subclasses implement ``_rank``. Reranking is skipped (candidates keep
+    their vector-search order) when the vector scores are already decisive:
+    the distance gap between the last kept candidate and the first dropped
+    one is at least ``decisive_margin``.
+    """
+
+    name: str
+
+    def __init__(self, decisive_margin: Optional[float] = None):
+        """
+        Args:
+            decisive_margin: Distance gap at which reranking is skipped;
+                defaults to RERANK_DECISIVE_MARGIN, 0 never skips
+        """
+        self.decisive_margin = (
+            settings.RERANK_DECISIVE_MARGIN if decisive_margin is None else decisive_margin
+        )
+        self.skipped = 0
+
+    @abstractmethod
+    def _rank(
+        self,
+        query: str,
+        documents: List[str],
+        top_k: int,
+        query_embedding: Optional[List[float]],
+        distances: Optional[Sequence[float]],
+    ) -> List[int]:
+        """Return the indices of the best ``top_k`` documents, best first."""
+
+    async def _arank(
+        self,
+        query: str,
+        documents: List[str],
+        top_k: int,
+        query_embedding: Optional[List[float]],
+        distances: Optional[Sequence[float]],
+    ) -> List[int]:
+        # Local scoring of ~10 candidates takes well under a millisecond
+        return self._rank(query, documents, top_k, query_embedding, distances)
+
+    def _decisive(
+        self, distances: Optional[Sequence[float]], top_k: int, fused: bool
+    ) -> bool:
+        # The margin is tuned on vector distances; fused rank scores never skip
+        if fused or not self.decisive_margin:
+            return False
+        if distances is None or len(distances) <= top_k:
+            return False
+        return distances[top_k] - distances[top_k - 1] >= self.decisive_margin
+
+    @staticmethod
+    def _select(
+        order: List[int], documents: List[str], ids: List[str]
+    ) -> Tuple[List[str], List[str]]:
+        return [documents[i] for i in order], [ids[i] for i in order]
+
+    def rerank(
+        self,
+        query: str,
+        documents: List[str],
+        ids: List[str],
+        top_k: int = 3,
+        query_embedding: Optional[List[float]] = None,
+        distances: Optional[Sequence[float]] = None,
+        fused: bool = False,
+    ) -> Tuple[List[str], List[str]]:
+        """Return the best ``top_k`` documents and their ids.
+
+        Args:
+            query_embedding: The question's embedding, for embedding-based scoring
+            distances: Vector-search distances of ``documents`` (ascending)
+            fused: ``distances`` come from hybrid rank fusion, so the decisive
+                margin does not apply
+        """
+        with (
+            logfire.span(
+                "reranking", reranker=self.name, num_docs=len(documents), top_k=top_k
+            ),
+            metrics.track("rerank"),
+        ):
+            if self._decisive(distances, top_k, fused):
+                self.skipped += 1
+                return documents[:top_k], ids[:top_k]
+            order = self._rank(query, documents, top_k, query_embedding, distances)
+            return self._select(order, documents, ids)
+
+    async def arerank(
+        self,
+        query: str,
+        documents: List[str],
+        ids: List[str],
+        top_k: int = 3,
+        query_embedding: Optional[List[float]] = None,
+        distances: Optional[Sequence[float]] = None,
+        fused: bool = False,
+    ) -> Tuple[List[str], List[str]]:
+        with (
+            logfire.span(
+                "reranking", reranker=self.name, num_docs=len(documents), top_k=top_k
+            ),
+            metrics.track("rerank"),
+        ):
+            if self._decisive(distances, top_k, fused):
+                self.skipped += 1
+                return documents[:top_k], ids[:top_k]
+            order = await self._arank(query, documents, top_k, query_embedding, distances)
+            return self._select(order, documents, ids)
+
+
+class VoyageReranker(BaseReranker):
+    """Voyage AI rerank API (``rerank-2-lite`` by default); one network call per question."""
+
+    name = "voyage"
+
+    def __init__(
+        self,
+        voyage_client: Optional[voyageai.Client] = None,
+        async_voyage_client: Optional[voyageai.AsyncClient] = None,
+        rate_limiter: Optional[AsyncRateLimiter] = None,
+        model: Optional[str] = None,
+        decisive_margin: Optional[float] = None,
+    ):
+        """
+        Args:
+            voyage_client: Shared VoyageAI client; a new one is created when omitted
+            async_voyage_client: Shared async client; without it the async
+                path runs the sync client on a worker thread
+            rate_limiter: Throttles Voyage calls made on the async path
+            model: Rerank model; defaults to RERANK_MODEL
+            decisive_margin: See ``BaseReranker``
+        """
+        super().__init__(decisive_margin)
+        self.voyage_client = voyage_client or voyageai.Client(
+            api_key=settings.VOYAGE_API_KEY
+        )
+        self.async_voyage_client = async_voyage_client
+        self.rate_limiter = rate_limiter
+        self.model = model or settings.RERANK_MODEL
+
+    @staticmethod
+    def _order(results: Any) -> List[int]:
+        return [r.index for r in results.results]
+
+    def _rank(self, query, documents, top_k, query_embedding, distances) -> List[int]:
+        metrics.inc(API_CALLS, provider="voyage", operation="rerank")
+        results = self.voyage_client.rerank(
+            query=query, documents=documents, model=self.model, top_k=top_k
+        )
+        return self._order(results)
+
+    async def _arank(self, query, documents, top_k, query_embedding, distances) -> List[int]:
+        if self.async_voyage_client is None:
+            return await asyncio.to_thread(
+                self._rank, query, documents, top_k, query_embedding, distances
+            )
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        metrics.inc(API_CALLS, provider="voyage", operation="rerank")
+        results = await self.async_voyage_client.rerank(
+            query=query, documents=documents, model=self.model, top_k=top_k
+        )
+        return self._order(results)
+
+
+class NoReranker(BaseReranker):
+    """Keeps the vector-search order; no extra latency at all."""
+
+    name = "none"
+
+    def _rank(self, query, documents, top_k, query_embedding, distances) -> List[int]:
+        return list(range(min(top_k, len(documents))))
+
+
+class BM25Reranker(BaseReranker):
+    """Okapi BM25 over the candidate set, vectorized with numpy.
+
+    Term statistics come from the candidates themselves, which is enough to
+    reward chunks that share the question's rarer terms.
+    """
+
+    name = "bm25"
+
+    def __init__(
+        self, k1: float = 1.5, b: float = 0.75, decisive_margin: Optional[float] = None
+    ):
+        super().__init__(decisive_margin)
+        self.k1 = k1
+        self.b = b
+
+    def scores(self, query: str, documents: List[str]) -> np.ndarray:
+        """BM25 score of every document for ``query``."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not documents:
+            return np.zeros(len(documents))
+        counts = [Counter(tokenize(document)) for document in documents]
+        # tf[d, t]: occurrences of query term t in document d
+        tf = np.array([[c[term] for term in terms] for c in counts], dtype=np.float64)
+        lengths = np.array([sum(c.values()) for c in counts], dtype=np.float64)
+        n = len(documents)
+        df = np.count_nonzero(tf, axis=0)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * lengths / max(lengths.mean(), 1.0))
+        return (tf * (self.k1 + 1) / (tf + norm[:, None])) @ idf
+
+    def _rank(self, query, documents, top_k, query_embedding, distances) -> List[int]:
+        # Stable sort keeps vector order among ties (e.g. no shared terms)
+        return np.argsort(-self.scores(query, documents), kind="stable")[:top_k].tolist()
+
+
+class HybridReranker(BM25Reranker):
+    """Blends vector similarity with BM25 over the candidates.
+
+    Both signals are min-max normalized before mixing with ``vector_weight``.
+    The vector signal is the search distance (no extra model call); without
+    distances the candidates' rank order stands in for it.
+    """
+
+    name = "hybrid"
+
+    def __init__(
+        self, vector_weight: float = 0.5, decisive_margin: Optional[float] = None
+    ):
+        super().__init__(decisive_margin=decisive_margin)
+        self.vector_weight = vector_weight
+
+    @staticmethod
+    def _min_max(values: np.ndarray) -> np.ndarray:
+        spread = values.max() - values.min()
+        return (values - values.min()) / spread if spread > 0 else np.zeros_like(values)
+
+    def _rank(self, query, documents, top_k, query_embedding, distances) -> List[int]:
+        if distances is not None:
+            similarity = -np.asarray(distances, dtype=np.float64)
+        else:
+            similarity = -np.arange(len(documents), dtype=np.float64)
+        blended = self.vector_weight * self._min_max(similarity) + (
+            1 - self.vector_weight
+        ) * self._min_max(self.scores(query, documents))
+        return np.argsort(-blended, kind="stable")[:top_k].tolist()
+
+
+class CrossEncoderReranker(BaseReranker):
+    """Local cross-encoder scoring every (question, candidate) pair in one batch.
+
+    Requires the optional ``sentence-transformers`` package.
+    """
+
+    name = "cross-encoder"
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        device: str = "cpu",
+        decisive_margin: Optional[float] = None,
+    ):
+        """
+        Args:
+            model: Cross-encoder name or path; defaults to LOCAL_RERANK_MODEL
+            device: Torch device to run on
+            decisive_margin: See ``BaseReranker``
+        """
+        super().__init__(decisive_margin)
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError(
+                "The cross-encoder reranker needs sentence-transformers: "
+                "pip install sentence-transformers"
+            ) from e
+        self.model = model or settings.LOCAL_RERANK_MODEL
+        self._model = CrossEncoder(self.model, device=device)
+
+    def _rank(self, query, documents, top_k, query_embedding, distances) -> List[int]:
+        if not documents:
+            return []
+        scores = self._model.predict(
+            [(query, document) for document in documents], batch_size=len(documents)
+        )
+        return np.argsort(-np.asarray(scores), kind="stable")[:top_k].tolist()
+
+    async def _arank(self, query, documents, top_k, query_embedding, distances) -> List[int]:
+        # Tens of milliseconds of model inference; keep it off the event loop
+        return await asyncio.to_thread(
+            self._rank, query, documents, top_k, query_embedding, distances
+        )
+
+
+RERANKER_BACKENDS = ("voyage", "cross-encoder", "bm25", "hybrid", "none")
+
+
+def create_reranker(
+    backend: Optional[str] = None,
+    voyage_client: Optional[voyageai.Client] = None,
+    async_voyage_client: Optional[voyageai.AsyncClient] = None,
+    rate_limiter: Optional[AsyncRateLimiter] = None,
+    decisive_margin: Optional[float] = None,
+) -> BaseReranker:
+    """Build the reranker selected by ``backend`` (default: RERANKER_BACKEND).
+
+    Args:
+        backend: One of ``RERANKER_BACKENDS``
+        voyage_client: Shared VoyageAI client for the Voyage backend
+        async_voyage_client: Shared async VoyageAI client for the Voyage backend
+        rate_limiter: Throttles async Voyage calls
+        decisive_margin: See ``BaseReranker``
+
+    Raises:
+        ValueError: For an unknown backend
+    """
+    backend = (backend or settings.RERANKER_BACKEND).lower()
+    if backend == "voyage":
+        return VoyageReranker(
+            voyage_client,
+            async_voyage_client,
+            rate_limiter=rate_limiter,
+            decisive_margin=decisive_margin,
+        )
+    if backend == "cross-encoder":
+        return CrossEncoderReranker(decisive_margin=decisive_margin)
+    if backend == "bm25":
+        return BM25Reranker(decisive_margin=decisive_margin)
+    if backend == "hybrid":
+        return HybridReranker(decisive_margin=decisive_margin)
+    if backend == "none":
+        return NoReranker(decisive_margin=decisive_margin)
+    raise ValueError(
+        f"Unknown RERANKER_BACKEND: {backend} (expected one of {', '.join(RERANKER_BACKENDS)})"
+    )
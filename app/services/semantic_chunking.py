@@ -1,90 +1,278 @@
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+
+import logfire
 import numpy as np
-from typing import List, Dict, Any
 import voyageai
-from ..core.config import settings
-import logfire
+
+from ..core.metrics import metrics
+from .embeddings import Embedder, create_embedder
+
+# Sentence boundary: whitespace after a period, question mark or exclamation
+# mark, or a line break (list items, table rows and headings have no period)
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*")
+
+# Longest sentence kept whole. Longer runs without a boundary are cut, at a
+# space where possible, so sentence windows stay well within the embedder's
+# per-text limit and the text carried between blocks stays bounded.
+MAX_SENTENCE_CHARS = 2000
+
+# Characters read per block when chunking a file
+FILE_BLOCK_SIZE = 1 << 20
+
+
+@dataclass
+class SemanticChunk:
+    """A chunk plus the sentence span and window embeddings it was built from."""
+
+    text: str
+    # Sentence span [start_sentence, end_sentence) within the document
+    start_sentence: int
+    end_sentence: int
+    # One row per sentence window in the span; None if the text was not embedded
+    window_embeddings: Optional[np.ndarray] = None
+
+    def pooled_embedding(self) -> Optional[List[float]]:
+        """Mean of the window embeddings, L2-normalized.
+
+        A single-window chunk returns that window's embedding unchanged.
+        """
+        if self.window_embeddings is None or len(self.window_embeddings) == 0:
+            return None
+        if len(self.window_embeddings) == 1:
+            return self.window_embeddings[0].tolist()
+        pooled = self.window_embeddings.mean(axis=0)
+        norm = np.linalg.norm(pooled)
+        return (pooled / norm if norm else pooled).tolist()
+
 
 class SemanticChunker:
-    """Enterprise-grade semantic chunker using VoyageAI embeddings."""
+    """Enterprise-grade semantic chunker using sentence-window embeddings.
+
+    Sentences are streamed from a string, file or iterator of text blocks and
+    processed in segments of at most ``segment_sentences`` sentences. Each
+    segment's sentence windows are embedded in request-sized batches, adjacent
+    cosine distances are computed in one vectorized pass over the normalized
+    embedding matrix, and breakpoints are chosen against that segment's
+    distance percentile. The trailing partial chunk of a segment is carried
+    into the next one, so peak memory depends on the segment size rather than
+    the document length. Documents that fit in one segment are chunked exactly
+    as if processed whole.
+    """
 
-    def __init__(self, buffer_size: int = 1, breakpoint_percentile_threshold: float = 95):
+    def __init__(
+        self,
+        buffer_size: int = 1,
+        breakpoint_percentile_threshold: float = 95,
+        voyage_client: Optional[voyageai.Client] = None,
+        segment_sentences: int = 4096,
+        embedder: Optional[Embedder] = None,
+    ):
         """
         Initialize the semantic chunker.
         
         Args:
             buffer_size: Number of sentences to combine on each side of a break for context
             breakpoint_percentile_threshold: The percentile of distance changes that will be considered a break
+            voyage_client: Shared VoyageAI client used when ``embedder`` is
+                omitted and EMBEDDING_BACKEND is voyage
+            segment_sentences: Sentences embedded and scored together; bounds
+                memory use and the length of a chunk with no breakpoint
+            embedder: Embedder for sentence windows; built for EMBEDDING_BACKEND
+                when omitted
         """
-        self.voyage_client = voyageai.Client(api_key=settings.VOYAGE_API_KEY)
+        self.embedder = embedder or create_embedder(voyage_client=voyage_client)
         self.buffer_size = buffer_size
         self.breakpoint_percentile_threshold = breakpoint_percentile_threshold
+        self.segment_sentences = max(2, segment_sentences)
+
+    @staticmethod
+    def _split_long(text: str) -> List[str]:
+        """Cut ``text`` into pieces of at most ``MAX_SENTENCE_CHARS``."""
+        pieces = []
+        start = 0
+        while len(text) - start > MAX_SENTENCE_CHARS:
+            cut = text.rfind(" ", start + 1, start + MAX_SENTENCE_CHARS + 1)
+            if cut < 0:
+                cut = start + MAX_SENTENCE_CHARS
+            pieces.append(text[start:cut])
+            start = cut
+        # Pieces keep their whitespace: the last may continue in the next block
+        pieces.append(text[start:])
+        return pieces
+
+    @classmethod
+    def _iter_sentences(cls, blocks: Iterable[str]) -> Iterator[str]:
+        """Split a stream of text blocks into sentences.
+
+        The text after the last boundary in a block is held back and joined
+        with the next block, so sentences spanning blocks are kept whole. At
+        most ``MAX_SENTENCE_CHARS`` is held back, so each block is scanned
+        about once however long the run without a boundary.
+        """
+        carry = ""
+        for block in blocks:
+            parts = SENTENCE_BOUNDARY.split(carry + block)
+            carry = parts.pop()
+            if len(carry) > MAX_SENTENCE_CHARS:
+                # No boundary in sight: emit the run rather than buffer it
+                *pieces, carry = cls._split_long(carry)
+                parts.extend(pieces)
+            for part in parts:
+                for sentence in cls._split_long(part):
+                    sentence = sentence.strip()
+                    if sentence:
+                        yield sentence
+        for sentence in cls._split_long(carry):
+            sentence = sentence.strip()
+            if sentence:
+                yield sentence
 
-    def _split_into_sentences(self, text: str) -> List[str]:
-        """Simple sentence splitter. For enterprise grade, we use regex or a library like nltk/spacy."""
-        # Split by periods, question marks, exclamation marks followed by a space
-        import re
-        sentences = re.split(r'(?<=[.!?]) +', text)
-        return [s.strip() for s in sentences if s.strip()]
-
-    def _combine_sentences(self, sentences: List[str], buffer_size: int) -> List[str]:
-        """Combines sentences with a sliding window to capture more context for embeddings."""
-        combined_sentences = []
-        for i in range(len(sentences)):
-            # Combine sentences around index i
-            start = max(0, i - buffer_size)
-            end = min(len(sentences), i + buffer_size + 1)
-            combined = " ".join(sentences[start:end])
-            combined_sentences.append(combined)
-        return combined_sentences
+    def _iter_windows(self, sentences: Iterable[str]) -> Iterator[Tuple[str, str]]:
+        """Yield ``(sentence, window)`` pairs, where each window joins the
+        sentence with up to ``buffer_size`` neighbours on each side."""
+        b = self.buffer_size
+        recent: Deque[str] = deque(maxlen=2 * b + 1)
+        seen = 0
+        for sentence in sentences:
+            recent.append(sentence)
+            seen += 1
+            # The sentence b positions back now has its full right context
+            if seen > b:
+                yield recent[-(b + 1)], " ".join(recent)
+        # The last b sentences have truncated right context
+        for center in range(max(0, seen - b), seen):
+            offset = center - (seen - len(recent))
+            yield recent[offset], " ".join(
+                list(recent)[max(0, offset - b):]
+            )
+
+    def _embed_windows(self, windows: List[str]) -> np.ndarray:
+        """Embed windows in request-sized batches; returns L2-normalized float32 rows."""
+        matrix: Optional[np.ndarray] = None
+        for batch, embeddings in self.embedder.embed_batches(windows, "document"):
+            rows = np.asarray(embeddings, dtype=np.float32)
+            if matrix is None:
+                matrix = np.empty((len(windows), rows.shape[1]), dtype=np.float32)
+            matrix[batch[0] : batch[-1] + 1] = rows
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        matrix /= norms
+        return matrix
 
     def chunk(self, text: str) -> List[str]:
         """
         Perform semantic chunking on the given text.
         """
+        return [chunk.text for chunk in self.split(text)]
+
+    def split(self, text: str) -> List[SemanticChunk]:
+        """
+        Perform semantic chunking and keep the sentence spans and window embeddings.
+        """
         with logfire.span("semantic_chunking_execution", text_length=len(text)):
-            sentences = self._split_into_sentences(text)
-            if len(sentences) < 2:
-                return [text]
-
-            # 1. Generate embeddings for combined sentences (with buffer for context)
-            combined = self._combine_sentences(sentences, self.buffer_size)
-            
-            with logfire.span("generating_embeddings_for_chunking"):
-                embeddings_response = self.voyage_client.embed(
-                    texts=combined,
-                    model="voyage-3",
-                    input_type="document"
+            return list(self.iter_chunks([text]))
+
+    def chunk_file(self, path: str, block_size: int = FILE_BLOCK_SIZE) -> Iterator[SemanticChunk]:
+        """Stream chunks from a text file without reading it into memory at once."""
+
+        def blocks() -> Iterator[str]:
+            with open(path, "r") as f:
+                while block := f.read(block_size):
+                    yield block
+
+        return self.iter_chunks(blocks())
+
+    def iter_chunks(self, blocks: Iterable[str]) -> Iterator[SemanticChunk]:
+        """
+        Lazily chunk a stream of text blocks (e.g. file reads or pages).
+
+        Args:
+            blocks: Consecutive pieces of one document
+
+        Yields:
+            Chunks in document order; sentence spans are document-wide
+        """
+        segment: List[Tuple[str, str]] = []
+        # Sentences (and their window embeddings) after the last breakpoint
+        tail: List[str] = []
+        tail_embeddings: Optional[np.ndarray] = None
+        tail_start = 0
+        segment_count = 0
+
+        def flush(final: bool) -> Iterator[SemanticChunk]:
+            nonlocal tail, tail_embeddings, tail_start, segment_count
+            segment_count += 1
+            sentences = tail + [sentence for sentence, _ in segment]
+            with (
+                logfire.span(
+                    "generating_embeddings_for_chunking",
+                    segment=segment_count,
+                    sentences=len(segment),
+                ),
+                metrics.track("chunk_embedding"),
+            ):
+                embeddings = self._embed_windows([window for _, window in segment])
+            if tail_embeddings is not None:
+                embeddings = np.concatenate([tail_embeddings, embeddings])
+
+            # Cosine distance between each window and the next, in one pass
+            distances = 1.0 - np.einsum("ij,ij->i", embeddings[:-1], embeddings[1:])
+            # Only the new gaps set the threshold; the tail's were already scored
+            scored = distances[max(0, len(tail) - 1) :]
+            if len(scored) < 2:
+                # One new gap (or none, for a lone sentence after a segment
+                # emitted whole) has no percentile to stand out from
+                breakpoints = np.empty(0, dtype=np.intp)
+            else:
+                threshold = np.percentile(scored, self.breakpoint_percentile_threshold)
+                breakpoints = np.flatnonzero(distances > threshold)
+                breakpoints = breakpoints[breakpoints >= len(tail) - 1]
+
+            start = 0
+            for index in breakpoints.tolist():
+                yield SemanticChunk(
+                    " ".join(sentences[start : index + 1]),
+                    tail_start + start,
+                    tail_start + index + 1,
+                    embeddings[start : index + 1],
                 )
-                embeddings = np.array(embeddings_response.embeddings)
-
-            # 2. Calculate distances between adjacent embeddings
-            distances = []
-            for i in range(len(embeddings) - 1):
-                # Cosine distance = 1 - cosine similarity
-                similarity = np.dot(embeddings[i], embeddings[i+1]) / (
-                    np.linalg.norm(embeddings[i]) * np.linalg.norm(embeddings[i+1])
+                start = index + 1
+
+            remaining = len(sentences) - start
+            if final or remaining >= self.segment_sentences:
+                # Emit the tail rather than letting an unbroken run grow without limit
+                if remaining:
+                    yield SemanticChunk(
+                        " ".join(sentences[start:]),
+                        tail_start + start,
+                        tail_start + len(sentences),
+                        embeddings[start:],
+                    )
+                start = len(sentences)
+            tail = sentences[start:]
+            tail_embeddings = embeddings[start:].copy() if tail else None
+            tail_start += start
+
+        sentence_count = 0
+        for pair in self._iter_windows(self._iter_sentences(blocks)):
+            segment.append(pair)
+            sentence_count += 1
+            if len(segment) >= self.segment_sentences:
+                yield from flush(final=False)
+                segment = []
+
+        if sentence_count < 2:
+            # Nothing to compare; a lone sentence is its own chunk
+            if segment:
+                yield SemanticChunk(segment[0][0], 0, 1)
+            return
+        if segment or tail:
+            if segment:
+                yield from flush(final=True)
+            else:
+                yield SemanticChunk(
+                    " ".join(tail), tail_start, tail_start + len(tail), tail_embeddings
                 )
-                distances.append(1 - similarity)
-
-            # 3. Identify breakpoints based on distance percentile
-            if not distances:
-                return [text]
-            
-            breakpoint_distance_threshold = np.percentile(distances, self.breakpoint_percentile_threshold)
-            indices_above_threshold = [i for i, d in enumerate(distances) if d > breakpoint_distance_threshold]
-
-            # 4. Create chunks based on breakpoints
-            chunks = []
-            start_index = 0
-            for index in indices_above_threshold:
-                # Group sentences from start_index to index (inclusive)
-                chunk = " ".join(sentences[start_index:index + 1])
-                chunks.append(chunk)
-                start_index = index + 1
-            
-            # Add the last remaining part
-            if start_index < len(sentences):
-                chunk = " ".join(sentences[start_index:])
-                chunks.append(chunk)
-
-            return chunks
@@ -0,0 +1 @@
+"""Command-line tools and benchmarks; importable so tests can reuse the stubs."""
@@ -0,0 +1,111 @@
+"""Load benchmark for the async /ask pipeline against stub backends.
+
+Compares the old behaviour (synchronous ``answer_question`` called from an
+async handler, which blocks the event loop) with ``aanswer_question`` and
+the streaming ``astream_answer``, for which time to the first answer token
+is reported too. No API keys or network access are required.
+
+    uv run scripts/benchmark_async_ask.py --requests 500 --concurrency 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("VOYAGE_API_KEY", "stub")
+
+from stub_backends import (  # noqa: E402
+    InFlightTracker,
+    Latency,
+    StubAsyncVoyageClient,
+    StubChromaClient,
+    StubCollection,
+    StubGenAIClient,
+    StubVoyageClient,
+)
+
+from app.services.query import QueryService  # noqa: E402
+
+
+def build_service(latency: Latency, tracker: InFlightTracker) -> QueryService:
+    return QueryService(
+        voyage_client=StubVoyageClient(latency, tracker),
+        async_voyage_client=StubAsyncVoyageClient(latency, tracker),
+        chroma_client=StubChromaClient(StubCollection(latency)),
+        genai_client=StubGenAIClient(latency, tracker),
+    )
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(mode: str, service: QueryService, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, first_tokens = [], []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            if mode == "blocking":
+                # What the /ask handler did before: sync work on the event loop
+                service.answer_question(f"Question {i}?", query_id=f"Q{i}")
+            elif mode == "stream":
+                first_token = None
+                async for event in service.astream_answer(f"Question {i}?", query_id=f"Q{i}"):
+                    if event.event == "token" and first_token is None:
+                        first_token = time.perf_counter() - start
+                first_tokens.append(first_token)
+            else:
+                await service.aanswer_question(f"Question {i}?", query_id=f"Q{i}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    return elapsed, latencies, first_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument(
+        "--blocking-requests",
+        type=int,
+        default=20,
+        help="Requests for the blocking baseline (it runs serially, so keep it small)",
+    )
+    args = parser.parse_args()
+
+    latency = Latency()
+    modes = (
+        ("blocking", args.blocking_requests),
+        ("async", args.requests),
+        ("stream", args.requests),
+    )
+    for mode, requests in modes:
+        tracker = InFlightTracker()
+        service = build_service(latency, tracker)
+        elapsed, latencies, first_tokens = asyncio.run(
+            run(mode, service, requests, args.concurrency)
+        )
+        first_token = (
+            f" first-token p50={statistics.median(first_tokens) * 1000:.0f}ms"
+            if first_tokens
+            else ""
+        )
+        print(
+            f"{mode:>8}: {requests} requests in {elapsed:.2f}s "
+            f"({requests / elapsed:.1f} req/s) "
+            f"p50={statistics.median(latencies) * 1000:.0f}ms "
+            f"p99={percentile(latencies, 99) * 1000:.0f}ms{first_token} "
+            f"peak in-flight backend calls={tracker.peak}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Compare reusing chunking-stage embeddings with re-embedding every chunk.
+
+Chunks the Medicare document once, then builds chunk vectors two ways:
+
+- re-embed: a second Voyage embed pass over the chunk texts (the default path)
+- reuse: mean-pooled sentence-window embeddings from the chunker
+
+and reports the time each path adds, how close the pooled vectors are to the
+re-embedded ones, and retrieval agreement: recall@k of the reuse path against
+the re-embed path's top-k for a set of questions.
+
+    uv run scripts/benchmark_chunk_embeddings.py
+    uv run scripts/benchmark_chunk_embeddings.py --stub   # offline dry run
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+if "--stub" in sys.argv:
+    os.environ.setdefault("VOYAGE_API_KEY", "stub")
+
+import chromadb  # noqa: E402
+import voyageai  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.services.embeddings import VoyageEmbedder  # noqa: E402
+from app.services.ingest import IngestService  # noqa: E402
+from app.services.semantic_chunking import SemanticChunker  # noqa: E402
+
+DEFAULT_QUESTIONS = [
+    "Can I see any doctor with Original Medicare?",
+    "Does Medicare Advantage include prescription drug coverage?",
+    "Do I need a referral to see a specialist?",
+    "What are the out-of-pocket limits?",
+    "Can I buy a Medigap policy with Medicare Advantage?",
+    "Is dental and vision coverage included?",
+]
+
+
+def load_questions(path: str):
+    if not os.path.exists(path):
+        return DEFAULT_QUESTIONS
+    with open(path, "r") as f:
+        items = json.load(f)
+    questions = [item.get("input") if isinstance(item, dict) else item for item in items]
+    return [q for q in questions if q] or DEFAULT_QUESTIONS
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def top_k(chunk_matrix: np.ndarray, query_matrix: np.ndarray, k: int) -> np.ndarray:
+    scores = query_matrix @ chunk_matrix.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--document", default="app/gen-ai-homework-assignment/input/medicare_comparison.md"
+    )
+    parser.add_argument("--questions", default="eval_data/goldens.json")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--stub", action="store_true", help="Use offline stub embeddings")
+    args = parser.parse_args()
+
+    if args.stub:
+        from stub_backends import Latency, StubVoyageClient
+
+        client = StubVoyageClient(Latency(embed=0.2))
+    else:
+        client = voyageai.Client(api_key=settings.VOYAGE_API_KEY)
+
+    with open(args.document, "r") as f:
+        text = f.read()
+
+    embedder = VoyageEmbedder(client)
+    chunker = SemanticChunker(embedder=embedder)
+    start = time.perf_counter()
+    chunks = chunker.split(text)
+    chunking_seconds = time.perf_counter() - start
+
+    def timed_ingest_vectors(reuse: bool):
+        service = IngestService(
+            embedder=embedder,
+            chroma_client=chromadb.EphemeralClient(),
+            reuse_chunk_embeddings=reuse,
+        )
+        start = time.perf_counter()
+        vectors = service.embed_chunks(chunks)
+        return np.asarray(vectors, dtype=np.float32), time.perf_counter() - start
+
+    reembedded, reembed_seconds = timed_ingest_vectors(reuse=False)
+    pooled, reuse_seconds = timed_ingest_vectors(reuse=True)
+
+    questions = load_questions(args.questions)
+    query_vectors = np.asarray(embedder.embed(questions, "query"), dtype=np.float32)
+    k = min(args.k, len(chunks))
+    reference = top_k(normalize(reembedded), normalize(query_vectors), k)
+    candidate = top_k(normalize(pooled), normalize(query_vectors), k)
+    recall = np.mean(
+        [
+            len(set(r) & set(c)) / k
+            for r, c in zip(reference.tolist(), candidate.tolist(), strict=True)
+        ]
+    )
+    cosine = np.sum(normalize(reembedded) * normalize(pooled), axis=1)
+
+    print(
+        json.dumps(
+            {
+                "chunks": len(chunks),
+                "questions": len(questions),
+                "chunking_seconds": round(chunking_seconds, 3),
+                "reembed_seconds": round(reembed_seconds, 3),
+                "reuse_seconds": round(reuse_seconds, 3),
+                "ingestion_speedup_excluding_chunking": round(
+                    reembed_seconds / max(reuse_seconds, 1e-9), 1
+                ),
+                f"recall_at_{k}_vs_reembed": round(float(recall), 3),
+                "mean_cosine_pooled_vs_reembedded": round(float(cosine.mean()), 4),
+                "min_cosine_pooled_vs_reembedded": round(float(cosine.min()), 4),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compare dense-only and hybrid (BM25 + dense, RRF) retrieval.
+
+For every golden question, retrieves the top-k candidates from the live
+collection both ways and reports hit rate and MRR against the golden
+contexts at several cut-offs, plus per-query search latency. A high hit rate
+at small k means ``top_k`` can be lowered and reranking skipped.
+
+Needs a collection with a lexical index (built during ingestion, or with
+``run_ingestion.py --lexical-index``) and ``eval_data/goldens.json``.
+
+    uv run scripts/benchmark_hybrid_retrieval.py
+    uv run scripts/benchmark_hybrid_retrieval.py --cutoffs 1,3,5 --goldens eval_data/goldens.json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from benchmark_rerankers import is_relevant, load_goldens, percentile
+
+from app.services.query import QueryService
+from app.services.reranking import NoReranker
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--goldens", default="eval_data/goldens.json")
+    parser.add_argument("--cutoffs", default="1,3,5,10", help="Comma-separated k values")
+    args = parser.parse_args()
+
+    cutoffs = sorted(int(k) for k in args.cutoffs.split(","))
+    goldens = [(q, contexts) for q, contexts in load_goldens(args.goldens) if contexts]
+    if not goldens:
+        print(f"No golden contexts in {args.goldens}", file=sys.stderr)
+        return 1
+
+    service = QueryService(reranker=NoReranker())
+    lexical_index = service.retriever.lexical_index
+    if lexical_index is None:
+        print("The active collection has no lexical index", file=sys.stderr)
+        return 1
+    questions = [question for question, _ in goldens]
+    query_embeddings = service.retriever.embed_queries(questions)
+
+    report = {"questions": len(goldens), "indexed_chunks": len(lexical_index), "modes": {}}
+    for mode in ("dense", "hybrid"):
+        service.retriever.lexical_index = lexical_index if mode == "hybrid" else None
+        timings, ranks = [], []
+        for (question, contexts), embedding in zip(
+            goldens, query_embeddings, strict=True
+        ):
+            start = time.perf_counter()
+            hits = service.retriever.search(embedding, cutoffs[-1], question)
+            timings.append((time.perf_counter() - start) * 1000)
+            relevant = [
+                rank
+                for rank, document in enumerate(hits.documents, 1)
+                if is_relevant(document, contexts)
+            ]
+            ranks.append(relevant[0] if relevant else None)
+
+        stats = {
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+        }
+        for k in cutoffs:
+            stats[f"hit_rate_at_{k}"] = round(
+                statistics.mean(1.0 if r and r <= k else 0.0 for r in ranks), 3
+            )
+            stats[f"mrr_at_{k}"] = round(
+                statistics.mean(1.0 / r if r and r <= k else 0.0 for r in ranks), 3
+            )
+        report["modes"][mode] = stats
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Wall time of judging a dataset with a blocking vs an async Gemini judge.
+
+Measures the four RAG metrics (answer relevancy, faithfulness, contextual
+relevancy, hallucination) over ``--cases`` synthetic test cases with
+``a_measure``, all cases at once, against a stub Gemini client:
+
+- ``blocking``: ``a_generate`` calls the synchronous client, so each judge
+  call blocks the event loop and the metrics run one call at a time
+- ``async``: ``GeminiGenAI.a_generate`` on the async client, at most
+  ``--max-concurrency`` calls in flight, in JSON-schema mode
+
+Prints wall time, judge calls, peak in-flight calls and the speedup.
+No API keys or network access are required.
+
+    uv run scripts/benchmark_judge.py --cases 100 --latency 0.02
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "stub")
+os.environ.setdefault("VOYAGE_API_KEY", "stub")
+os.environ.setdefault("DEEPEVAL_TELEMETRY_OPT_OUT", "1")
+
+from deepeval.metrics import (  # noqa: E402
+    AnswerRelevancyMetric,
+    ContextualRelevancyMetric,
+    FaithfulnessMetric,
+    HallucinationMetric,
+)
+from deepeval.test_case import LLMTestCase  # noqa: E402
+from stub_backends import Latency, StubGenAIClient  # noqa: E402
+
+from app.services.evaluation import GeminiGenAI  # noqa: E402
+
+METRICS = (
+    AnswerRelevancyMetric,
+    FaithfulnessMetric,
+    ContextualRelevancyMetric,
+    HallucinationMetric,
+)
+
+
+class BlockingGeminiGenAI(GeminiGenAI):
+    """The previous judge: ``a_generate`` ran the sync client on the event loop."""
+
+    async def a_generate(self, prompt, schema=None):
+        return self.generate(prompt, schema)
+
+
+def build_cases(count: int):
+    return [
+        LLMTestCase(
+            input=f"Does Medicare Part B cover service {i}?",
+            actual_output=f"Part B covers service {i} when it is medically necessary.",
+            retrieval_context=[f"Synthetic Medicare chunk {i}: coverage details."],
+            context=[f"Synthetic Medicare chunk {i}: coverage details."],
+        )
+        for i in range(count)
+    ]
+
+
+async def judge(model: GeminiGenAI, cases) -> float:
+    metrics = [[metric(threshold=0.7, model=model) for metric in METRICS] for _ in cases]
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            metric.a_measure(case, _show_indicator=False)
+            for case, case_metrics in zip(cases, metrics, strict=True)
+            for metric in case_metrics
+        )
+    )
+    elapsed = time.perf_counter() - start
+    scores = [metric.score for case_metrics in metrics for metric in case_metrics]
+    if any(score is None for score in scores):
+        raise RuntimeError("A metric finished without a score")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.02, help="Stub judge call latency (s)")
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    cases = build_cases(args.cases)
+    report = {"cases": args.cases, "metrics": len(METRICS), "modes": {}}
+    for mode, model_class in (("blocking", BlockingGeminiGenAI), ("async", GeminiGenAI)):
+        client = StubGenAIClient(Latency(generate=args.latency))
+        model = model_class(
+            model_name="stub-judge",
+            api_key="stub",
+            client=client,
+            max_concurrency=args.max_concurrency,
+        )
+        elapsed = asyncio.run(judge(model, cases))
+        report["modes"][mode] = {
+            "wall_seconds": round(elapsed, 2),
+            "judge_calls": client.tracker.calls,
+            "peak_in_flight": client.tracker.peak,
+        }
+
+    report["speedup"] = round(
+        report["modes"]["blocking"]["wall_seconds"] / report["modes"]["async"]["wall_seconds"], 1
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
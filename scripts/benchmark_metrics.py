@@ -0,0 +1,113 @@
+"""Per-request overhead of the in-process metrics (``app.core.metrics``).
+
+Measures the cost of single ``inc``/``observe``/``track`` calls, then
+answers the same questions against zero-latency stub backends with metrics
+enabled and disabled, alternating rounds to even out noise, and reports the
+difference per request. Finally prints the stage quantiles that were
+recorded, as served by ``GET /metrics``.
+
+No API keys or network access are required.
+
+    uv run scripts/benchmark_metrics.py --requests 2000 --rounds 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("VOYAGE_API_KEY", "stub")
+os.environ.setdefault("GEMINI_API_KEY", "stub")
+
+from stub_backends import (  # noqa: E402
+    Latency,
+    StubAsyncVoyageClient,
+    StubChromaClient,
+    StubCollection,
+    StubGenAIClient,
+    StubVoyageClient,
+)
+
+from app.core.metrics import API_CALLS, STAGE_SECONDS, MetricsRegistry, metrics  # noqa: E402
+from app.services.query import QueryService  # noqa: E402
+
+
+def per_call_ns(func, calls: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter_ns() - start) / calls
+
+
+def micro(calls: int) -> dict:
+    registry = MetricsRegistry()
+
+    def track():
+        with registry.track("stage"):
+            pass
+
+    return {
+        "inc_ns": round(per_call_ns(lambda: registry.inc(API_CALLS, provider="voyage"), calls)),
+        "observe_ns": round(
+            per_call_ns(lambda: registry.observe(STAGE_SECONDS, 0.0123, stage="stage"), calls)
+        ),
+        "track_ns": round(per_call_ns(track, calls)),
+        "render_ms": round(per_call_ns(registry.render, 100) / 1e6, 3),
+    }
+
+
+def build_service() -> QueryService:
+    latency = Latency(embed=0, rerank=0, generate=0, chroma_query=0)
+    service = QueryService(
+        voyage_client=StubVoyageClient(latency),
+        async_voyage_client=StubAsyncVoyageClient(latency),
+        chroma_client=StubChromaClient(StubCollection(latency)),
+        genai_client=StubGenAIClient(latency),
+    )
+    # Every question must run the full pipeline
+    service.answer_cache = None
+    service.retriever.embedder.cache = None
+    return service
+
+
+async def answer(service: QueryService, requests: int) -> float:
+    """Mean seconds per sequentially answered question."""
+    start = time.perf_counter()
+    for i in range(requests):
+        await service.aanswer_question(f"Question {i}?", query_id=f"Q{i}")
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--calls", type=int, default=200_000, help="Micro-benchmark calls")
+    args = parser.parse_args()
+
+    report = {"micro": micro(args.calls), "requests": args.requests, "rounds": args.rounds}
+    service = build_service()
+    asyncio.run(answer(service, 50))  # warm up
+
+    samples = {"enabled": [], "disabled": []}
+    for _ in range(args.rounds):
+        for mode in samples:
+            metrics.enabled = mode == "enabled"
+            samples[mode].append(asyncio.run(answer(service, args.requests)))
+    metrics.enabled = True
+
+    enabled = statistics.median(samples["enabled"])
+    disabled = statistics.median(samples["disabled"])
+    report["per_request_us"] = {
+        "enabled": round(enabled * 1e6, 1),
+        "disabled": round(disabled * 1e6, 1),
+        "overhead": round((enabled - disabled) * 1e6, 1),
+        "overhead_pct": round((enabled - disabled) / disabled * 100, 2),
+    }
+    report["stages"] = metrics.stage_summary()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
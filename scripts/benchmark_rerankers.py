@@ -0,0 +1,206 @@
+"""Compare reranker backends on latency and retrieval quality.
+
+Retrieves candidates once per golden question from the live collection, then
+reranks the same candidates with every backend and reports:
+
+- latency: mean/p50/p95 milliseconds per rerank call
+- hit rate and MRR: whether (and how high) a chunk overlapping the golden
+  context lands in the reranked top-k
+- agreement: overlap of each backend's top-k with the reference backend's
+- skipped: questions answered straight from vector order under --margin
+
+Golden questions and contexts come from ``eval_data/goldens.json`` (see
+``generate_synthetic_data.py``); without it only latency and agreement are
+reported for a few built-in questions.
+
+    uv run scripts/benchmark_rerankers.py
+    uv run scripts/benchmark_rerankers.py --modes bm25,hybrid,none --margin 0.1
+    uv run scripts/benchmark_rerankers.py --stub   # offline dry run
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+if "--stub" in sys.argv:
+    os.environ.setdefault("VOYAGE_API_KEY", "stub")
+
+from app.services.lexical import tokenize  # noqa: E402
+from app.services.query import QueryService  # noqa: E402
+from app.services.reranking import (  # noqa: E402
+    RERANKER_BACKENDS,
+    NoReranker,
+    create_reranker,
+)
+
+DEFAULT_QUESTIONS = [
+    "Can I see any doctor with Original Medicare?",
+    "Does Medicare Advantage include prescription drug coverage?",
+    "Do I need a referral to see a specialist?",
+    "What are the out-of-pocket limits?",
+    "Can I buy a Medigap policy with Medicare Advantage?",
+    "Is dental and vision coverage included?",
+]
+
+# A candidate counts as relevant when this share of the shorter text's
+# distinct tokens also appears in a golden context passage
+RELEVANCE_OVERLAP = 0.6
+
+
+def load_goldens(path: str):
+    """Return (question, contexts) pairs; contexts are empty without goldens."""
+    if not os.path.exists(path):
+        return [(q, []) for q in DEFAULT_QUESTIONS]
+    with open(path, "r") as f:
+        items = json.load(f)
+    goldens = []
+    for item in items:
+        if isinstance(item, dict) and item.get("input"):
+            goldens.append((item["input"], item.get("context") or []))
+        elif isinstance(item, str):
+            goldens.append((item, []))
+    return goldens or [(q, []) for q in DEFAULT_QUESTIONS]
+
+
+def is_relevant(document: str, contexts) -> bool:
+    words = set(tokenize(document))
+    for context in contexts:
+        golden = set(tokenize(context))
+        shorter = min(len(words), len(golden))
+        if shorter and len(words & golden) / shorter >= RELEVANCE_OVERLAP:
+            return True
+    return False
+
+
+def build_service(stub: bool) -> QueryService:
+    if not stub:
+        return QueryService(reranker=NoReranker())
+    from stub_backends import (
+        Latency,
+        StubAsyncVoyageClient,
+        StubChromaClient,
+        StubCollection,
+        StubGenAIClient,
+        StubVoyageClient,
+    )
+
+    latency = Latency()
+    return QueryService(
+        voyage_client=StubVoyageClient(latency),
+        async_voyage_client=StubAsyncVoyageClient(latency),
+        chroma_client=StubChromaClient(StubCollection(latency)),
+        genai_client=StubGenAIClient(latency),
+        reranker=NoReranker(),
+    )
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--goldens", default="eval_data/goldens.json")
+    parser.add_argument(
+        "--modes",
+        default=",".join(RERANKER_BACKENDS),
+        help="Comma-separated reranker backends to compare",
+    )
+    parser.add_argument(
+        "--reference", default="voyage", help="Backend the others are compared against"
+    )
+    parser.add_argument("--top-k", type=int, default=10, help="Candidates retrieved")
+    parser.add_argument("--rerank-top-k", type=int, default=3, help="Candidates kept")
+    parser.add_argument(
+        "--margin",
+        type=float,
+        default=0.0,
+        help="Decisive-score margin for skipping reranking (0 always reranks)",
+    )
+    parser.add_argument("--stub", action="store_true", help="Use offline stub backends")
+    args = parser.parse_args()
+
+    service = build_service(args.stub)
+    goldens = load_goldens(args.goldens)
+    questions = [question for question, _ in goldens]
+    all_candidates = service.retrieve_candidates(questions, top_k=args.top_k)
+    labelled = any(contexts for _, contexts in goldens)
+
+    rankings = {}
+    report = {
+        "questions": len(questions),
+        "labelled": labelled,
+        "top_k": args.top_k,
+        "rerank_top_k": args.rerank_top_k,
+        "margin": args.margin,
+        "modes": {},
+    }
+    for mode in args.modes.split(","):
+        try:
+            reranker = create_reranker(
+                mode,
+                voyage_client=service.voyage_client,
+                async_voyage_client=service.async_voyage_client,
+                decisive_margin=args.margin,
+            )
+        except ImportError as e:
+            report["modes"][mode] = {"error": str(e)}
+            continue
+
+        timings, hits, reciprocal_ranks, ranked = [], [], [], []
+        for (question, contexts), candidates in zip(
+            goldens, all_candidates, strict=True
+        ):
+            start = time.perf_counter()
+            documents, ids = reranker.rerank(
+                question,
+                candidates.documents,
+                candidates.ids,
+                top_k=args.rerank_top_k,
+                query_embedding=candidates.query_embedding,
+                distances=candidates.distances,
+                fused=candidates.fused,
+            )
+            timings.append((time.perf_counter() - start) * 1000)
+            ranked.append(ids)
+            if contexts:
+                ranks = [
+                    rank
+                    for rank, document in enumerate(documents, 1)
+                    if is_relevant(document, contexts)
+                ]
+                hits.append(1.0 if ranks else 0.0)
+                reciprocal_ranks.append(1.0 / ranks[0] if ranks else 0.0)
+        rankings[mode] = ranked
+
+        stats = {
+            "mean_ms": round(statistics.mean(timings), 3),
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+            "skipped": reranker.skipped,
+        }
+        if labelled:
+            stats[f"hit_rate_at_{args.rerank_top_k}"] = round(statistics.mean(hits), 3)
+            stats[f"mrr_at_{args.rerank_top_k}"] = round(statistics.mean(reciprocal_ranks), 3)
+        report["modes"][mode] = stats
+
+    reference = rankings.get(args.reference)
+    if reference is not None:
+        for mode, ranked in rankings.items():
+            agreement = [
+                len(set(ids) & set(expected)) / max(len(expected), 1)
+                for ids, expected in zip(ranked, reference, strict=True)
+            ]
+            report["modes"][mode][f"agreement_with_{args.reference}"] = round(
+                statistics.mean(agreement), 3
+            )
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
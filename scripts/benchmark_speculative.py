@@ -0,0 +1,137 @@
+"""Per-stage latency of sequential vs speculative (pipelined) answering.
+
+Runs the same questions through ``aanswer_question`` (embed -> search ->
+rerank -> generate in sequence) and ``aanswer_speculative`` (generation
+starts on the top vector hits while reranking runs) against stub backends,
+and prints p50/p99 per stage and end to end, plus the speculation hit rate.
+
+The stub reranker keeps the vector order for ``--agreement`` of the
+questions and reshuffles it otherwise, so the cost of restarts shows too.
+No API keys or network access are required.
+
+    uv run scripts/benchmark_speculative.py --requests 200 --agreement 0.7
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("VOYAGE_API_KEY", "stub")
+
+from benchmark_async_ask import percentile  # noqa: E402
+from stub_backends import (  # noqa: E402
+    Latency,
+    StubAsyncVoyageClient,
+    StubChromaClient,
+    StubCollection,
+    StubGenAIClient,
+    StubVoyageClient,
+)
+
+from app.services.query import QueryService  # noqa: E402
+from app.services.reranking import BaseReranker  # noqa: E402
+
+STAGES = ("embed", "retrieve", "rerank", "generate", "total")
+
+
+class StubReranker(BaseReranker):
+    """Sleeps like a rerank call; agrees with the vector order ``agreement`` of the time."""
+
+    name = "stub"
+
+    def __init__(self, latency: float, agreement: float, seed: int = 0):
+        super().__init__(decisive_margin=0)
+        self.latency = latency
+        self.agreement = agreement
+        self.random = random.Random(seed)
+
+    def _rank(self, query, documents, top_k, query_embedding, distances):
+        order = list(range(len(documents)))
+        if self.random.random() >= self.agreement:
+            self.random.shuffle(order)
+        return order[:top_k]
+
+    async def _arank(self, query, documents, top_k, query_embedding, distances):
+        await asyncio.sleep(self.latency)
+        return self._rank(query, documents, top_k, query_embedding, distances)
+
+
+def build_service(latency: Latency, agreement: float) -> QueryService:
+    service = QueryService(
+        voyage_client=StubVoyageClient(latency),
+        async_voyage_client=StubAsyncVoyageClient(latency),
+        chroma_client=StubChromaClient(StubCollection(latency)),
+        genai_client=StubGenAIClient(latency),
+        reranker=StubReranker(latency.rerank, agreement),
+    )
+    # Every question must run the full pipeline
+    service.answer_cache = None
+    return service
+
+
+async def run(mode: str, service: QueryService, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(i: int):
+        timings = {}
+        async with semaphore:
+            start = time.perf_counter()
+            if mode == "speculative":
+                await service.aanswer_speculative(
+                    f"Question {i}?", query_id=f"Q{i}", timings=timings
+                )
+            else:
+                await service.aanswer_question(
+                    f"Question {i}?", query_id=f"Q{i}", timings=timings
+                )
+            timings["total"] = time.perf_counter() - start
+        samples.append(timings)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument(
+        "--agreement",
+        type=float,
+        default=0.7,
+        help="Share of questions where reranking keeps the vector top-k",
+    )
+    parser.add_argument("--rerank-latency", type=float, default=0.2)
+    parser.add_argument("--generate-latency", type=float, default=0.8)
+    args = parser.parse_args()
+
+    latency = Latency(rerank=args.rerank_latency, generate=args.generate_latency)
+    report = {"requests": args.requests, "agreement": args.agreement, "modes": {}}
+    for mode in ("sequential", "speculative"):
+        service = build_service(latency, args.agreement)
+        samples = asyncio.run(run(mode, service, args.requests, args.concurrency))
+        stats = {}
+        for stage in STAGES:
+            values = [s[stage] for s in samples if stage in s]
+            stats[stage] = {
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1),
+            }
+        if mode == "speculative":
+            hits = [s["speculation_hit"] for s in samples]
+            stats["speculation_hit_rate"] = round(sum(hits) / len(hits), 3)
+        report["modes"][mode] = stats
+
+    sequential, speculative = report["modes"]["sequential"], report["modes"]["speculative"]
+    report["total_savings_ms"] = {
+        key: round(sequential["total"][key] - speculative["total"][key], 1)
+        for key in ("p50_ms", "p99_ms")
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""Offline benchmark suite for /ask, /process-batch, ingestion and chunking.
+
+Every external API is replaced by the deterministic stubs in
+``stub_backends`` (Voyage embed and rerank, Gemini), with per-call latencies
+drawn from a seeded log-normal distribution. Chroma is real, in a temporary
+directory that the ingestion workload seeds with synthetic documents; the
+/ask and /process-batch workloads then query it through the FastAPI app.
+
+Each workload reports throughput, p50/p95/p99 latency and memory (RSS after
+the workload, its growth, and the process peak). The report is written as
+JSON so runs can be compared between commits:
+
+    uv run scripts/benchmark_suite.py --output benchmark_results/base.json
+    uv run scripts/benchmark_suite.py --compare benchmark_results/base.json
+
+With ``--compare``, latency or throughput changes beyond ``--threshold``
+percent are listed on stderr and the exit status is 1. No API keys or
+network access are required.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("VOYAGE_API_KEY", "stub")
+os.environ.setdefault("GEMINI_API_KEY", "stub")
+os.environ.setdefault("LOGFIRE_IGNORE_NO_CONFIG", "1")
+
+import httpx  # noqa: E402
+from benchmark_async_ask import percentile  # noqa: E402
+from stub_backends import (  # noqa: E402
+    Latency,
+    StubAsyncVoyageClient,
+    StubGenAIClient,
+    StubVoyageClient,
+)
+
+from app.core.config import settings  # noqa: E402
+from app.core.metrics import metrics  # noqa: E402
+from app.dependencies import ServiceContainer  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.embeddings import VoyageEmbedder  # noqa: E402
+from app.services.ingest import discover_documents  # noqa: E402
+from app.services.semantic_chunking import SemanticChunker  # noqa: E402
+
+# Model name recorded on the collection; the stub's vectors are not Voyage's
+STUB_EMBEDDING_MODEL = "stub-embedding"
+
+TOPICS = [
+    ("Original Medicare", "Part A", "hospital stays", "deductible"),
+    ("Medicare Advantage", "network", "referral", "out-of-pocket limit"),
+    ("Part D", "formulary", "prescription drugs", "coverage gap"),
+    ("Medigap", "supplement plan", "coinsurance", "guaranteed issue"),
+    ("enrollment", "initial enrollment period", "late penalty", "special election"),
+    ("dental and vision", "extra benefits", "routine exams", "hearing aids"),
+]
+FILLER = (
+    "the plan covers costs for beneficiaries who qualify under the rules when "
+    "providers accept assignment and claims are filed within the yearly limits"
+).split()
+
+# Metrics compared by --compare, and whether a larger value is better
+COMPARED = {"qps": True, "p50_ms": False, "p95_ms": False, "p99_ms": False}
+
+
+def synthetic_document(rng: random.Random, sentences: int) -> str:
+    """Markdown-ish text that drifts between topics every few sentences."""
+    lines = []
+    topic = rng.choice(TOPICS)
+    for i in range(sentences):
+        if i % rng.randint(6, 12) == 0:
+            topic = rng.choice(TOPICS)
+            lines.append(f"\n## {topic[0]}\n")
+        words = rng.sample(topic, 2) + rng.sample(FILLER, rng.randint(6, 14))
+        rng.shuffle(words)
+        lines.append(" ".join(words).capitalize() + ".")
+    return " ".join(lines)
+
+
+def synthetic_question(rng: random.Random, i: int) -> str:
+    topic = rng.choice(TOPICS)
+    return f"How does {topic[0]} handle {rng.choice(topic[1:])}? ({i})"
+
+
+def rss_mb() -> float:
+    """Current resident set size; the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def latency_stats(seconds) -> dict:
+    return {
+        "p50_ms": round(percentile(seconds, 50) * 1000, 2),
+        "p95_ms": round(percentile(seconds, 95) * 1000, 2),
+        "p99_ms": round(percentile(seconds, 99) * 1000, 2),
+    }
+
+
+def stage_stats(prefix: str) -> dict:
+    return {
+        stage: stats
+        for stage, stats in metrics.stage_summary().items()
+        if stage.startswith(prefix)
+    }
+
+
+class Workload:
+    """Times a workload and records the memory it leaves behind."""
+
+    def __enter__(self):
+        self.rss_before = rss_mb()
+        self.started = time.perf_counter()
+        metrics.reset()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.started
+        self.memory = {
+            "rss_mb": round(rss_mb(), 1),
+            "rss_growth_mb": round(rss_mb() - self.rss_before, 1),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+
+
+def build_services(latency: Latency, db_path: str) -> ServiceContainer:
+    """A ServiceContainer whose API clients are stubs and whose caches are off."""
+    settings.VECTOR_DB_PATH = db_path
+    # Every request must run the whole pipeline
+    settings.EMBEDDING_CACHE_SIZE = 0
+    settings.ANSWER_CACHE_SIZE = 0
+    services = ServiceContainer()
+    services.voyage_client = StubVoyageClient(latency)
+    services.async_voyage_client = StubAsyncVoyageClient(latency)
+    services.genai_client = StubGenAIClient(latency)
+    services.embedder = VoyageEmbedder(
+        client=services.voyage_client,
+        async_client=services.async_voyage_client,
+        model=STUB_EMBEDDING_MODEL,
+    )
+    return services
+
+
+def bench_chunking(latency: Latency, texts) -> dict:
+    chunker = SemanticChunker(
+        embedder=VoyageEmbedder(client=StubVoyageClient(latency), model=STUB_EMBEDDING_MODEL)
+    )
+    chunker.chunk(texts[0][:2000])  # warm up
+    timings, chunks = [], 0
+    with Workload() as workload:
+        for text in texts:
+            start = time.perf_counter()
+            chunks += len(chunker.chunk(text))
+            timings.append(time.perf_counter() - start)
+    sentences = sum(text.count(".") for text in texts)
+    return {
+        "documents": len(texts),
+        "chunks": chunks,
+        "seconds": round(workload.seconds, 3),
+        "qps": round(len(texts) / workload.seconds, 2),
+        "sentences_per_second": round(sentences / workload.seconds, 1),
+        **latency_stats(timings),
+        "memory": workload.memory,
+    }
+
+
+def bench_ingestion(services: ServiceContainer, docs_dir: str) -> dict:
+    documents = discover_documents(docs_dir)
+    with Workload() as workload:
+        result = services.ingest_service.ingest_documents(documents)
+    per_document = metrics.stage_summary().get("ingest_chunking", {})
+    return {
+        "documents": len(documents),
+        "chunks": result["chunk_count"],
+        "seconds": round(workload.seconds, 3),
+        "qps": round(len(documents) / workload.seconds, 2),
+        "chunks_per_second": round(result["chunk_count"] / workload.seconds, 1),
+        # Per-document latency is dominated by chunking
+        **{k: v for k, v in per_document.items() if k != "count"},
+        "stages": stage_stats("ingest_"),
+        "memory": workload.memory,
+    }
+
+
+async def bench_ask(client: httpx.AsyncClient, questions, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    timings, errors = [], 0
+
+    async def one(i: int, question: str):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(
+                "/api/v1/ask", json={"query": question, "query_id": f"Q{i}"}
+            )
+            timings.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    with Workload() as workload:
+        await asyncio.gather(*(one(i, q) for i, q in enumerate(questions)))
+    return {
+        "requests": len(questions),
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(workload.seconds, 3),
+        "qps": round(len(questions) / workload.seconds, 2),
+        **latency_stats(timings),
+        "stages": stage_stats(""),
+        "memory": workload.memory,
+    }
+
+
+async def bench_batch(
+    client: httpx.AsyncClient, questions, concurrency: int, workdir: str
+) -> dict:
+    queries_path = os.path.join(workdir, "queries.jsonl")
+    # Answers files live under BATCH_OUTPUT_DIR
+    settings.BATCH_OUTPUT_DIR = workdir
+    with open(queries_path, "w") as f:
+        for i, question in enumerate(questions):
+            f.write(json.dumps({"id": f"B{i}", "text": question}) + "\n")
+
+    with Workload() as workload:
+        response = await client.post(
+            "/api/v1/process-batch",
+            json={
+                "queries_path": queries_path,
+                "answers_path": "answers.jsonl",
+                "resume": False,
+                "concurrency": concurrency,
+            },
+            timeout=None,
+        )
+    result = response.json()
+    answer = metrics.stage_summary().get("answer", {})
+    return {
+        "queries": len(questions),
+        "concurrency": concurrency,
+        "errors": result.get("failed_count", len(questions)),
+        "seconds": round(workload.seconds, 3),
+        "qps": round(len(questions) / workload.seconds, 2),
+        # Per query after the grouped embed and search: rerank and generate
+        **{k: v for k, v in answer.items() if k != "count"},
+        "stages": stage_stats(""),
+        "memory": workload.memory,
+    }
+
+
+async def bench_api(services: ServiceContainer, args, rng: random.Random, workdir: str):
+    app.state.services = services
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        # Build the query service and warm up connections and code paths
+        for i in range(5):
+            await client.post("/api/v1/ask", json={"query": synthetic_question(rng, -i)})
+        ask = await bench_ask(
+            client,
+            [synthetic_question(rng, i) for i in range(args.ask_requests)],
+            args.concurrency,
+        )
+        batch = await bench_batch(
+            client,
+            [synthetic_question(rng, i) for i in range(args.batch_queries)],
+            args.concurrency,
+            workdir,
+        )
+    return ask, batch
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """Lines describing metrics that moved more than ``threshold`` percent the wrong way."""
+    regressions = []
+    for workload, results in report["workloads"].items():
+        previous = baseline.get("workloads", {}).get(workload, {})
+        for key, higher_is_better in COMPARED.items():
+            old, new = previous.get(key), results.get(key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(f"{workload}.{key}: {old} -> {new} ({change:+.1f}%)")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ask-requests", type=int, default=500)
+    parser.add_argument("--batch-queries", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--documents", type=int, default=20, help="Documents ingested")
+    parser.add_argument("--sentences", type=int, default=300, help="Sentences per document")
+    parser.add_argument(
+        "--sigma", type=float, default=0.3, help="Log-normal spread of stub latencies"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout")
+    parser.add_argument("--compare", help="Earlier report to check for regressions")
+    parser.add_argument(
+        "--threshold", type=float, default=10.0, help="Regression threshold (percent)"
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    latency = Latency(sigma=args.sigma, seed=args.seed)
+    workdir = tempfile.mkdtemp(prefix="rag-benchmark-")
+    try:
+        docs_dir = os.path.join(workdir, "docs")
+        os.makedirs(docs_dir)
+        texts = [synthetic_document(rng, args.sentences) for _ in range(args.documents)]
+        for i, text in enumerate(texts):
+            with open(os.path.join(docs_dir, f"doc_{i:04d}.md"), "w") as f:
+                f.write(text)
+
+        services = build_services(latency, os.path.join(workdir, "db"))
+        workloads = {
+            "chunking": bench_chunking(latency, texts),
+            "ingestion": bench_ingestion(services, docs_dir),
+        }
+        workloads["ask"], workloads["process_batch"] = asyncio.run(
+            bench_api(services, args, rng, workdir)
+        )
+        services.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            **{k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            "latency_ms": {
+                call: getattr(latency, call) * 1000
+                for call in ("embed", "rerank", "generate", "chroma_query")
+            },
+            "reranker_backend": settings.RERANKER_BACKEND,
+            "hybrid_retrieval": settings.HYBRID_RETRIEVAL,
+        },
+        "workloads": workloads,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,92 +1,154 @@
+"""Evaluate the RAG pipeline on the synthetic goldens with deepeval.
+
+Questions are answered and judged concurrently by ``EvaluationRunner``.
+Gemini and Voyage calls are paced by token buckets sized to your quota
+(``--gemini-rpm``/``--voyage-rpm``, defaulting to the *_REQUESTS_PER_MINUTE
+settings), and quota errors are retried with backoff. Finished cases are
+checkpointed, so an interrupted run picks up where it stopped, and answers
+and verdicts are cached under eval_results/ (EVAL_CACHE_PATH), so a re-run
+only pays for questions, prompts or models that changed.
+
+    uv run scripts/evaluate_deepeval.py --gemini-rpm 15
+    uv run scripts/evaluate_deepeval.py --metrics answer_relevancy,faithfulness
+"""
+import argparse
 import asyncio
-import os
 import json
-from typing import List, Dict
-from deepeval.test_case import LLMTestCase
+import os
+from datetime import datetime
+
+import logfire
 from deepeval.metrics import (
     AnswerRelevancyMetric,
-    FaithfulnessMetric,
     ContextualRelevancyMetric,
-    HallucinationMetric
+    FaithfulnessMetric,
+    HallucinationMetric,
 )
-from deepeval import evaluate
-from app.services.query import QueryService
-from app.services.evaluation import GeminiGenAI
+
 from app.core.config import settings
-import logfire
+from app.services.eval_cache import EvaluationCache
+from app.services.evaluation import GeminiGenAI
+from app.services.evaluation_runner import EvalCase, EvaluationRunner
+from app.services.query import QueryService
+from app.services.rate_limit import AsyncRateLimiter
 
 # Configure logfire defensively
 if settings.LOGFIRE_TOKEN:
     logfire.configure(token=settings.LOGFIRE_TOKEN)
 
-async def run_batch_evaluation():
-    """Run batch evaluation using generated synthetic test cases."""
-    query_service = QueryService()
-    
-    # Load synthetic test cases
-    goldens_path = "eval_data/goldens.json"
-    if not os.path.exists(goldens_path):
-        print(f"Error: Synthetic test cases not found at {goldens_path}. Run generate_synthetic_data.py first.")
-        return
+METRICS = {
+    "answer_relevancy": AnswerRelevancyMetric,
+    "faithfulness": FaithfulnessMetric,
+    "contextual_relevancy": ContextualRelevancyMetric,
+    "hallucination": HallucinationMetric,
+}
 
-    with open(goldens_path, "r") as f:
+
+def load_cases(path: str):
+    with open(path, "r") as f:
         goldens = json.load(f)
+    # Deepeval's save_as exports a list of dicts
+    return [
+        EvalCase(
+            input=item["input"],
+            expected_output=item.get("expected_output"),
+            context=item.get("context") or None,
+        )
+        for item in goldens
+        if item.get("input")
+    ]
 
-    test_cases = []
-    
-    with logfire.span("batch_query_execution", num_cases=len(goldens)):
-        for item in goldens:
-            # Check if it's a list or a single golden
-            # Deepeval's save_as usually exports a list of dicts
-            query = item.get("input")
-            expected_output = item.get("expected_output")
-            retrieval_context = item.get("context", [])
-            
-            if not query:
-                continue
-                
-            result = query_service.answer_question(query)
-            
-            test_case = LLMTestCase(
-                input=query,
-                actual_output=result.answer,
-                expected_output=expected_output,
-                retrieval_context=result.source_text
-            )
-            test_cases.append(test_case)
-            
-            # Rate limiting for Gemini free tier
-            import time
-            print(f"Waiting for rate limit (30s)...")
-            time.sleep(30)
-
-    # Define Metrics
-    # Note: Threshold can be adjusted based on requirements
+
+async def run_batch_evaluation(args) -> None:
+    """Run batch evaluation using generated synthetic test cases."""
+    if not os.path.exists(args.goldens):
+        print(f"Error: Synthetic test cases not found at {args.goldens}. Run generate_synthetic_data.py first.")
+        return
+    cases = load_cases(args.goldens)
+
+    gemini_limiter = AsyncRateLimiter.per_minute(args.gemini_rpm)
+    query_service = QueryService(
+        voyage_rate_limiter=AsyncRateLimiter.per_minute(args.voyage_rpm),
+        gemini_rate_limiter=gemini_limiter,
+    )
+    # The judge shares the generator's client and its Gemini quota
     model = GeminiGenAI(
         model_name=settings.LLM_MODEL,
-        api_key=settings.GEMINI_API_KEY
+        api_key=settings.GEMINI_API_KEY,
+        client=query_service.generator.client,
+        rate_limiter=gemini_limiter,
+        max_concurrency=args.judge_concurrency,
+    )
+    metric_classes = [METRICS[name] for name in args.metrics.split(",")]
+    runner = EvaluationRunner(
+        query_service,
+        lambda: [metric(threshold=args.threshold, model=model) for metric in metric_classes],
+        answer_concurrency=args.answer_concurrency,
+        judge_concurrency=args.judge_concurrency,
+        max_retries=args.max_retries,
+        checkpoint_path=args.checkpoint,
+        cache=None if args.no_cache else EvaluationCache.from_settings(),
     )
-    
-    metrics = [
-        AnswerRelevancyMetric(threshold=0.7, model=model)
-    ]
 
-    with logfire.span("deepeval_batch_evaluation"):
-        all_results = []
-        for i, test_case in enumerate(test_cases):
-            print(f"Evaluating test case {i+1}/{len(test_cases)}...")
-            results = evaluate([test_case], metrics)
-            all_results.append(results)
-            if i < len(test_cases) - 1:
-                print(f"Waiting for rate limit between evaluations (30s)...")
-                time.sleep(30)
+    print(f"Evaluating {len(cases)} cases (checkpoint: {args.checkpoint})...")
+    summary = await runner.run(cases)
 
     print("\n--- Batch Evaluation Complete ---")
-    
-    # Save results
+    print(
+        f"{summary['judged_count']} judged, {summary['partial_count']} partial, "
+        f"{summary['failed_count']} failed, "
+        f"{summary['resumed_count']} resumed in {summary['elapsed_seconds']}s "
+        f"(retries: {summary['retries']}, cache hits: {summary['cache_hits']})"
+    )
+    for name, stats in summary["metrics"].items():
+        print(
+            f"{name}: mean={stats['mean_score']} pass_rate={stats['pass_rate']} "
+            f"errors={stats['errors']}"
+        )
+    if gemini_limiter is not None:
+        print(f"Waited {gemini_limiter.waited_seconds:.0f}s on the Gemini quota")
+
     os.makedirs("eval_results", exist_ok=True)
-    # Convert results to a serializable format if needed or use deepeval's built-in reporting
-    # For now, we'll just print that it's done.
+    path = os.path.join(
+        "eval_results", f"deepeval_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    with open(path, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"Results saved to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--goldens", default="eval_data/goldens.json")
+    parser.add_argument("--checkpoint", default="eval_results/deepeval_checkpoint.jsonl")
+    parser.add_argument(
+        "--metrics",
+        default="answer_relevancy",
+        help=f"Comma-separated metrics: {', '.join(METRICS)}",
+    )
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument(
+        "--gemini-rpm",
+        type=float,
+        default=settings.GEMINI_REQUESTS_PER_MINUTE,
+        help="Gemini requests per minute, shared by answering and judging (0 = unlimited)",
+    )
+    parser.add_argument(
+        "--voyage-rpm", type=float, default=settings.VOYAGE_REQUESTS_PER_MINUTE
+    )
+    parser.add_argument("--answer-concurrency", type=int, default=None)
+    parser.add_argument(
+        "--judge-concurrency",
+        type=int,
+        default=None,
+        help="Metric measurements and judge calls in flight at once",
+    )
+    parser.add_argument("--max-retries", type=int, default=None)
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Answer and judge everything afresh"
+    )
+    asyncio.run(run_batch_evaluation(parser.parse_args()))
+
 
 if __name__ == "__main__":
-    asyncio.run(run_batch_evaluation())
+    main()
@@ -1,20 +1,118 @@
+"""Ingest documents into the vector database.
+
+With no arguments the Medicare comparison document is ingested, as before.
+Pass a directory or a manifest to ingest many documents through the
+parallel pipeline:
+
+    uv run scripts/run_ingestion.py
+    uv run scripts/run_ingestion.py --directory data/plans --pattern "*.md"
+    uv run scripts/run_ingestion.py --manifest data/plans/manifest.jsonl --embed-workers 8
+    uv run scripts/run_ingestion.py --lexical-index   # backfill the BM25 index
+
+Manifest entries are paths or objects like
+``{"path": "plan_a.md", "source": "plan_a", "metadata": {"plan_year": 2025}}``.
+"""
+import argparse
+import json
+import sys
+
 import logfire
-from app.services.ingest import IngestService
+
 from app.core.config import settings
+from app.services.ingest import (
+    DEFAULT_PATTERNS,
+    IngestService,
+    discover_documents,
+    load_manifest,
+)
 
 # Configure logfire defensively
 if settings.LOGFIRE_TOKEN:
     logfire.configure(token=settings.LOGFIRE_TOKEN)
 
-def run_ingestion():
+
+def print_progress(stage: str, **counts: int) -> None:
+    print(
+        f"\r{stage:<10} documents {counts.get('documents_done', 0)}/"
+        f"{counts.get('documents_total', 0)}  chunks {counts.get('chunk_count', 0)}  "
+        f"embedded {counts.get('chunks_embedded', 0)}  "
+        f"written {counts.get('chunks_written', 0)}",
+        end="",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def run_ingestion(args: argparse.Namespace) -> int:
     """Run the ingestion process."""
-    print("Starting ingestion with semantic chunking...")
     service = IngestService()
     try:
-        result = service.ingest_medicare_docs()
-        print(f"Ingestion successful: {result}")
+        if args.lexical_index:
+            print(json.dumps(service.build_lexical_index(), indent=2))
+            return 0
+        if args.directory:
+            documents = discover_documents(args.directory, args.pattern or DEFAULT_PATTERNS)
+        elif args.manifest:
+            documents = load_manifest(args.manifest)
+        else:
+            print("Starting ingestion with semantic chunking...")
+            result = service.ingest_medicare_docs()
+            print(f"Ingestion successful: {result}")
+            return 0
+
+        print(f"Ingesting {len(documents)} document(s) with semantic chunking...")
+        result = service.ingest_documents(
+            documents,
+            progress=print_progress,
+            fail_fast=args.fail_fast,
+            read_workers=args.read_workers,
+            chunk_workers=args.chunk_workers,
+            embed_workers=args.embed_workers,
+            queue_size=args.queue_size,
+            fast_load=args.fast_load,
+            write_batch_size=args.write_batch_size,
+        )
+        print(file=sys.stderr)
+        print(json.dumps(result, indent=2))
+        return 0 if result["status"] == "success" else 1
     except Exception as e:
         print(f"Ingestion failed: {e}")
+        return 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--directory", help="Directory searched recursively for documents")
+    source.add_argument("--manifest", help="JSON or JSONL manifest of documents")
+    source.add_argument(
+        "--lexical-index",
+        action="store_true",
+        help="Only (re)build the hybrid-retrieval BM25 index of the active collection",
+    )
+    parser.add_argument(
+        "--pattern",
+        action="append",
+        help="File name pattern for --directory (repeatable; default: *.md *.markdown *.txt)",
+    )
+    parser.add_argument("--read-workers", type=int, help="Threads hashing and diffing files")
+    parser.add_argument("--chunk-workers", type=int, help="Threads running semantic chunking")
+    parser.add_argument("--embed-workers", type=int, help="Concurrent embedding requests")
+    parser.add_argument("--queue-size", type=int, help="Documents buffered between stages")
+    parser.add_argument(
+        "--write-batch-size", type=int, help="Records per Chroma write (CHROMA_WRITE_BATCH_SIZE)"
+    )
+    parser.add_argument(
+        "--fast-load",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Write with add instead of upsert (default: only for the initial build)",
+    )
+    parser.add_argument(
+        "--fail-fast", action="store_true", help="Stop at the first failing document"
+    )
+    return run_ingestion(parser.parse_args())
+
 
 if __name__ == "__main__":
-    run_ingestion()
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""Deterministic in-process stand-ins for VoyageAI, Gemini and Chroma.
+
+Used by the benchmark scripts so the RAG pipeline can be exercised offline.
+Each stub sleeps for a configurable latency to mimic a network round trip and
+tracks how many calls it has in flight at once. Latencies are fixed by
+default, or drawn from a seeded log-normal distribution when ``sigma`` is set.
+Gemini calls in JSON mode get a minimal valid instance of the requested schema.
+"""
+import asyncio
+import hashlib
+import random
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace, UnionType
+from typing import Any, List, Literal, Optional, Union, get_args, get_origin
+
+from pydantic import BaseModel
+
+EMBEDDING_DIM = 64
+
+# Fragments a stubbed streaming generation is split into
+STREAM_CHUNKS = 10
+
+
+def fake_embedding(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """Deterministic pseudo-embedding derived from a hash of the text."""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    values = [(digest[i % len(digest)] - 127.5) / 127.5 for i in range(dim)]
+    norm = sum(v * v for v in values) ** 0.5
+    return [v / norm for v in values]
+
+
+@dataclass
+class Latency:
+    """Simulated latencies (seconds) for each backend call.
+
+    With ``sigma`` > 0 each call's latency is log-normal with the value
+    above as its median, so p99 sits around ``exp(2.33 * sigma)`` times
+    the median; draws come from a generator seeded with ``seed``.
+    """
+
+    embed: float = 0.05
+    rerank: float = 0.08
+    generate: float = 0.4
+    chroma_query: float = 0.005
+    sigma: float = 0.0
+    seed: int = 0
+    _random: random.Random = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._random = random.Random(self.seed)
+
+    def sample(self, call: str) -> float:
+        """Latency for one ``call`` ("embed", "rerank", "generate" or "chroma_query")."""
+        median = getattr(self, call)
+        if not self.sigma or not median:
+            return median
+        return median * self._random.lognormvariate(0.0, self.sigma)
+
+
+class InFlightTracker:
+    """Counts concurrent calls so benchmarks can report peak concurrency."""
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self.calls = 0
+
+    def __enter__(self):
+        self.current += 1
+        self.calls += 1
+        self.peak = max(self.peak, self.current)
+        return self
+
+    def __exit__(self, *exc):
+        self.current -= 1
+
+
+def _embed_response(texts: List[str]) -> SimpleNamespace:
+    return SimpleNamespace(embeddings=[fake_embedding(t) for t in texts])
+
+
+def _rerank_response(documents: List[str], top_k: Optional[int]) -> SimpleNamespace:
+    # Deterministic "relevance": shorter documents first
+    order = sorted(range(len(documents)), key=lambda i: (len(documents[i]), i))
+    order = order[: top_k or len(order)]
+    return SimpleNamespace(
+        results=[
+            SimpleNamespace(index=i, document=documents[i], relevance_score=1.0 / (rank + 1))
+            for rank, i in enumerate(order)
+        ]
+    )
+
+
+class StubVoyageClient:
+    """Synchronous ``voyageai.Client`` stand-in."""
+
+    def __init__(self, latency: Latency, tracker: Optional[InFlightTracker] = None):
+        self.latency = latency
+        self.tracker = tracker or InFlightTracker()
+
+    def embed(self, texts, model=None, input_type=None, **kwargs):
+        with self.tracker:
+            time.sleep(self.latency.sample("embed"))
+            return _embed_response(texts)
+
+    def rerank(self, query, documents, model=None, top_k=None, **kwargs):
+        with self.tracker:
+            time.sleep(self.latency.sample("rerank"))
+            return _rerank_response(documents, top_k)
+
+
+class StubAsyncVoyageClient:
+    """``voyageai.AsyncClient`` stand-in."""
+
+    def __init__(self, latency: Latency, tracker: Optional[InFlightTracker] = None):
+        self.latency = latency
+        self.tracker = tracker or InFlightTracker()
+
+    async def embed(self, texts, model=None, input_type=None, **kwargs):
+        with self.tracker:
+            await asyncio.sleep(self.latency.sample("embed"))
+            return _embed_response(texts)
+
+    async def rerank(self, query, documents, model=None, top_k=None, **kwargs):
+        with self.tracker:
+            await asyncio.sleep(self.latency.sample("rerank"))
+            return _rerank_response(documents, top_k)
+
+
+def _stub_value(annotation: Any) -> Any:
+    """Smallest valid value for a pydantic field annotation."""
+    origin, args = get_origin(annotation), get_args(annotation)
+    if origin is Literal:
+        return args[0]
+    if origin is list:
+        return [_stub_value(args[0])] if args else []
+    if origin is dict:
+        return {}
+    if origin in (Union, UnionType):
+        return _stub_value(next(a for a in args if a is not type(None)))
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return {
+            name: _stub_value(f.annotation) for name, f in annotation.model_fields.items()
+        }
+    return {bool: True, int: 1, float: 1.0}.get(annotation, "yes")
+
+
+def _generate_response(contents: str, config: Any = None) -> SimpleNamespace:
+    # JSON mode (response_schema) gets a minimal valid instance of the schema
+    schema = getattr(config, "response_schema", None)
+    if isinstance(schema, type) and issubclass(schema, BaseModel):
+        return SimpleNamespace(
+            text=schema.model_validate(_stub_value(schema)).model_dump_json()
+        )
+    return SimpleNamespace(text=f"Stub answer ({len(contents)} prompt chars).")
+
+
+class _StubModels:
+    def __init__(self, latency: Latency, tracker: InFlightTracker):
+        self.latency = latency
+        self.tracker = tracker
+
+    def generate_content(self, model, contents, config=None):
+        with self.tracker:
+            time.sleep(self.latency.sample("generate"))
+            return _generate_response(contents, config)
+
+
+class _StubAsyncModels:
+    def __init__(self, latency: Latency, tracker: InFlightTracker):
+        self.latency = latency
+        self.tracker = tracker
+
+    async def generate_content(self, model, contents, config=None):
+        with self.tracker:
+            await asyncio.sleep(self.latency.sample("generate"))
+            return _generate_response(contents, config)
+
+    async def generate_content_stream(self, model, contents, config=None):
+        # The full latency spread over STREAM_CHUNKS fragments
+        text = _generate_response(contents).text
+        size = -(-len(text) // STREAM_CHUNKS)
+
+        delay = self.latency.sample("generate")
+
+        async def chunks():
+            with self.tracker:
+                for start in range(0, len(text), size):
+                    await asyncio.sleep(delay / STREAM_CHUNKS)
+                    yield SimpleNamespace(text=text[start : start + size])
+
+        return chunks()
+
+
+class StubGenAIClient:
+    """``google.genai.Client`` stand-in exposing ``models`` and ``aio.models``."""
+
+    def __init__(self, latency: Latency, tracker: Optional[InFlightTracker] = None):
+        self.tracker = tracker or InFlightTracker()
+        self.models = _StubModels(latency, self.tracker)
+        self.aio = SimpleNamespace(models=_StubAsyncModels(latency, self.tracker))
+
+    def close(self):
+        pass
+
+
+class StubCollection:
+    """Chroma collection stand-in returning synthetic chunks."""
+
+    def __init__(self, latency: Latency, num_docs: int = 200):
+        self.latency = latency
+        self.documents = [
+            f"Synthetic Medicare chunk {i}: " + "coverage details " * (i % 7 + 1)
+            for i in range(num_docs)
+        ]
+        self.ids = [f"doc_{i}" for i in range(num_docs)]
+        self.metadata = None
+
+    def query(self, query_embeddings, n_results=10, **kwargs):
+        time.sleep(self.latency.sample("chroma_query"))
+        documents, ids, distances = [], [], []
+        for embedding in query_embeddings:
+            start = int(abs(embedding[0]) * 1000) % len(self.documents)
+            picks = [(start + j) % len(self.documents) for j in range(n_results)]
+            documents.append([self.documents[i] for i in picks])
+            ids.append([self.ids[i] for i in picks])
+            distances.append([0.5 + 0.05 * j for j in range(n_results)])
+        return {"documents": documents, "ids": ids, "distances": distances}
+
+    def get(self, include=None, limit=None, offset=0, **kwargs):
+        end = len(self.ids) if limit is None else offset + limit
+        return {"ids": self.ids[offset:end], "documents": self.documents[offset:end]}
+
+    def count(self):
+        return len(self.documents)
+
+
+class StubChromaClient:
+    """Chroma client stand-in serving a single ``StubCollection``."""
+
+    def __init__(self, collection: StubCollection):
+        self.collection = collection
+
+    def get_collection(self, name):
+        return self.collection
@@ -1,10 +1,13 @@
 import voyageai
 from app.core.config import settings
 def test_keys():
+    if not settings.VOYAGE_API_KEY:
+        print("Voyage API Key is not set (only needed for EMBEDDING_BACKEND=voyage and reranking).")
+        return
     print(f"Testing Voyage API Key: {settings.VOYAGE_API_KEY[:5]}...")
     try:
         vc = voyageai.Client(api_key=settings.VOYAGE_API_KEY)
-        vc.embed(["test"], model="voyage-3", input_type="document")
+        vc.embed(["test"], model=settings.VOYAGE_EMBEDDING_MODEL, input_type="document")
         print("Voyage API Key is VALID.")
     except Exception as e:
         print(f"Voyage API Key is INVALID: {e}")
@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+# Settings require API keys; the tests never call the providers
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("VOYAGE_API_KEY", "test")
+os.environ.setdefault("LOGFIRE_IGNORE_NO_CONFIG", "1")
+os.environ.setdefault("DEEPEVAL_TELEMETRY_OPT_OUT", "1")
+
+
+@pytest.fixture
+def stub_service(tmp_path):
+    """A QueryService on zero-latency stub backends, with its caches off."""
+    from app.services.collections import CollectionRegistry
+    from app.services.query import QueryService
+    from scripts.stub_backends import (
+        Latency,
+        StubAsyncVoyageClient,
+        StubChromaClient,
+        StubCollection,
+        StubGenAIClient,
+        StubVoyageClient,
+    )
+
+    latency = Latency(embed=0, rerank=0, generate=0, chroma_query=0)
+    service = QueryService(
+        voyage_client=StubVoyageClient(latency),
+        async_voyage_client=StubAsyncVoyageClient(latency),
+        chroma_client=StubChromaClient(StubCollection(latency)),
+        genai_client=StubGenAIClient(latency),
+        collection_registry=CollectionRegistry(str(tmp_path)),
+    )
+    service.answer_cache = None
+    service.retriever.embedder.cache = None
+    return service
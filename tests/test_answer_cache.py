@@ -0,0 +1,91 @@
+import numpy as np
+
+from app.models.schemas import QueryResult
+from app.services.cache import SemanticAnswerCache, question_entities
+
+
+def result(query: str) -> QueryResult:
+    return QueryResult(
+        query_id="Q1",
+        query_text=query,
+        answer=f"Answer to {query}",
+        source_chunks=[],
+        source_text=[],
+    )
+
+
+def nearby(base: np.ndarray, seed: int, similarity: float) -> list:
+    """A unit vector with cosine ``similarity`` to ``base``."""
+    noise = np.random.default_rng(seed).normal(size=base.shape)
+    noise -= noise @ base * base
+    noise /= np.linalg.norm(noise)
+    return list(similarity * base + np.sqrt(1 - similarity**2) * noise)
+
+
+BASE = np.eye(64)[0]
+
+
+def test_near_miss_questions_do_not_collide():
+    cache = SemanticAnswerCache(max_size=8, threshold=0.95)
+    cache.store(list(BASE), result("What is the Part A deductible?"), 1, 10, 3)
+
+    # Embeds almost identically, but asks about another plan
+    other_plan = "What is the Part B deductible?"
+    assert cache.lookup(nearby(BASE, 1, 0.99), 1, 10, 3, query=other_plan) is None
+    other_year = "What was the Part A deductible in 2023?"
+    assert cache.lookup(nearby(BASE, 2, 0.99), 1, 10, 3, query=other_year) is None
+
+
+def test_rephrased_question_hits():
+    cache = SemanticAnswerCache(max_size=8, threshold=0.95)
+    cache.store(list(BASE), result("What is the Part A deductible?"), 1, 10, 3)
+
+    rephrased = "what's the Part A deductible"
+    hit = cache.lookup(nearby(BASE, 3, 0.99), 1, 10, 3, query=rephrased)
+    assert hit is not None and hit.query_text == "What is the Part A deductible?"
+
+
+def test_most_similar_matching_entry_wins():
+    cache = SemanticAnswerCache(max_size=8, threshold=0.95)
+    cache.store(list(BASE), result("What is the Part B deductible?"), 1, 10, 3)
+    part_a = result("What is the Part A deductible?")
+    cache.store(nearby(BASE, 4, 0.97), part_a, 1, 10, 3)
+
+    hit = cache.lookup(list(BASE), 1, 10, 3, query="What is the Part A deductible?")
+    assert hit.query_text == "What is the Part A deductible?"
+
+
+def test_version_change_and_params_miss():
+    cache = SemanticAnswerCache(max_size=8, threshold=0.95)
+    cache.store(list(BASE), result("What is the Part A deductible?"), 1, 10, 3)
+
+    assert cache.lookup(list(BASE), 1, 10, 5) is None
+    assert cache.lookup(list(BASE), 2, 10, 3) is None
+
+
+def test_question_entities():
+    assert question_entities("What is the Part A deductible?") != question_entities(
+        "What is the Part B deductible?"
+    )
+    assert "2024" in question_entities("Is Medigap covered in 2024?")
+    # The article is not an entity
+    assert "a" not in question_entities("Is a referral needed?")
+
+
+def test_question_entities_ignore_position_and_the_pronoun():
+    # Paraphrases from the request: same program, different word order
+    assert question_entities(
+        "Can I see any doctor with Original Medicare?"
+    ) == question_entities("Does Original Medicare let me pick any doctor?")
+    assert question_entities("medigap plan g premiums") == question_entities(
+        "What do Medigap Plan G premiums cost?"
+    )
+    assert "i" not in question_entities("What if I'm on Medicaid?")
+
+
+def test_question_entities_tell_products_and_letters_apart():
+    assert question_entities("Medigap Plan G cost?") != question_entities(
+        "Medicare Plan G cost?"
+    )
+    # Part A is hospital insurance; Plan A is a Medigap policy
+    assert question_entities("Part A cost?") != question_entities("Plan A cost?")
@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.services.batch import BatchProcessingService
+
+
+@pytest.fixture
+def batch(stub_service, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_OUTPUT_DIR", str(tmp_path / "output"))
+    return BatchProcessingService(stub_service, concurrency=2)
+
+
+def write_queries(tmp_path, count):
+    path = tmp_path / "queries.jsonl"
+    queries = [
+        {"id": f"Q{i}", "text": f"Does Part B cover service {i}?"} for i in range(count)
+    ]
+    path.write_text("".join(json.dumps(query) + "\n" for query in queries))
+    return str(path)
+
+
+def read_answers(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_resume_answers_only_queries_without_a_successful_answer(batch, tmp_path):
+    queries_path = write_queries(tmp_path, 4)
+    answers_path = tmp_path / "output" / "answers.jsonl"
+    answers_path.parent.mkdir()
+    answered = {"query_text": "", "source_chunks": [], "source_text": []}
+    answers_path.write_text(
+        json.dumps({**answered, "query_id": "Q0", "answer": "Yes."})
+        + "\n"
+        + json.dumps({**answered, "query_id": "Q1", "answer": "Error: 429"})
+        + "\n"
+        # A crash mid-write leaves a truncated last line
+        + '{"query_id": "Q2", "ans'
+    )
+
+    summary = asyncio.run(batch.process_batch(queries_path))
+
+    assert summary["answers_path"] == str(answers_path)
+    assert (summary["skipped_count"], summary["processed_count"]) == (1, 3)
+    lines = answers_path.read_text().splitlines()
+    # New records start on a fresh line after the truncated one
+    assert lines[2] == '{"query_id": "Q2", "ans'
+    answered_now = sorted(json.loads(line)["query_id"] for line in lines[3:])
+    assert answered_now == ["Q1", "Q2", "Q3"]
+
+
+def test_without_resume_the_answers_file_starts_over(batch, tmp_path):
+    queries_path = write_queries(tmp_path, 3)
+    asyncio.run(batch.process_batch(queries_path, "run.jsonl"))
+
+    summary = asyncio.run(batch.process_batch(queries_path, "run.jsonl", resume=False))
+
+    assert (summary["skipped_count"], summary["processed_count"]) == (0, 3)
+    answers = read_answers(tmp_path / "output" / "run.jsonl")
+    assert sorted(r["query_id"] for r in answers) == ["Q0", "Q1", "Q2"]
+
+
+@pytest.mark.parametrize(
+    "answers_path",
+    ["../escape.jsonl", "/tmp/escape.jsonl", "nested/../../escape.jsonl", "."],
+)
+def test_answers_path_outside_the_output_directory_is_rejected(
+    batch, tmp_path, answers_path
+):
+    queries_path = write_queries(tmp_path, 1)
+    with pytest.raises(ValueError, match="inside"):
+        asyncio.run(batch.process_batch(queries_path, answers_path))
+
+
+def test_producer_failure_stops_the_workers(batch, tmp_path, monkeypatch):
+    class Unreadable(dict):
+        def get(self, key, default=None):
+            if key == "text":
+                raise RuntimeError("unreadable query")
+            return super().get(key, default)
+
+    monkeypatch.setattr(
+        BatchProcessingService, "_load_queries", staticmethod(lambda _: [Unreadable()])
+    )
+
+    async def run_batch():
+        with pytest.raises(RuntimeError, match="unreadable query"):
+            await batch.process_batch("queries.jsonl")
+        # The API's event loop outlives the request; no worker may be left behind
+        return asyncio.all_tasks() - {asyncio.current_task()}
+
+    assert asyncio.run(run_batch()) == set()
@@ -0,0 +1,110 @@
+import threading
+
+import pytest
+
+from app.services.bulk_writer import BulkWriter
+
+
+class FakeCollection:
+    """Records the size of every write; can fail or block on demand."""
+
+    def __init__(self, fail_on: int = 0):
+        self.writes = []
+        self.methods = set()
+        self.fail_on = fail_on
+        self.release = threading.Event()
+        self.release.set()
+
+    def _write(self, method, ids, embeddings, documents, metadatas):
+        self.release.wait()
+        assert len(ids) == len(embeddings) == len(documents) == len(metadatas)
+        self.methods.add(method)
+        self.writes.append(list(ids))
+        if len(self.writes) == self.fail_on:
+            raise RuntimeError("disk full")
+
+    def upsert(self, **batch):
+        self._write("upsert", **batch)
+
+    def add(self, **batch):
+        self._write("add", **batch)
+
+
+class FakeClient:
+    def get_max_batch_size(self):
+        return 4
+
+
+def records(start: int, count: int):
+    ids = [f"c{i}" for i in range(start, start + count)]
+    return ids, [[float(i)] for i in range(count)], ids, [{"i": i} for i in ids]
+
+
+def test_writes_full_batches_then_the_remainder():
+    collection = FakeCollection()
+    progress = []
+    with BulkWriter(collection, batch_size=3, progress=progress.append) as writer:
+        writer.add(*records(0, 5))
+        writer.add(*records(5, 2))
+
+    assert [len(batch) for batch in collection.writes] == [3, 3, 1]
+    assert [i for batch in collection.writes for i in batch] == [
+        f"c{i}" for i in range(7)
+    ]
+    assert progress == [3, 6, 7]
+    assert (writer.written, writer.batches) == (7, 3)
+    assert collection.methods == {"upsert"}
+
+
+def test_batch_size_is_capped_by_the_client_and_fast_load_uses_add():
+    collection = FakeCollection()
+    with BulkWriter(
+        collection, client=FakeClient(), batch_size=100, fast_load=True
+    ) as writer:
+        writer.add(*records(0, 10))
+
+    assert writer.batch_size == 4
+    assert [len(batch) for batch in collection.writes] == [4, 4, 2]
+    assert collection.methods == {"add"}
+
+
+def test_add_blocks_once_max_pending_batches_wait():
+    collection = FakeCollection()
+    collection.release.clear()
+    writer = BulkWriter(collection, batch_size=1, max_pending=1)
+
+    feeder = threading.Thread(target=writer.add, args=records(0, 4))
+    feeder.start()
+    feeder.join(timeout=0.2)
+    # One batch being written, one queued: the feeder waits for the writer
+    assert feeder.is_alive()
+
+    collection.release.set()
+    feeder.join()
+    writer.close()
+    assert writer.written == 4
+
+
+def test_write_error_is_raised_and_later_batches_are_dropped():
+    collection = FakeCollection(fail_on=1)
+    writer = BulkWriter(collection, batch_size=2)
+
+    # Raised by whichever call notices first
+    with pytest.raises(RuntimeError, match="disk full"):
+        writer.add(*records(0, 6))
+        writer.close()
+    writer.abort()
+    assert writer.written == 0
+    assert len(collection.writes) == 1
+
+
+def test_abort_discards_buffered_records():
+    collection = FakeCollection()
+    with pytest.raises(KeyError):
+        with BulkWriter(collection, batch_size=10) as writer:
+            writer.add(*records(0, 3))
+            raise KeyError("caller failed")
+
+    assert collection.writes == []
+    with pytest.raises(ValueError, match="closed"):
+        writer.add(*records(3, 1))
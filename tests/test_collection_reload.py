@@ -0,0 +1,30 @@
+import asyncio
+import threading
+
+from app.core.config import settings
+from app.services.collections import CollectionPointer
+
+
+def test_concurrent_requests_reload_a_promoted_version_once(stub_service):
+    registry = stub_service.collection_registry
+    alias = settings.CHROMA_COLLECTION_NAME
+    registry.promote(alias, CollectionPointer(registry.versioned_name(alias, 2), 2))
+
+    opened = []
+    get_collection = stub_service.chroma_client.get_collection
+
+    def counting_get_collection(name):
+        opened.append((name, threading.current_thread()))
+        return get_collection(name)
+
+    stub_service.chroma_client.get_collection = counting_get_collection
+
+    async def requests():
+        await asyncio.gather(*(stub_service.arefresh_collection() for _ in range(20)))
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(requests())
+    assert stub_service.collection_version == 2
+    assert [name for name, _ in opened] == [f"{alias}__v2"]
+    # Opened off the event loop
+    assert opened[0][1] is not loop_thread
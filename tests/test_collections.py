@@ -0,0 +1,108 @@
+import json
+import multiprocessing
+from types import SimpleNamespace
+
+from app.services.collections import CollectionPointer, CollectionRegistry
+
+
+class FakeChroma:
+    def __init__(self, *names):
+        self.names = set(names)
+
+    def list_collections(self):
+        return [SimpleNamespace(name=name) for name in sorted(self.names)]
+
+    def delete_collection(self, name):
+        self.names.remove(name)
+
+
+def promote(registry, alias, version):
+    name = registry.versioned_name(alias, version)
+    pointer = CollectionPointer(name, version, f"f{version}")
+    registry.promote(alias, pointer)
+    return pointer
+
+
+def test_unpromoted_alias_resolves_to_the_plain_collection(tmp_path):
+    registry = CollectionRegistry(str(tmp_path))
+    assert registry.active("docs") is None
+    assert registry.resolve("docs") == CollectionPointer("docs", 0)
+    assert registry.aliases() == []
+
+
+def test_promotion_is_seen_by_other_registries(tmp_path):
+    registry = CollectionRegistry(str(tmp_path))
+    pointer = promote(registry, "docs", 1)
+    assert registry.resolve("docs") == pointer == ("docs__v1", 1, "f1")
+    # Another process reads the pointer file
+    other = CollectionRegistry(str(tmp_path))
+    assert other.resolve("docs") == pointer
+    promote(registry, "docs", 2)
+    assert other.resolve("docs").version == 2
+    assert other.aliases() == ["docs"]
+
+
+def test_next_version_skips_existing_shadow_collections(tmp_path):
+    registry = CollectionRegistry(str(tmp_path))
+    promote(registry, "docs", 1)
+    # A crashed ingest left v3 behind; other aliases don't count
+    client = FakeChroma("docs__v1", "docs__v3", "other__v9")
+    assert registry.next_version("docs", client) == ("docs__v4", 4, None)
+
+
+def test_retired_versions_are_collected_after_the_grace_period(tmp_path):
+    registry = CollectionRegistry(str(tmp_path))
+    client = FakeChroma("docs", "docs__v1", "docs__v2", "docs__v3")
+    for version in (1, 2, 3):
+        promote(registry, "docs", version)
+
+    assert registry.collect_garbage("docs", client, grace_seconds=3600) == []
+    deleted = registry.collect_garbage("docs", client, grace_seconds=0)
+    assert deleted == ["docs", "docs__v1", "docs__v2"]
+    assert client.names == {"docs__v3"}
+    # Nothing left to collect; the active version is never retired
+    assert registry.collect_garbage("docs", client, grace_seconds=0) == []
+    assert registry.resolve("docs").name == "docs__v3"
+
+
+def _allocate(db_path, results):
+    results.put(CollectionRegistry(db_path).next_version("docs", FakeChroma()).version)
+
+
+def _promote(db_path, version):
+    promote(CollectionRegistry(db_path), "docs", version)
+
+
+def test_processes_never_share_a_version_or_lose_a_retirement(tmp_path):
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [
+        context.Process(target=_allocate, args=(str(tmp_path), results))
+        for _ in range(8)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert sorted(results.get() for _ in workers) == list(range(1, 9))
+
+    workers = [
+        context.Process(target=_promote, args=(str(tmp_path), version))
+        for version in range(1, 9)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    entry = json.loads((tmp_path / CollectionRegistry.FILENAME).read_text())["docs"]
+    # Older versions promoted after a newer one are refused; nothing is retired twice
+    assert entry["active"] == "docs__v8"
+    names = [retired["name"] for retired in entry["retired"]]
+    assert len(names) == len(set(names)) and "docs__v8" not in names
+
+
+def test_a_stale_promotion_is_refused(tmp_path):
+    registry = CollectionRegistry(str(tmp_path))
+    promote(registry, "docs", 3)
+    assert not registry.promote("docs", CollectionPointer("docs__v2", 2))
+    assert registry.resolve("docs").name == "docs__v3"
@@ -0,0 +1,35 @@
+from app.services.context import ContextAssembler
+from app.services.query import Generation, QueryService
+
+CHUNK = "Part B covers:\n- flu shots.\n- x-rays. Also labs.\n\n| Item | Cost |\n| Visit | $20 |"
+
+
+def test_untrimmed_chunk_keeps_its_layout():
+    context = ContextAssembler(max_tokens=0).assemble("q", [CHUNK], ["c1"])
+    assert context.text == CHUNK
+
+
+def test_trimmed_chunk_keeps_line_and_sentence_separators():
+    assembler = ContextAssembler(max_tokens=22)
+    context = assembler.assemble(
+        "what does a visit cost, and are labs covered", [CHUNK], ["c1"]
+    )
+    assert context.trimmed_sentences == 3
+    assert context.text == "Also labs.\n\n| Item | Cost |\n| Visit | $20 |"
+
+
+def test_repeated_sentences_are_dropped_without_flattening_lines():
+    later = "Deductibles apply.\n- flu shots.\n- vaccines."
+    assembler = ContextAssembler(max_tokens=0)
+    context = assembler.assemble("q", [CHUNK, later], ["c1", "c2"])
+    assert context.documents[1] == "Deductibles apply.\n- vaccines."
+
+
+def test_results_keep_the_full_source_text_beside_the_trimmed_context():
+    assembler = ContextAssembler(max_tokens=22)
+    context = assembler.assemble(
+        "what does a visit cost, and are labs covered", [CHUNK], ["c1"]
+    )
+    result = QueryService._result("Q1", "q", Generation("A."), context)
+    assert result.source_text == [CHUNK]
+    assert result.context_text == [context.text]
@@ -0,0 +1,61 @@
+import pytest
+
+from app.services import cache as cache_module
+from app.services.cache import EmbeddingCache, SQLiteEmbeddingStore
+from app.services.embeddings import HashingEmbedder
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / "cache" / "embeddings.sqlite")
+    store = SQLiteEmbeddingStore(path)
+    EmbeddingCache(max_size=10, disk_store=store).put("Part B?", "m1", [0.5, 0.25])
+    store.close()
+
+    restarted = EmbeddingCache(max_size=10, disk_store=SQLiteEmbeddingStore(path))
+    assert restarted.get("  part b? ", "m1") == [0.5, 0.25]
+    assert restarted.get("Part B?", "m1") == [0.5, 0.25]
+    assert (restarted.disk_hits, restarted.hits, restarted.misses) == (1, 1, 0)
+    # Another model never sees these vectors
+    assert restarted.get("Part B?", "m2") is None
+
+
+def test_disk_entries_expire(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    store = SQLiteEmbeddingStore(str(tmp_path / "e.sqlite"), ttl_seconds=60)
+    store.put(("m1", "part b?"), [1.0])
+
+    now[0] += 59
+    assert store.get(("m1", "part b?")) == [1.0]
+    now[0] += 2
+    assert store.get(("m1", "part b?")) is None
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = EmbeddingCache(max_size=2)
+    cache.put("a", "m", [1.0])
+    cache.put("b", "m", [2.0])
+    cache.get("a", "m")
+    cache.put("c", "m", [3.0])
+
+    assert cache.get("b", "m") is None
+    assert cache.get("a", "m") == [1.0]
+    assert cache.evictions == 1
+
+
+def test_embedder_serves_repeated_queries_from_the_cache(tmp_path, monkeypatch):
+    store = SQLiteEmbeddingStore(str(tmp_path / "e.sqlite"))
+    embedder = HashingEmbedder(16, cache=EmbeddingCache(max_size=10, disk_store=store))
+    calls = []
+    embed_batch = embedder._embed_batch
+
+    def counting_embed_batch(texts, input_type):
+        calls.append(list(texts))
+        return embed_batch(texts, input_type)
+
+    monkeypatch.setattr(embedder, "_embed_batch", counting_embed_batch)
+    first = embedder.embed(["Does Part B cover labs?", "Part D?"], input_type="query")
+    again = embedder.embed(["does part b cover labs?", "Medigap?"], input_type="query")
+
+    assert calls == [["Does Part B cover labs?", "Part D?"], ["Medigap?"]]
+    assert again[0] == pytest.approx(first[0])
@@ -0,0 +1,51 @@
+import asyncio
+
+from app.core.config import settings
+from app.services.collections import CollectionPointer, content_fingerprint
+from app.services.eval_cache import EvaluationCache
+from app.services.evaluation_runner import EvalCase, EvaluationRunner
+
+
+def test_content_fingerprint_ignores_order_but_not_contents():
+    assert content_fingerprint(["b", "a"]) == content_fingerprint(["a", "b"])
+    assert content_fingerprint(["a", "b"]) != content_fingerprint(["a", "c"])
+    assert content_fingerprint(["ab"]) != content_fingerprint(["a", "b"])
+
+
+def test_answer_key_covers_question_contents_model_and_prompt():
+    key = EvaluationCache.answer_key("What is Part B?", "f1", "gemini", "p1")
+    assert key == EvaluationCache.answer_key("  what is part b? ", "f1", "gemini", "p1")
+    for other in (
+        EvaluationCache.answer_key("What is Part D?", "f1", "gemini", "p1"),
+        EvaluationCache.answer_key("What is Part B?", "f2", "gemini", "p1"),
+        EvaluationCache.answer_key("What is Part B?", "f1", "gemini-pro", "p1"),
+        EvaluationCache.answer_key("What is Part B?", "f1", "gemini", "p2"),
+    ):
+        assert other != key
+
+
+def test_verdict_key_covers_metric_test_case_and_judge():
+    case = EvaluationCache.test_case_hash("Q", "A", retrieval_context=["c"])
+    key = EvaluationCache.verdict_key("Faithfulness(threshold=0.7)", case, "judge")
+    assert key != EvaluationCache.verdict_key("Faithfulness(threshold=0.8)", case, "judge")
+    assert key != EvaluationCache.verdict_key("Faithfulness(threshold=0.7)", case, "other")
+    other_case = EvaluationCache.test_case_hash("Q", "A", retrieval_context=["d"])
+    assert key != EvaluationCache.verdict_key("Faithfulness(threshold=0.7)", other_case, "judge")
+
+
+def test_answers_follow_collection_contents_not_version_numbers(stub_service, tmp_path):
+    registry = stub_service.collection_registry
+    cache = EvaluationCache(str(tmp_path / "eval_cache.db"))
+    alias = settings.CHROMA_COLLECTION_NAME
+    cases = [EvalCase(input="Does Part B cover flu shots?")]
+
+    def answer_cache_hits(version: int, fingerprint: str) -> int:
+        name = registry.versioned_name(alias, version)
+        registry.promote(alias, CollectionPointer(name, version, fingerprint))
+        runner = EvaluationRunner(stub_service, lambda: [], cache=cache)
+        return asyncio.run(runner.run(cases))["cache_hits"]["answer"]
+
+    assert answer_cache_hits(1, "chunks-a") == 0
+    # Re-ingesting the same chunks keeps the answers
+    assert answer_cache_hits(2, "chunks-a") == 1
+    assert answer_cache_hits(3, "chunks-b") == 0
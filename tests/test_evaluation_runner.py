@@ -0,0 +1,130 @@
+import asyncio
+import json
+
+from app.services.evaluation_runner import EvalCase, EvaluationRunner
+
+
+class StubMetric:
+    """Scores every case 1.0, or raises while ``failures`` remain."""
+
+    def __init__(self, failures: int = 0):
+        self.threshold = 0.5
+        self.evaluation_model = "stub-judge"
+        self.failures = failures
+        self.measured = 0
+        self.score = self.success = self.reason = None
+
+    async def a_measure(self, test_case, _show_indicator=False):
+        self.measured += 1
+        if self.failures:
+            self.failures -= 1
+            raise ValueError("judge returned invalid JSON")
+        self.score, self.success, self.reason = 1.0, True, "ok"
+
+
+class Relevancy(StubMetric):
+    pass
+
+
+class Faithfulness(StubMetric):
+    pass
+
+
+def test_errored_metric_is_rejudged_on_resume(stub_service, tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.jsonl")
+    cases = [EvalCase(input="Does Part B cover flu shots?")]
+    made = []
+
+    def metrics(flaky: bool):
+        def factory():
+            made.append([Relevancy(), Faithfulness(failures=int(flaky))])
+            return made[-1]
+
+        return factory
+
+    first = asyncio.run(
+        EvaluationRunner(
+            stub_service, metrics(True), checkpoint_path=checkpoint
+        ).run(cases)
+    )
+    assert (first["judged_count"], first["partial_count"]) == (0, 1)
+    assert first["metrics"]["Faithfulness"] == {
+        "mean_score": None, "pass_rate": None, "count": 0, "errors": 1
+    }
+    with open(checkpoint) as f:
+        assert json.loads(f.readlines()[-1])["status"] == "partial"
+
+    second = asyncio.run(
+        EvaluationRunner(
+            stub_service, metrics(False), checkpoint_path=checkpoint
+        ).run(cases)
+    )
+    assert (second["judged_count"], second["partial_count"]) == (1, 0)
+    assert second["metrics"]["Faithfulness"]["mean_score"] == 1.0
+    # Only the errored metric was measured again
+    relevancy, faithfulness = made[-1]
+    assert (relevancy.measured, faithfulness.measured) == (0, 1)
+    names = [m["name"] for m in second["results"][0]["metrics"]]
+    assert names == ["Relevancy", "Faithfulness"]
+
+
+def test_resume_skips_judged_cases_and_judges_answered_ones(stub_service, tmp_path):
+    checkpoint = tmp_path / "checkpoint.jsonl"
+    model = stub_service.generator.model_name
+    cases = [EvalCase(input=f"Does Part B cover service {i}?") for i in range(4)]
+
+    def record(case, status, **fields):
+        return {
+            "case_id": case.case_id,
+            "input": case.input,
+            "expected_output": None,
+            "context": None,
+            "model": model,
+            "status": status,
+            **fields,
+        }
+
+    answered = {"retrieval_context": ["c"]}
+    lines = [
+        # Judged, answered only, failed, and answered by another model
+        record(
+            cases[0],
+            "judged",
+            actual_output="Yes.",
+            metrics=[{"name": "Relevancy", "score": 0.5, "success": True}],
+            **answered,
+        ),
+        record(cases[1], "answered", actual_output="No.", **answered),
+        record(cases[2], "failed", error="429"),
+        record(
+            cases[3],
+            "answered",
+            actual_output="Maybe.",
+            model="other-model",
+            **answered,
+        ),
+    ]
+    # A run killed mid-write leaves a truncated last line
+    text = "".join(json.dumps(line) + "\n" for line in lines)
+    checkpoint.write_text(text + '{"case_')
+
+    asked = []
+    aanswer_question = stub_service.aanswer_question
+
+    async def counting_answer(query, **kwargs):
+        asked.append(query)
+        return await aanswer_question(query, **kwargs)
+
+    stub_service.aanswer_question = counting_answer
+    runner = EvaluationRunner(
+        stub_service, lambda: [Relevancy()], checkpoint_path=str(checkpoint)
+    )
+    summary = asyncio.run(runner.run(cases))
+
+    assert summary["resumed_count"] == 2
+    assert summary["judged_count"] == 4
+    assert sorted(asked) == [cases[2].input, cases[3].input]
+    results = {r["case_id"]: r for r in summary["results"]}
+    assert results[cases[0].case_id]["metrics"][0]["score"] == 0.5
+    assert results[cases[1].case_id]["actual_output"] == "No."
+    assert results[cases[1].case_id]["metrics"][0]["score"] == 1.0
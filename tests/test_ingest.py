@@ -0,0 +1,146 @@
+import chromadb
+import pytest
+
+from app.core.config import settings
+from app.services.collections import CollectionRegistry
+from app.services.embeddings import HashingEmbedder
+from app.services.ingest import IngestService, SourceDocument
+
+TOPICS = [
+    "Part A covers inpatient hospital stays and skilled nursing care.",
+    "Part B covers doctor visits, lab tests and outpatient care.",
+    "Part D covers prescription drugs through private plans.",
+    "Medigap policies help pay deductibles and coinsurance.",
+]
+
+
+def write_document(directory, name: str, seed: int):
+    """A few paragraphs on different topics, so the chunker finds breaks."""
+    paragraphs = [
+        " ".join(f"{TOPICS[(seed + p) % 4]} Detail {seed}.{p}.{s}." for s in range(4))
+        for p in range(3)
+    ]
+    path = directory / name
+    path.write_text("\n\n".join(paragraphs))
+    return SourceDocument(str(path), source=name)
+
+
+@pytest.fixture
+def ingest_service(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path / "db"))
+    return IngestService(
+        voyage_client=object(),
+        chroma_client=client,
+        collection_registry=CollectionRegistry(str(tmp_path / "db")),
+        embedder=HashingEmbedder(64),
+    )
+
+
+def active_collection(service):
+    pointer = service.collection_registry.active(settings.CHROMA_COLLECTION_NAME)
+    return service.chroma_client.get_collection(pointer.name)
+
+
+def test_threaded_ingest_stores_every_chunk_of_every_document(ingest_service, tmp_path):
+    documents = [write_document(tmp_path, f"doc{i}.md", i) for i in range(12)]
+
+    result = ingest_service.ingest_documents(
+        documents,
+        read_workers=3,
+        chunk_workers=3,
+        embed_workers=3,
+        queue_size=2,
+        write_batch_size=5,
+    )
+
+    assert result["status"] == "success"
+    assert result["version"] == 1
+    collection = active_collection(ingest_service)
+    assert collection.count() == result["chunk_count"] == result["added_count"]
+    stored = collection.get(include=["metadatas"])["metadatas"]
+    assert {m["source"] for m in stored} == {d.source for d in documents}
+
+
+def test_failing_document_is_reported_and_the_rest_are_ingested(
+    ingest_service, tmp_path
+):
+    documents = [write_document(tmp_path, f"doc{i}.md", i) for i in range(3)]
+    documents.append(SourceDocument(str(tmp_path / "missing.md")))
+
+    result = ingest_service.ingest_documents(documents, read_workers=2)
+
+    assert result["status"] == "partial"
+    assert [f["source"] for f in result["documents_failed"]] == ["missing.md"]
+    stored = active_collection(ingest_service).get(include=["metadatas"])
+    sources = {m["source"] for m in stored["metadatas"]}
+    assert sources == {"doc0.md", "doc1.md", "doc2.md"}
+
+
+def test_fail_fast_aborts_without_promoting(ingest_service, tmp_path):
+    documents = [write_document(tmp_path, "doc0.md", 0)]
+    documents.append(SourceDocument(str(tmp_path / "missing.md")))
+
+    with pytest.raises(FileNotFoundError):
+        ingest_service.ingest_documents(documents, fail_fast=True)
+
+    registry = ingest_service.collection_registry
+    assert registry.active(settings.CHROMA_COLLECTION_NAME) is None
+    # The shadow collection was dropped
+    assert ingest_service.chroma_client.list_collections() == []
+
+
+def stored(service):
+    page = active_collection(service).get(include=["embeddings", "metadatas"])
+    return {
+        record_id: (list(embedding), metadata)
+        for record_id, embedding, metadata in zip(
+            page["ids"], page["embeddings"], page["metadatas"], strict=True
+        )
+    }
+
+
+def test_reingest_copies_unchanged_chunks_forward(
+    ingest_service, tmp_path, monkeypatch
+):
+    documents = [write_document(tmp_path, f"doc{i}.md", i) for i in range(3)]
+    ingest_service.ingest_documents(documents)
+    before = stored(ingest_service)
+
+    # Nothing changed: the active version keeps serving
+    unchanged = ingest_service.ingest_documents(documents)
+    assert unchanged["version"] == 1
+    assert unchanged["documents_unchanged"] == 3
+
+    # Edit one paragraph of doc1; list only doc1, so the others are carried over
+    path = tmp_path / "doc1.md"
+    paragraphs = path.read_text().split("\n\n")
+    paragraphs[-1] = "Dental care is not covered. Hearing aids are not covered."
+    path.write_text("\n\n".join(paragraphs))
+    embedded = []
+    embed_batch = ingest_service.embedder._embed_batch
+
+    def recording_embed_batch(texts, input_type):
+        embedded.extend(texts)
+        return embed_batch(texts, input_type)
+
+    monkeypatch.setattr(ingest_service.embedder, "_embed_batch", recording_embed_batch)
+    result = ingest_service.ingest_documents([documents[1]])
+
+    assert result["version"] == 2
+    after = stored(ingest_service)
+    doc1_before = {i for i, (_, m) in before.items() if m["source"] == "doc1.md"}
+    doc1_after = {i for i, (_, m) in after.items() if m["source"] == "doc1.md"}
+    assert result["added_count"] == len(doc1_after - doc1_before) > 0
+    assert result["deleted_count"] == len(doc1_before - doc1_after) > 0
+    assert result["unchanged_count"] == len(doc1_before & doc1_after)
+    # Other documents' chunks are copied with their vectors, not re-embedded
+    others = ("Detail 0.", "Detail 2.")
+    assert embedded
+    assert not [text for text in embedded if any(o in text for o in others)]
+    for record_id, (embedding, metadata) in before.items():
+        if metadata["source"] != "doc1.md":
+            assert after[record_id][0] == pytest.approx(embedding)
+    # Surviving chunks of the edited document carry its new hash
+    new_hash = {after[i][1]["doc_hash"] for i in doc1_after}
+    assert len(new_hash) == 1
+    assert new_hash != {before[i][1]["doc_hash"] for i in doc1_before}
@@ -0,0 +1,22 @@
+import asyncio
+
+from app.services.evaluation import GeminiGenAI
+from scripts.stub_backends import Latency, StubGenAIClient
+
+
+def test_judge_bounds_calls_in_flight_on_every_event_loop():
+    client = StubGenAIClient(Latency(generate=0.01))
+    judge = GeminiGenAI(
+        model_name="stub-judge", api_key="stub", client=client, max_concurrency=2
+    )
+
+    async def judge_many():
+        prompts = [f"Prompt {i}" for i in range(6)]
+        return await asyncio.gather(*(judge.a_generate(prompt) for prompt in prompts))
+
+    # One asyncio.run per script invocation or test; the judge outlives each loop
+    for _ in range(2):
+        answers = asyncio.run(judge_many())
+        assert all(isinstance(a, str) and not a.startswith("Error") for a in answers)
+    assert client.tracker.calls == 12
+    assert client.tracker.peak == 2
@@ -0,0 +1,57 @@
+import pytest
+
+from app.services.lexical import LexicalIndex, index_path, reciprocal_rank_fusion
+from app.services.reranking import BM25Reranker
+
+
+def test_rrf_rewards_ids_ranked_well_by_both_lists():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d", "a"]], k=60)
+    assert [item for item, _ in fused] == ["b", "a", "d", "c"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_rrf_k_flattens_the_rank_curve():
+    steep = dict(reciprocal_rank_fusion([["a", "b"]], k=0))
+    flat = dict(reciprocal_rank_fusion([["a", "b"]], k=1000))
+    assert steep["a"] / steep["b"] > flat["a"] / flat["b"]
+
+
+def test_rrf_of_nothing_is_empty():
+    assert reciprocal_rank_fusion([[], []]) == []
+
+
+def test_bm25_index_finds_exact_terms_and_survives_a_reload(tmp_path):
+    index = LexicalIndex.build(
+        ["c1", "c2", "c3"],
+        [
+            "Part D covers prescription drugs.",
+            "Part B covers outpatient care and the G0438 wellness visit.",
+            "Part A covers hospital stays.",
+        ],
+    )
+    assert [item for item, _ in index.search("G0438")] == ["c2"]
+    assert index.search("dental") == []
+
+    path = index_path("docs__v1", str(tmp_path))
+    index.save(path)
+    reloaded = LexicalIndex.open("docs__v1", str(tmp_path))
+    assert reloaded.search("hospital stays") == index.search("hospital stays")
+    assert LexicalIndex.open("docs__v2", str(tmp_path)) is None
+
+
+def test_decisive_margin_never_skips_reranking_fused_results():
+    reranker = BM25Reranker(decisive_margin=0.1)
+    documents = ["Part A covers hospital stays.", "Part D covers drugs.", "Dental."]
+    ids = ["a", "d", "x"]
+    distances = [0.1, 0.2, 0.9]
+
+    # A wide vector-distance gap after the top-k skips reranking...
+    _, reranked = reranker.rerank("drugs", documents, ids, 2, distances=distances)
+    assert reranked == ["a", "d"]
+    assert reranker.skipped == 1
+    # ...but the same gap in fused rank scores does not
+    _, reranked = reranker.rerank(
+        "drugs", documents, ids, 2, distances=distances, fused=True
+    )
+    assert reranked == ["d", "a"]
+    assert reranker.skipped == 1
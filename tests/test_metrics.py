@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from app.core.metrics import ERRORS, STAGE_SECONDS, Histogram, MetricsRegistry
+
+
+def test_small_values_are_exact():
+    histogram = Histogram(resolution=1, significant_bits=7)
+    for value in range(1, 101):
+        histogram.record(value)
+    assert histogram.quantile(0.5) == 50
+    assert histogram.quantile(0.99) == 99
+    assert histogram.quantile(1.0) == 100
+
+
+@pytest.mark.parametrize("q", [0.5, 0.9, 0.95, 0.99])
+def test_quantiles_are_within_the_relative_error_bound(q):
+    values = np.random.default_rng(7).lognormal(mean=-3, sigma=1.5, size=20000)
+    histogram = Histogram()
+    for value in values:
+        histogram.record(float(value))
+    exact = np.quantile(values, q, method="inverted_cdf")
+    assert histogram.quantile(q) == pytest.approx(exact, rel=0.016)
+
+
+def test_quantile_never_exceeds_the_max_and_empty_is_zero():
+    histogram = Histogram()
+    assert histogram.quantile(0.5) == 0.0
+    histogram.record(0.123456)
+    assert histogram.quantile(0.99) <= histogram.max == 0.123456
+
+
+def test_registry_tracks_stages_and_errors():
+    registry = MetricsRegistry()
+    with registry.track("embed"):
+        pass
+    with pytest.raises(RuntimeError):
+        with registry.track("embed"):
+            raise RuntimeError("boom")
+    assert registry.histogram(STAGE_SECONDS, stage="embed").count == 2
+    assert registry.counter(ERRORS, stage="embed") == 1
+    quantile = 'rag_stage_duration_seconds{stage="embed",quantile="0.99"}'
+    assert quantile in registry.render()
+    assert registry.stage_summary()["embed"]["count"] == 2
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    registry.observe(STAGE_SECONDS, 1.0, stage="embed")
+    assert registry.histogram(STAGE_SECONDS, stage="embed") is None
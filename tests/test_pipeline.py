@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from app.services.pipeline import Stage, run_pipeline
+
+
+def test_items_flow_through_every_stage():
+    out = []
+    lock = threading.Lock()
+
+    def collect(item):
+        with lock:
+            out.append(item)
+
+    run_pipeline(
+        range(20),
+        [
+            # Drops odd numbers
+            Stage("even", lambda n: n if n % 2 == 0 else None, workers=3),
+            Stage("split", lambda n: [n, n + 1], workers=2, fan_out=True),
+            Stage("collect", collect),
+        ],
+        queue_size=2,
+    )
+
+    assert sorted(out) == list(range(20))
+
+
+def test_stage_error_stops_the_pipeline_and_is_reraised():
+    fed = []
+
+    def items():
+        for n in range(10_000):
+            fed.append(n)
+            yield n
+
+    def fail_on_five(n):
+        if n == 5:
+            raise ValueError("bad item")
+        return n
+
+    with pytest.raises(ValueError, match="bad item"):
+        run_pipeline(
+            items(), [Stage("check", fail_on_five), Stage("sink", lambda n: None)], 2
+        )
+    # Bounded queues mean the feed stops soon after the failure
+    assert len(fed) < 100
+
+
+def test_input_error_is_reraised():
+    def items():
+        yield 1
+        raise OSError("unreadable")
+
+    with pytest.raises(OSError, match="unreadable"):
+        run_pipeline(items(), [Stage("sink", lambda n: None)])
+
+
+def test_stage_workers_run_concurrently():
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def slow(n):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+
+    run_pipeline(range(12), [Stage("slow", slow, workers=4)])
+
+    assert peak > 1
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from app.services import rate_limit
+from app.services.rate_limit import AsyncRateLimiter, is_quota_error, retry_on_quota
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_bucket_allows_a_burst_then_spaces_requests(clock):
+    limiter = AsyncRateLimiter(requests_per_minute=60, burst=3)
+    assert [limiter._reserve(1) for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Waiters queue up behind each other, one refill interval apart
+    assert limiter._reserve(1) == pytest.approx(1.0)
+    assert limiter._reserve(1) == pytest.approx(2.0)
+    assert limiter.waits == 2 and limiter.waited_seconds == pytest.approx(3.0)
+
+
+def test_bucket_refills_up_to_its_capacity(clock):
+    limiter = AsyncRateLimiter(requests_per_minute=120, burst=2)
+    limiter._reserve(2)
+    clock[0] += 0.5
+    assert limiter._reserve(1) == 0.0
+    clock[0] += 3600
+    assert [limiter._reserve(1) for _ in range(2)] == [0.0, 0.0]
+    assert limiter._reserve(1) == pytest.approx(0.5)
+
+
+def test_zero_rate_means_unlimited():
+    assert AsyncRateLimiter.per_minute(0) is None
+    with pytest.raises(ValueError):
+        AsyncRateLimiter(0)
+
+
+def test_quota_errors_are_recognized():
+    assert is_quota_error("429 RESOURCE_EXHAUSTED")
+    assert is_quota_error(RuntimeError("Rate limit reached"))
+    assert not is_quota_error(ValueError("Invalid JSON"))
+
+
+def test_retry_on_quota_retries_only_quota_errors():
+    calls = []
+    retried = []
+
+    def flaky(errors):
+        async def call():
+            calls.append(1)
+            if errors:
+                raise errors.pop(0)
+            return "ok"
+
+        return call
+
+    async def run(func, max_retries):
+        return await retry_on_quota(
+            func, max_retries, 0.001, on_retry=lambda e, delay: retried.append(delay)
+        )
+
+    assert asyncio.run(run(flaky([RuntimeError("429")] * 2), 3)) == "ok"
+    assert len(calls) == 3 and len(retried) == 2
+    with pytest.raises(RuntimeError):
+        asyncio.run(run(flaky([RuntimeError("429")] * 2), 1))
+    with pytest.raises(ValueError):
+        asyncio.run(run(flaky([ValueError("bad request")]), 3))
+    assert len(retried) == 3
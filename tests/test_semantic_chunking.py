@@ -0,0 +1,77 @@
+from typing import List
+
+import pytest
+
+from app.services.embeddings import Embedder, HashingEmbedder
+from app.services.semantic_chunking import MAX_SENTENCE_CHARS, SemanticChunker
+
+
+class ConstantEmbedder(Embedder):
+    """Every text gets the same vector, so no gap is ever a breakpoint."""
+
+    model = "constant"
+    dimension = 2
+
+    def _embed_batch(self, texts: List[str], input_type: str) -> List[List[float]]:
+        return [[1.0, 0.0] for _ in texts]
+
+
+def sentences(count: int) -> List[str]:
+    return [f"Sentence number {i} is here." for i in range(count)]
+
+
+def test_lone_sentence_after_a_segment_emitted_whole_is_its_own_chunk():
+    chunker = SemanticChunker(embedder=ConstantEmbedder(), segment_sentences=4)
+    text = " ".join(sentences(5))
+
+    chunks = chunker.split(text)
+
+    assert [(c.start_sentence, c.end_sentence) for c in chunks] == [(0, 4), (4, 5)]
+    assert chunks[1].text == "Sentence number 4 is here."
+    assert chunks[1].pooled_embedding() == [1.0, 0.0]
+
+
+@pytest.mark.parametrize("block_size", [7, 64, 1 << 20])
+@pytest.mark.parametrize("segment_sentences", [8, 64])
+def test_streamed_blocks_chunk_like_the_whole_document(
+    tmp_path, block_size, segment_sentences
+):
+    topics = ["Part A covers hospital stays.", "Medigap Plan G fills the gaps."]
+    text = " ".join(topics[i // 6 % 2] + f" Note {i}." for i in range(24))
+    path = tmp_path / "doc.txt"
+    path.write_text(text)
+    chunker = SemanticChunker(
+        embedder=HashingEmbedder(64), segment_sentences=segment_sentences
+    )
+
+    whole = [c.text for c in chunker.split(text)]
+    streamed = [c.text for c in chunker.chunk_file(str(path), block_size=block_size)]
+
+    assert len(whole) > 1
+    assert streamed == whole
+    assert " ".join(streamed) == text
+
+
+def test_line_breaks_end_sentences():
+    text = "Covered services:\n- Lab tests\n- X-rays\n\n| Plan | Cost |\n| G | $150 |"
+    assert list(SemanticChunker._iter_sentences([text])) == [
+        "Covered services:",
+        "- Lab tests",
+        "- X-rays",
+        "| Plan | Cost |",
+        "| G | $150 |",
+    ]
+
+
+def test_runs_without_a_boundary_are_cut_and_never_buffered_whole():
+    words = " ".join(["word"] * 5000)
+    blocks = (words[i : i + 1000] for i in range(0, len(words), 1000))
+
+    pieces = list(SemanticChunker._iter_sentences(blocks))
+
+    assert max(len(piece) for piece in pieces) <= MAX_SENTENCE_CHARS
+    assert " ".join(pieces) == words
+    # No spaces to cut at: cut at the limit
+    unbroken = "x" * (2 * MAX_SENTENCE_CHARS + 1)
+    pieces = list(SemanticChunker._iter_sentences([unbroken]))
+    assert [len(piece) for piece in pieces] == [MAX_SENTENCE_CHARS] * 2 + [1]
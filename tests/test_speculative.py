@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+
+def test_inflight_embedding_is_not_left_behind_when_a_step_raises(stub_service):
+    async def failing_refresh():
+        raise RuntimeError("collection unavailable")
+
+    stub_service.arefresh_collection = failing_refresh
+
+    async def ask():
+        embedding = asyncio.create_task(stub_service.retriever.aembed_query("Part B?"))
+        with pytest.raises(RuntimeError):
+            await stub_service.aanswer_speculative("Part B?", query_embedding=embedding)
+        return embedding
+
+    embedding = asyncio.run(ask())
+    assert embedding.done() and not embedding.cancelled()
+
+
+def test_speculative_route_cancels_an_unconsumed_embedding(
+    stub_service, monkeypatch
+):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.dependencies import get_query_service
+    from app.routers import query
+
+    tasks = []
+    create_task = asyncio.create_task
+
+    def recording_create_task(coro, **kwargs):
+        task = create_task(coro, **kwargs)
+        if coro.__name__ == "aembed_query":
+            tasks.append(task)
+        return task
+
+    async def failing_answer(**kwargs):
+        raise RuntimeError("cache unavailable")
+
+    monkeypatch.setattr(asyncio, "create_task", recording_create_task)
+    stub_service.aanswer_speculative = failing_answer
+    app = FastAPI()
+    app.include_router(query.router)
+    app.dependency_overrides[get_query_service] = lambda: stub_service
+
+    client = TestClient(app)
+    assert client.post("/ask/speculative", json={"query": "Part B?"}).status_code == 500
+    assert client.post(
+        "/ask/speculative", json={"query": "Part B?", "top_k": "many"}
+    ).status_code == 422
+    assert len(tasks) == 2 and all(task.cancelled() for task in tasks)
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.dependencies import get_query_service
+from app.routers import query
+
+
+@pytest.fixture
+def client(stub_service):
+    app = FastAPI()
+    app.include_router(query.router, prefix="/api/v1")
+    app.dependency_overrides[get_query_service] = lambda: stub_service
+    with TestClient(app) as client:
+        yield client
+
+
+def events(response):
+    """Parse a server-sent event stream into ``(event, data)`` pairs."""
+    parsed = []
+    for block in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        parsed.append((lines["event"], json.loads(lines["data"])))
+    return parsed
+
+
+def ask(client, question="Does Part B cover lab tests?"):
+    return client.post(
+        "/api/v1/ask/stream", json={"query": question, "query_id": "Q1"}
+    )
+
+
+def test_stream_sends_sources_then_tokens_then_the_result(client):
+    response = ask(client)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    stream = events(response)
+    names = [name for name, _ in stream]
+    assert names[0] == "sources" and names[-1] == "result"
+    assert set(names[1:-1]) == {"token"} and len(names) > 3
+    sources, result = stream[0][1], stream[-1][1]
+    assert sources["query_id"] == "Q1"
+    assert sources["source_chunks"] == result["source_chunks"]
+    assert "".join(data for name, data in stream if name == "token") == result["answer"]
+
+
+def test_generation_failure_midway_is_sent_as_an_error_event(client, stub_service):
+    async def failing_stream(query, context, usage):
+        yield "Part B "
+        raise RuntimeError("quota exceeded")
+
+    stub_service.generator.astream = failing_stream
+    stream = events(ask(client))
+
+    assert [name for name, _ in stream] == ["sources", "token", "error", "result"]
+    assert stream[2][1] == "Error: quota exceeded"
+    assert stream[3][1]["answer"] == "Error: quota exceeded"
+
+
+def test_retrieval_failure_is_an_http_error_before_the_stream(client, stub_service):
+    async def failing_embed(query):
+        raise ValueError("collection is empty")
+
+    stub_service.retriever.aembed_query = failing_embed
+    response = ask(client)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "collection is empty"